@@ -1,11 +1,25 @@
-from flask import Flask, render_template, url_for, request, jsonify
+from flask import Flask, render_template, url_for, request, jsonify, g, Response
+import json
 import os 
+import sys
+import threading
+import time
 from datetime import datetime, timedelta
-import requests
-import joblib
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(APP_DIR)
+sys.path.append(os.path.abspath(os.path.join(APP_DIR, "..", "src")))
+from app_logging import configure_logging, debug_sampled, get_logger
+from metrics import ERRORS, REQUEST_SECONDS, add_collector, publish, render, timed
+from model_registry import MODEL_FILES, ModelRegistry
+from offload import run_cpu
+from response_cache import ResponseCache, payload_key
+
+# The ML stack (numpy, pandas, the inference modules) and the weather client
+# (requests) are imported on first use, so workers serving only the template
+# routes boot fast. Set AQUAVITALS_PRELOAD_MODELS=1 to import and load
+# everything up front instead (gunicorn.conf.py then preloads the app in the
+# master, so workers share those pages copy-on-write).
 
 
 
@@ -15,6 +29,63 @@ app = Flask(__name__,
     template_folder='templates'
 )
 
+configure_logging()
+log = get_logger("app")
+
+
+def _load_comment_embeddings():
+    from comment_embeddings import load_comment_embeddings
+    table = load_comment_embeddings()
+    if table is None:
+        log.warning("No comment embedding table; comments will be encoded with SentenceTransformer "
+                    "(build it with python src/comment_embeddings.py)")
+    return table
+
+def _load_sentence_model():
+    # Only needed when the precomputed comment embedding table hasn't been built
+    from comment_embeddings import EMBEDDING_MODEL
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+# Models are loaded once per worker and shared across request threads
+model_registry = ModelRegistry()
+model_registry.register("comment_embeddings", _load_comment_embeddings)
+model_registry.register("sentence_model", _load_sentence_model)
+
+# Identical prediction payloads are answered from here until a model file changes
+response_cache = ResponseCache()
+
+
+_weather_lock = threading.Lock()
+_weather = None
+
+def get_weather_services():
+    """
+    Returns (weather_client, weather_cache), created on first use in this process.
+
+    Daily weather is shared across requests (and workers, with
+    AQUAVITALS_WEATHER_CACHE_DB) and fetched through one pooled client with
+    retries and per-upstream circuit breakers.
+    """
+    global _weather
+    if _weather is None:
+        with _weather_lock:
+            if _weather is None:
+                from weather_cache import WeatherCache
+                from weather_client import WeatherClient
+                client = WeatherClient()
+                _weather = (client, WeatherCache(fetch=client.fetch))
+    return _weather
+
+
+def warm_up():
+    """Imports the inference stack and loads every model."""
+    import inference  # noqa: F401
+    model_registry.preload(list(MODEL_FILES) + ["comment_embeddings"])
+
+if os.environ.get("AQUAVITALS_PRELOAD_MODELS") == "1":
+    warm_up()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -31,114 +102,168 @@ def about():
 def transparency():
     return render_template('transparency.html')
 
+@app.route('/model_status')
+def model_status():
+    return jsonify(model_registry.stats())
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None and request.endpoint != "metrics":
+        REQUEST_SECONDS.labels(request.endpoint or "unknown", response.status_code).observe(
+            time.perf_counter() - started)
+    publish()
+    return response
+
+def _collect_service_metrics():
+    yield ("aquavitals_model_loads_total", "Model artifact (re)loads.", ["model"],
+           [((name,), count) for name, count in model_registry.load_counts().items()])
+    yield ("aquavitals_response_cache_total", "Prediction responses served from cache or computed.",
+           ["result"], [(("hit",), response_cache.hits), (("miss",), response_cache.misses)])
+
+    # Only report the weather services once a request has created them
+    if _weather is None:
+        return
+    weather_client, weather_cache = _weather
+    yield ("aquavitals_weather_cache_days_total", "Weather days served from cache or fetched.",
+           ["result"], [(("hit",), weather_cache.hits), (("miss",), weather_cache.misses)])
+    yield ("aquavitals_weather_stale_fallbacks_total",
+           "Requests served from expired cache entries after an upstream failure.", [],
+           [((), weather_cache.stale_fallbacks)])
+    upstreams = weather_client.stats()
+    for metric, key, help_text in [
+        ("aquavitals_weather_upstream_calls_total", "calls", "Open-Meteo calls made."),
+        ("aquavitals_weather_upstream_errors_total", "errors", "Open-Meteo calls that failed."),
+        ("aquavitals_weather_upstream_rejected_total", "rejected", "Calls short-circuited by an open breaker."),
+    ]:
+        yield (metric, help_text, ["upstream"],
+               [((name,), upstream[key]) for name, upstream in upstreams.items()])
+
+add_collector(_collect_service_metrics)
+
+@app.route('/metrics')
+def metrics():
+    body, content_type = render()
+    return Response(body, content_type=content_type)
+
+@app.route('/weather_status')
+def weather_status():
+    weather_client, weather_cache = get_weather_services()
+    return jsonify({
+        "upstreams": weather_client.stats(),
+        "cache": {
+            "hits": weather_cache.hits,
+            "misses": weather_cache.misses,
+            "stale_fallbacks": weather_cache.stale_fallbacks
+        }
+    })
 
-# Needed for Model running
-def generate_time_series_features(df, cols, lags=[3,2,1], rolling_windows=[7]):
-    df = df.copy()
-    for col in cols:
-        for lag in lags:
-            df[f"{col} (Lag {lag})"] = df[col].shift(lag)
-        for window in rolling_windows:
-            df[f"{col} {window}-day avg"] = df[col].rolling(window=window, min_periods=window).mean()
-    return df
 
-def get_weather_data(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date, fish_count):
+DECORAH_VARIABLES = ["weathercode", "temperature_2m_max", "temperature_2m_min", "precipitation_sum"]
+CALMAR_VARIABLES = ["precipitation_sum"]
+
+# Coordinates for both locations
+DECORAH_LAT, DECORAH_LON = 43.3017, -91.7853
+CALMAR_LAT, CALMAR_LON = 43.1833, -91.8666
+
+def _station_fetches(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date):
+    """
+    The Decorah and Calmar weather lookups for 7 days before ``start_date``
+    through ``end_date``, as zero-argument callables for ``weather_client.gather``.
+    """
+    from weather_cache import Location
+    _, weather_cache = get_weather_services()
+
+    # Calculate 7 days before start_date for historical data
+    history_start = start_date - timedelta(days=7)
+
+    # Days already fetched (by this or another worker) come from the cache;
+    # only the missing sub-ranges hit Open-Meteo
+    return [
+        lambda: weather_cache.get_range_or_stale(
+            Location("Decorah", dec_lat, dec_lon), DECORAH_VARIABLES, history_start, end_date
+        ),
+        lambda: weather_cache.get_range_or_stale(
+            Location("Calmar", cal_lat, cal_lon), CALMAR_VARIABLES, history_start, end_date
+        ),
+    ]
+
+def _weather_days(dec_data, cal_data, start_date):
+    """Builds (days, start_index) from the Decorah and Calmar series of ``_station_fetches``."""
+    # Extract the data
+    temps_max = dec_data['temperature_2m_max']
+    temps_min = dec_data['temperature_2m_min']
+    dec_rains = dec_data['precipitation_sum']
+    weather_codes = dec_data['weathercode']
+    cal_rains = cal_data['precipitation_sum']
+    dates = dec_data['time']
+    
+    # Find index of start_date in dates list
+    start_date_str = start_date.strftime('%Y-%m-%d')
+    start_index = dates.index(start_date_str)
+    
+    days = []
+    for i in range(len(dates)):
+        days.append({
+            "date": dates[i],
+            "weathercode": weather_codes[i],
+            "max_air_temp": round(temps_max[i] * 9/5 + 32),  # Convert to Fahrenheit
+            "min_air_temp": round(temps_min[i] * 9/5 + 32),  # Convert to Fahrenheit
+            "dec_rain": round(dec_rains[i], 1),
+            "calmar_rain": round(cal_rains[i], 1),
+            "month": datetime.strptime(dates[i], '%Y-%m-%d').month
+        })
+    return days, start_index
+
+def get_weather_days(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date):
+    """
+    Returns (days, start_index): one dict per day from 7 days before
+    ``start_date`` through ``end_date``, and the position of ``start_date``.
+    Returns None when the weather can't be retrieved.
+    """
     # Convert string dates to datetime objects if they're strings
     if isinstance(start_date, str):
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
     if isinstance(end_date, str):
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
     
-    # Calculate 5 days before start_date for historical data
-    history_start = start_date - timedelta(days=7)
-    
-    # Base URL for the API
-    base_url = "https://api.open-meteo.com/v1/forecast"
-    
-    # Get Decorah data
-    dec_params = {
-        "latitude": dec_lat,
-        "longitude": dec_lon,
-        "daily": ["weathercode", "temperature_2m_max", "temperature_2m_min", "precipitation_sum"],
-        "timezone": "America/Chicago",
-        "start_date": history_start.strftime('%Y-%m-%d'),
-        "end_date": end_date.strftime('%Y-%m-%d')
-    }
-    
-    # Get Calmar data
-    cal_params = {
-        "latitude": cal_lat,
-        "longitude": cal_lon,
-        "daily": ["precipitation_sum"],
-        "timezone": "America/Chicago",
-        "start_date": history_start.strftime('%Y-%m-%d'),
-        "end_date": end_date.strftime('%Y-%m-%d')
-    }
-    
-    # Make API requests for both locations
-    dec_response = requests.get(base_url, params=dec_params)
-    cal_response = requests.get(base_url, params=cal_params)
+    import requests
+    weather_client, _ = get_weather_services()
+
+    # Both locations are fetched in parallel
+    try:
+        with timed("weather_fetch"):
+            dec_data, cal_data = weather_client.gather(
+                *_station_fetches(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date)
+            )
+    except (requests.RequestException, LookupError, ValueError) as e:
+        ERRORS.labels("weather").inc()
+        log.warning("Weather fetch failed", extra={"start_date": start_date, "end_date": end_date, "error": str(e)})
+        return None
     
-    if dec_response.status_code == 200 and cal_response.status_code == 200:
-        dec_data = dec_response.json()
-        cal_data = cal_response.json()
-        
-        # Extract the data
-        temps_max = dec_data['daily']['temperature_2m_max']
-        temps_min = dec_data['daily']['temperature_2m_min']
-        dec_rains = dec_data['daily']['precipitation_sum']
-        weather_codes = dec_data['daily']['weathercode']
-        cal_rains = cal_data['daily']['precipitation_sum']
-        dates = dec_data['daily']['time']
-        
-        # Convert to desired format
-        formatted_data = {
-            "fish_count": fish_count,
-            "history": [],
-            "forecast": []
-        }
-        
-        # Find index of start_date in dates list
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        start_index = dates.index(start_date_str)
-        
-        # Format historical data (5 days before start_date)
-        for i in range(start_index):
-            day_data = {
-                "date": dates[i],
-                "weathercode": weather_codes[i],
-                "max_air_temp": round(temps_max[i] * 9/5 + 32),  # Convert to Fahrenheit
-                "min_air_temp": round(temps_min[i] * 9/5 + 32),  # Convert to Fahrenheit
-                "dec_rain": round(dec_rains[i], 1),
-                "calmar_rain": round(cal_rains[i], 1),
-                "month": datetime.strptime(dates[i], '%Y-%m-%d').month
-            }
-            formatted_data["history"].append(day_data)
-        
-        # Format forecast data (from start_date to end_date)
-        for i in range(start_index, len(dates)):
-            day_data = {
-                "date": dates[i],
-                "weathercode": weather_codes[i],
-                "max_air_temp": round(temps_max[i] * 9/5 + 32),
-                "min_air_temp": round(temps_min[i] * 9/5 + 32),
-                "dec_rain": round(dec_rains[i], 1),
-                "calmar_rain": round(cal_rains[i], 1),
-                "month": datetime.strptime(dates[i], '%Y-%m-%d').month
-            }
-            formatted_data["forecast"].append(day_data)
-        
-        print("\nFormatted Weather Data:")
-        print("=" * 50)
-        import json
-        print(json.dumps(formatted_data, indent=2))
-
-        
-        
-        return formatted_data
-    else:
-        # print(f"Error: Unable to fetch data. Decorah status: {dec_response.status_code}, Calmar status: {cal_response.status_code}")
+    return _weather_days(dec_data, cal_data, start_date)
+
+def get_weather_data(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date, fish_count):
+    weather = get_weather_days(dec_lat, dec_lon, cal_lat, cal_lon, start_date, end_date)
+    if weather is None:
         return None
+    days, start_index = weather
+
+    # Days before start_date are history, the rest is the forecast window
+    formatted_data = {
+        "fish_count": fish_count,
+        "history": days[:start_index],
+        "forecast": days[start_index:]
+    }
+
+    if debug_sampled(log):
+        log.debug("Formatted weather data", extra={"weather": formatted_data})
+
+    return formatted_data
 
 @app.route('/process_dates', methods=['POST'])
 def process_dates():
@@ -155,18 +280,12 @@ def process_dates():
     end = datetime.strptime(end_date, '%Y-%m-%d')
     date_range = (end - start).days
     
-    # Coordinates for both locations
-    decorah_lat = 43.3017
-    decorah_lon = -91.7853
-    calmar_lat = 43.1833
-    calmar_lon = -91.8666
-    
     # Get weather data
     weather_data = get_weather_data(
-        decorah_lat,
-        decorah_lon,
-        calmar_lat,
-        calmar_lon,
+        DECORAH_LAT,
+        DECORAH_LON,
+        CALMAR_LAT,
+        CALMAR_LON,
         start_date,
         end_date,
         fish_count
@@ -178,184 +297,412 @@ def process_dates():
         return jsonify({"error": "Failed to retrieve weather data"}), 500
     
 
-def generate_weather_comment_from_code(code, rain, temp_f):
-    code_map = {
-        0: "Clear sky and calm conditions.",
-        1: "Mainly clear skies today.",
-        2: "Partly cloudy conditions.",
-        3: "Overcast sky throughout the day.",
-        45: "Foggy or misty conditions were observed.",
-        48: "Dense fog with limited visibility.",
-        51: "Light drizzle made the day damp.",
-        53: "Moderate drizzle persisted during the day.",
-        55: "Heavy drizzle throughout the day.",
-        56: "Light freezing drizzle was present.",
-        57: "Moderate to heavy freezing drizzle observed.",
-        61: "Light rainfall during the day.",
-        63: "Moderate rain was observed today.",
-        65: "Heavy rain showers throughout the day.",
-        66: "Light freezing rain occurred.",
-        67: "Heavy freezing rain observed.",
-        71: "Light snowfall made conditions cold.",
-        73: "Moderate snowfall occurred.",
-        75: "Heavy snowfall blanketed the area.",
-        77: "Snow grains made the surface slippery.",
-        80: "Light rain showers came and went.",
-        81: "Moderate rain showers passed through.",
-        82: "Heavy rain showers soaked the area.",
-        85: "Light snow showers today.",
-        86: "Heavy snow showers throughout the day.",
-        95: "Thunderstorms were observed.",
-        96: "Thunderstorms with some hail.",
-        99: "Severe thunderstorms and hail reported."
-    }
-    if code in code_map:
-        return code_map[code]
-    if rain > 0.5:
-        return "Heavy rainfall today."
-    elif rain > 0.2:
-        return "Moderate rain today."
-    elif temp_f > 65:
-        return "Warm and clear."
+def _embed_comments(comments, index):
+    import pandas as pd
+    from comment_embeddings import encode_unique
+
+    embedding_table = model_registry.get("comment_embeddings")
+    if embedding_table is not None:
+        return embedding_table.frame(comments, index=index)
+
+    # No table built yet: encode each distinct comment once
+    vectors = encode_unique(model_registry.get("sentence_model"), comments)
+    return pd.DataFrame(vectors, index=index, columns=[f"text_emb_{j}" for j in range(vectors.shape[1])])
+
+def _log_chain_inputs(result, models, n_history):
+    embedding_cols = [col for col in result.frame.columns if col.startswith("text_emb_")]
+    log.debug("Chain inputs", extra={
+        "sample_comments": result.frame["Weather_Comment"].head().tolist(),
+        "embedding_dims": len(embedding_cols),
+        "transparency_features": list((models.transparency or models.am).feature_names_in_),
+        # First 5 embedding dims of each forecast row, just to not flood the logs
+        "forecast_embeddings": result.frame[embedding_cols].values[n_history:, :5].round(4).tolist(),
+    })
+
+def load_chain_models():
+    from inference import ChainModels
+
+    # Prefer the multi-output transparency model; fall back to separate AM/PM models
+    if model_registry.has_artifact("transparency"):
+        transparency = model_registry.get("transparency")
+        am = pm = None
     else:
-        return "Cool and calm."
-
-@app.route('/predict_api', methods=['POST'])
-def predict_api():
-    data = request.get_json()
+        transparency = None
+        am = model_registry.get("am_transparency")
+        pm = model_registry.get("pm_transparency")
+
+    return ChainModels(
+        spring=model_registry.get("spring_temp"),
+        am=am,
+        pm=pm,
+        fish=model_registry.get("fish_survival"),
+        transparency=transparency,
+    )
 
-    fish_count = data.get("fish_count")
-    history = data.get("history")
-    forecast = data.get("forecast")
+# Streamed responses: one JSON object per forecast day, sent as soon as its chunk is scored
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def _stream_format():
+    """Returns "ndjson" or "sse" when the client asked for a stream (``?stream=`` or Accept), else None."""
+    requested = request.args.get("stream")
+    if requested in STREAM_FORMATS:
+        return requested
+    accept = request.headers.get("Accept", "")
+    for name, mimetype in STREAM_FORMATS.items():
+        if mimetype in accept:
+            return name
+    return None
+
+def _stream_record(record, stream_format, event=None):
+    payload = json.dumps(record)
+    if stream_format == "ndjson":
+        return payload + "\n"
+    return (f"event: {event}\n" if event else "") + f"data: {payload}\n\n"
+
+def _stream_response(batches, stream_format, cache_header, on_complete=None):
+    """
+    Streams the result rows of ``batches`` (an iterator of row lists) and
+    passes every row to ``on_complete`` once the stream has finished.
+    """
+    def generate():
+        rows = []
+        try:
+            for batch in batches:
+                rows.extend(batch)
+                for row in batch:
+                    yield _stream_record(row, stream_format)
+        except Exception:
+            # Headers are already sent, so the failure is reported in-band
+            ERRORS.labels("stream").inc()
+            log.exception("Streamed prediction failed")
+            yield _stream_record({"error": "Prediction failed"}, stream_format, event="error")
+            return
+        if on_complete is not None:
+            on_complete(rows)
+        if stream_format == "sse":
+            yield _stream_record({}, stream_format, event="end")
+
+    return Response(generate(), mimetype=STREAM_FORMATS[stream_format],
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Cache": cache_header})
+
+def _parse_uncertainty(data):
+    """
+    Reads the optional Monte Carlo settings of a request body; returns
+    ((scenarios, seed), None), ((None, None), None) when not asked for, or
+    (None, error message).
+    """
+    if data.get("scenarios") in (None, False, 0):
+        return (None, None), None
+
+    from uncertainty import MAX_SCENARIOS
+    try:
+        scenarios = int(data["scenarios"])
+        seed = int(data.get("seed", 0))
+    except (TypeError, ValueError):
+        return None, "Invalid scenarios/seed"
+    if not 1 <= scenarios <= MAX_SCENARIOS:
+        return None, f"scenarios must be between 1 and {MAX_SCENARIOS}"
+    return (scenarios, seed), None
+
+def _predict_response(history, forecast, fish_count, scenarios=None, seed=None):
+    """
+    Runs the chain for one site, or replays the response cache, and returns
+    the JSON response (or a stream when the client asked for one).
+
+    With ``scenarios``, every day also carries the exceedance probabilities
+    of that many perturbed weather scenarios (see ``uncertainty.py``).
+    """
+    stream_format = _stream_format()
+    version = model_registry.fingerprint()
+    if scenarios:
+        version = f"{version}|scenarios={scenarios}|seed={seed}"
+    cache_key = payload_key(fish_count, history, forecast, version)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        if stream_format:
+            return _stream_response(iter([cached]), stream_format, "HIT")
+        response = jsonify(cached)
+        response.headers["X-Cache"] = "HIT"
+        return response
 
-    if not fish_count or not history or not forecast:
-        return jsonify({"error": "Missing required fields"}), 400
+    try:
+        with timed("load_models"):
+            models = load_chain_models()
+            model_registry.get("comment_embeddings")
+    except Exception as e:
+        ERRORS.labels("model_load").inc()
+        log.exception("Model load failed")
+        return jsonify({"error": f"Failed to load models: {e}"}), 500
 
-    combined = history + forecast
-    df = pd.DataFrame(combined)
+    from inference import format_results, iter_chain, prepare_weather_frame, run_chain
 
-    df["Date"] = pd.to_datetime(df["date"])
-    df["# fish"] = fish_count
-    df["Season"] = df["Date"].dt.month.apply(lambda m: (
-        "Winter" if m in [12,1,2] else
-        "Spring" if m in [3,4,5] else
-        "Summer" if m in [6,7,8] else "Fall"
-    ))
+    with timed("prepare_frame"):
+        df = prepare_weather_frame(history, forecast, fish_count)
 
+    if scenarios:
+        from uncertainty import predict_with_uncertainty
 
-    try:
-        spring_model = joblib.load("models/spring_temp_model.joblib")
-        am_model = joblib.load("models/am_transparency_model.joblib")
-        pm_model = joblib.load("models/pm_transparency_model.joblib")
-        fish_model = joblib.load("models/fish_survial_model.joblib")
-        sentence_model = SentenceTransformer("all-MiniLM-L6-v2")
+        # All scenario-days are scored together, so there is nothing to stream early.
+        # It spreads its scenario chunks over the CPU pool itself, one slot each.
+        results = predict_with_uncertainty(df, len(history), models, _embed_comments,
+                                           fish_count, scenarios, seed)
+        response_cache.set(cache_key, results)
+        if stream_format:
+            return _stream_response(iter([results]), stream_format, "MISS")
+        response = jsonify(results)
+        response.headers["X-Cache"] = "MISS"
+        return response
 
-    except Exception as e:
-        return jsonify({"error": f"Failed to load models: {e}"}), 500
-    
-    # print("🔍 Columns before rename:", df.columns.tolist())
+    if stream_format:
+        def batches():
+            chunks = iter_chain(df, len(history), models, _embed_comments)
+            # Each chunk is scored in the CPU pool; the stream itself stays on the request
+            while (chunk := run_cpu(next, chunks, None)) is not None:
+                yield format_results(chunk, fish_count)
 
-    
-        # ✅ Rename for consistency with transparency models
-    df.rename(columns={
-        "max_air_temp": "Max air temp",
-        "min_air_temp": "Min air temp",
-        "dec_rain": "Dec Rain",
-        "calmar_rain": "Calmar Rain"
-    }, inplace=True)
-
-    # Create required features before spring prediction
-    df["Total Rain"] = df["Dec Rain"] + df["Calmar Rain"]
-    df["Max Air Temp x Rain"] = df["Max air temp"] * df["Total Rain"]
-    # Predict Spring Temp first
-    for i in range(len(history), len(df)):
-        row = df.iloc[i:i+1].copy()
-        spring_temp = spring_model.predict(row)[0]
-        df.loc[df.index[i], "Spring Temp (F)"] = spring_temp
-
-    df["Spring_Temp x Rain"] = df["Spring Temp (F)"] * (df["Dec Rain"] + df["Calmar Rain"])
-
-    df = generate_time_series_features(df, cols=[
-        "Spring Temp (F)", "Dec Rain", "Calmar Rain"
-    ], lags=[3,2,1], rolling_windows=[7])
-
-
-        # Step 0: Generate weather-style comment for each row
-    comments = []
-    for i in range(len(df)):
-        row = df.iloc[i]
-        weather_code = row.get("weathercode", None)
-        rain = row.get("Total Rain", 0)
-        temp_f = row.get("Spring Temp (F)", 0)
-        comment = generate_weather_comment_from_code(weather_code, rain, temp_f)
-        comments.append(comment)
-    
-    df["Weather_Comment"] = comments
+        return _stream_response(batches(), stream_format, "MISS",
+                                on_complete=lambda rows: response_cache.set(cache_key, rows))
 
-    # Step 1: Get comment and encode
-    # Generate embeddings per row
-    df["comment_embedding"] = df["Weather_Comment"].apply(lambda x: sentence_model.encode(str(x)))
-    embedding_df = pd.DataFrame(df["comment_embedding"].tolist(), index=df.index)
-    embedding_df.columns = [f"text_emb_{j}" for j in range(embedding_df.shape[1])]
-    df = pd.concat([df.drop(columns=["comment_embedding"]), embedding_df], axis=1)
+    # Every stage runs once over all forecast days
+    result = run_cpu(run_chain, df, len(history), models, _embed_comments)
 
-    print("🗣️ Sample Weather Comments:")
-    print(df["Weather_Comment"].head())
-    print("🧠 Embedding (first 5 dims):", embedding_df[:5])  # just to not flood your logs
+    if debug_sampled(log):
+        _log_chain_inputs(result, models, len(history))
 
+    with timed("format_results"):
+        results = format_results(result, fish_count)
+    response_cache.set(cache_key, results)
+    response = jsonify(results)
+    response.headers["X-Cache"] = "MISS"
+    return response
 
-    # Step 4: Concatenate once
-    df.reset_index(drop=True, inplace=True)
+@app.route('/predict_api', methods=['POST'])
+def predict_api():
+    data = request.get_json()
 
-    results = []
+    fish_count = data.get("fish_count")
+    history = data.get("history")
+    forecast = data.get("forecast")
 
-    for i in range(len(history), len(df)):
-        row = df.iloc[i:i+1].copy()
+    if not fish_count or not history or not forecast:
+        return jsonify({"error": "Missing required fields"}), 400
 
-        am_trans = am_model.predict(row)[0]
-        pm_trans = pm_model.predict(row)[0]
+    try:
+        fish_count = int(fish_count)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid fish count"}), 400
+
+    uncertainty, error = _parse_uncertainty(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    return _predict_response(history, forecast, fish_count, *uncertainty)
+
+@app.route('/forecast_risk', methods=['POST'])
+def forecast_risk():
+    """
+    process_dates + predict_api in one call: dates and fish count in, risk table out.
+
+    Both endpoints stream one record per day with ``?stream=ndjson`` or
+    ``?stream=sse`` (or the matching Accept header), and both answer repeated
+    payloads from the response cache (``X-Cache: HIT``). Add ``"scenarios": N``
+    (optionally ``"seed"``) for Monte Carlo risk-exceedance probabilities.
+    """
+    data = request.get_json()
 
-        am_trans = max(0, am_trans)
-        pm_trans = max(0, pm_trans)
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    fish_count = data.get("fish_count")
 
-        row["AM Transparency"] = am_trans
-        row["PM Transparency"] = pm_trans
-        
-        print("AM model features:", am_model.feature_names_in_)
-        print("PM model features:", pm_model.feature_names_in_)
+    if not start_date or not end_date or not fish_count:
+        return jsonify({"error": "Missing required fields"}), 400
 
+    try:
+        fish_count = int(fish_count)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid fish count"}), 400
 
-        print("📦 Features used for prediction:")
-        print(row[[col for col in row.columns if col.startswith("text_emb_")]].values[0][:5])  # first 5 dims
+    uncertainty, error = _parse_uncertainty(data)
+    if error:
+        return jsonify({"error": error}), 400
 
+    try:
+        weather = get_weather_days(DECORAH_LAT, DECORAH_LON, CALMAR_LAT, CALMAR_LON, start_date, end_date)
+    except ValueError:
+        return jsonify({"error": "Invalid date range"}), 400
+    if weather is None:
+        return jsonify({"error": "Failed to retrieve weather data"}), 500
+    days, start_index = weather
 
-        survival = min(max(fish_model.predict(row)[0], 0.0), 100.0)
+    # The cache key is the fetched weather, so a changed forecast is a different entry
+    return _predict_response(days[:start_index], days[start_index:], fish_count, *uncertainty)
 
-        try:
-            fish_count = int(data.get("fish_count"))
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid fish count"}), 400
 
-        deaths = (100 - survival) / 100 * fish_count
+# Largest number of sites one /forecast_risk_batch request may hold
+MAX_BATCH_SITES = int(os.environ.get("AQUAVITALS_MAX_BATCH_SITES", 200))
 
-        if survival == 100:
-            risk = "Low"
-        elif deaths >= 1000 or survival < 99.95 or am_trans < 30 or pm_trans < 30 or am_trans < 0 or pm_trans < 0:
-            risk = "High"
+def _parse_site(site):
+    """Validates one batch entry; returns (site, None) or (None, error message)."""
+    if not isinstance(site, dict):
+        return None, "Site must be an object"
+    try:
+        start = datetime.strptime(site["start_date"], '%Y-%m-%d')
+        end = datetime.strptime(site["end_date"], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        return None, "Missing or invalid start_date/end_date"
+    if end < start:
+        return None, "Invalid date range"
+    try:
+        fish_count = int(site["fish_count"])
+        coords = tuple(float(site.get(key, default)) for key, default in [
+            ("dec_lat", DECORAH_LAT), ("dec_lon", DECORAH_LON), ("cal_lat", CALMAR_LAT), ("cal_lon", CALMAR_LON)
+        ])
+    except (KeyError, TypeError, ValueError):
+        return None, "Missing or invalid fish_count/coordinates"
+    return {"id": site.get("id"), "start": start, "end": end, "fish_count": fish_count, "coords": coords}, None
+
+def _merged_ranges(ranges):
+    """Merges (start, end) day ranges that overlap or touch; returns them sorted."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
         else:
-            risk = "Low"
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+def _slice_days(daily, first, start, end):
+    """The ``start``..``end`` days of a ``{"time": [...], <variable>: [...]}`` block beginning on ``first``."""
+    i, j = (start - first).days, (end - first).days + 1
+    return {key: values[i:j] for key, values in daily.items()}
+
+def _site_weather(sites):
+    """
+    Fetches the weather of every site and returns each site's
+    (days, start_index), or None when its weather can't be retrieved.
+
+    Each site needs its Decorah and Calmar days from 7 days before its start
+    through its end. Per station, the sites' windows are merged where they
+    overlap or touch, and each merged range is looked up once (all lookups
+    concurrently); every site's days are sliced out of its range. So sites
+    sharing a station fetch a day once, and no day outside a site window is
+    fetched. A failed lookup only fails the sites in its range.
+    """
+    import requests
+    from weather_cache import Location
+    weather_client, weather_cache = get_weather_services()
+
+    # (station, lat, lon, variables) -> the (start, end) window of each site
+    stations = [("Decorah", 0, DECORAH_VARIABLES), ("Calmar", 2, CALMAR_VARIABLES)]
+    windows = {}
+    site_keys = []
+    for site in sites:
+        window = ((site["start"] - timedelta(days=7)).date(), site["end"].date())
+        keys = []
+        for name, offset, variables in stations:
+            key = (name, *site["coords"][offset:offset + 2], tuple(variables))
+            windows.setdefault(key, []).append(window)
+            keys.append((key, window))
+        site_keys.append(keys)
+    lookups = [(key, merged) for key, ranges in windows.items() for merged in _merged_ranges(ranges)]
+
+    def lookup(key, start, end):
+        name, lat, lon, variables = key
+        try:
+            return weather_cache.get_range_or_stale(Location(name, lat, lon), variables, start, end), None
+        except (requests.RequestException, LookupError, ValueError) as e:
+            return None, e
+
+    with timed("weather_fetch"):
+        fetched = weather_client.gather(*[lambda key=key, merged=merged: lookup(key, *merged)
+                                          for key, merged in lookups])
+    by_key = {}
+    for (key, merged), result in zip(lookups, fetched):
+        by_key.setdefault(key, []).append((merged, result))
+
+    weather = []
+    for site, keys in zip(sites, site_keys):
+        daily, error = [], None
+        for key, (start, end) in keys:
+            (first, _), (data, error) = next(item for item in by_key[key] if item[0][0] <= start <= item[0][1])
+            if error is not None:
+                break
+            daily.append(_slice_days(data, first, start, end))
+        if error is not None:
+            ERRORS.labels("weather").inc()
+            log.warning("Weather fetch failed", extra={
+                "site": site["id"], "start_date": site["start"], "end_date": site["end"], "error": str(error)
+            })
+            weather.append(None)
+        else:
+            weather.append(_weather_days(*daily, site["start"]))
+    return weather
+
+@app.route('/forecast_risk_batch', methods=['POST'])
+def forecast_risk_batch():
+    """
+    /forecast_risk for many sites/raceways in one call.
+
+    Body: {"sites": [{"id", "start_date", "end_date", "fish_count",
+    optional "dec_lat", "dec_lon", "cal_lat", "cal_lon"}, ...]}. Sites
+    sharing a station share one lookup of their overlapping days, and all
+    sites run through the model chain as one stacked matrix. Returns
+    {"sites": [...]} in request order, each with "results" or its own "error".
+    """
+    data = request.get_json(silent=True) or {}
+    sites = data.get("sites")
+    if not isinstance(sites, list) or not sites:
+        return jsonify({"error": "Missing required fields"}), 400
+    if len(sites) > MAX_BATCH_SITES:
+        return jsonify({"error": f"At most {MAX_BATCH_SITES} sites per request"}), 400
+
+    parsed = [_parse_site(site) for site in sites]
+    response = [{"id": site.get("id") if isinstance(site, dict) else None} for site in sites]
+    for entry, (_, error) in zip(response, parsed):
+        if error is not None:
+            entry["error"] = error
+
+    valid = [i for i, (_, error) in enumerate(parsed) if error is None]
+    # Sites whose payload was answered before are served from the response cache
+    version = model_registry.fingerprint()
+    ready = []
+    for i, weather in zip(valid, _site_weather([parsed[i][0] for i in valid])):
+        if weather is None:
+            response[i]["error"] = "Failed to retrieve weather data"
+            continue
+        days, start_index = weather
+        key = payload_key(parsed[i][0]["fish_count"], days[:start_index], days[start_index:], version)
+        cached = response_cache.get(key)
+        if cached is not None:
+            response[i]["results"] = cached
+        else:
+            ready.append((i, weather, key))
+    if not ready:
+        return jsonify({"sites": response})
 
+    try:
+        with timed("load_models"):
+            models = load_chain_models()
+            model_registry.get("comment_embeddings")
+    except Exception as e:
+        ERRORS.labels("model_load").inc()
+        log.exception("Model load failed")
+        return jsonify({"error": f"Failed to load models: {e}"}), 500
 
-        results.append({
-            "date": str(row["Date"].values[0])[:10],
-            "am_transparency": float(round(am_trans, 2)),
-            "pm_transparency": float(round(pm_trans, 2)),
-            "predicted_survival": float(round(survival, 4)),
-            "risk_level": risk
-        })
+    from inference import format_results, prepare_weather_frame, run_chain_batch
 
-    return jsonify(results)
+    # Every site goes through each model stage in one stacked predict
+    with timed("prepare_frame"):
+        frames = [prepare_weather_frame(days[:start_index], days[start_index:], parsed[i][0]["fish_count"])
+                  for i, (days, start_index), _ in ready]
+    chain = run_cpu(run_chain_batch, frames, [start_index for _, (_, start_index), _ in ready], models,
+                    _embed_comments)
 
+    with timed("format_results"):
+        for (i, _, key), result in zip(ready, chain):
+            response[i]["results"] = format_results(result, parsed[i][0]["fish_count"])
+            response_cache.set(key, response[i]["results"])
+    return jsonify({"sites": response})
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 10000))  
@@ -0,0 +1,85 @@
+"""
+Structured logging for the web app.
+
+Everything logs through the ``aquavitals`` logger hierarchy (``get_logger``)
+to stderr, one JSON object per line by default. Fields passed via ``extra=``
+become top-level keys, so request details stay machine-readable.
+
+Debug output on the request path is both level-gated and sampled: callers
+check ``debug_sampled(log)`` before building any debug payload, so with
+debug off (the default) a request does no formatting work at all.
+
+Configuration (environment):
+    AQUAVITALS_LOG_LEVEL         DEBUG, INFO, WARNING, ... (default INFO)
+    AQUAVITALS_LOG_FORMAT        "json" or "text" (default json)
+    AQUAVITALS_LOG_SAMPLE_RATE   Fraction of requests that emit debug details (default 1.0)
+"""
+import json
+import logging
+import os
+import random
+import sys
+
+
+LOG_LEVEL = os.environ.get("AQUAVITALS_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("AQUAVITALS_LOG_FORMAT", "json")
+DEBUG_SAMPLE_RATE = float(os.environ.get("AQUAVITALS_LOG_SAMPLE_RATE", 1.0))
+
+ROOT_LOGGER = "aquavitals"
+
+# Attributes every LogRecord has; anything else came in through ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        extras = {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+        if extras:
+            line += " " + json.dumps(extras, default=str)
+        return line
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    """Attaches a single stderr handler to the ``aquavitals`` logger (idempotent)."""
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    logger.addHandler(handler)
+    return logger
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def debug_sampled(logger, rate=None):
+    """True if this call should emit debug details (level enabled and sampled in)."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    rate = DEBUG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1.0 or random.random() < rate
@@ -0,0 +1,160 @@
+"""
+Key/value stores with per-entry expiry, shared by the app's caches.
+
+``MemoryBackend`` is local to one worker process. ``SQLiteBackend`` keeps
+entries in a local SQLite file so every gunicorn worker on the host shares them.
+Values must be JSON-serialisable.
+
+Both take an optional ``max_entries``. The memory store then evicts the
+least recently used entry. The SQLite store evicts the least recently written
+entry, so reads stay read-only.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get_many(self, keys, allow_stale=False):
+        now = time.time()
+        found = {}
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                expires_at, value = item
+                if allow_stale or expires_at is None or expires_at > now:
+                    found[key] = value
+                    if self.max_entries is not None:
+                        self._data.move_to_end(key)
+        return found
+
+    def set_many(self, items):
+        """Stores ``{key: (value, ttl_seconds or None)}``."""
+        now = time.time()
+        with self._lock:
+            for key, (value, ttl) in items.items():
+                self._data[key] = (now + ttl if ttl is not None else None, value)
+                self._data.move_to_end(key)
+            if self.max_entries is not None:
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._data.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    SQLite-backed store; safe to share between threads and worker processes.
+
+    Args:
+        path (str): Database file (created if missing).
+        table (str): Table name, so several caches can share one file.
+        max_entries (int, optional): Keep at most this many entries.
+    """
+
+    def __init__(self, path, table="cache", max_entries=None):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys, allow_stale=False):
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        conn = self._connect()
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, value, expires_at FROM {self.table} "
+                f"WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for key, value, expires_at in rows:
+                if allow_stale or expires_at is None or expires_at > now:
+                    found[key] = json.loads(value)
+        return found
+
+    def set_many(self, items):
+        now = time.time()
+        rows = [
+            (key, json.dumps(value), now + ttl if ttl is not None else None)
+            for key, (value, ttl) in items.items()
+        ]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            if self.max_entries is not None:
+                # REPLACE gives a row a new rowid, so the lowest rowids are the oldest writes
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE rowid IN (SELECT rowid FROM {self.table} "
+                    "ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def delete(self, keys):
+        with self._connect() as conn:
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys])
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+            return cursor.rowcount
+
+    def __len__(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def backend_from_env(env_var, table, max_entries=None):
+    """Returns a SQLiteBackend when ``env_var`` names a database file, else a MemoryBackend."""
+    path = os.environ.get(env_var)
+    if path:
+        return SQLiteBackend(path, table=table, max_entries=max_entries)
+    return MemoryBackend(max_entries=max_entries)
@@ -0,0 +1,329 @@
+"""
+Batched inference for the spring temp -> transparency -> survival chain.
+
+Each model stage is evaluated once over every forecast day instead of once per
+day. A stage only has to fall back to a per-day recurrence when its model
+consumes lagged copies of its own prediction; the lag/rolling inputs for that
+case come from the streaming ``TimeSeriesFeatureEngine``.
+
+``run_chain_batch`` stacks the frames of several sites into one matrix, so a
+batch costs one ``predict`` per stage no matter how many sites it holds.
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from feature_assembly import add_rain_interactions, season_of, weather_code_comments
+from metrics import timed
+from timeseries_utils import TimeSeriesFeatureEngine, generate_time_series_features
+
+
+# ``transparency`` is an optional multi-output model predicting [AM, PM] in one
+# pass; when it's set, ``am`` and ``pm`` are not used
+ChainModels = namedtuple("ChainModels", ["spring", "am", "pm", "fish", "transparency"], defaults=[None])
+
+ChainResult = namedtuple("ChainResult", ["frame", "dates", "am", "pm", "survival"])
+
+TS_COLUMNS = ["Spring Temp (F)", "Dec Rain", "Calmar Rain"]
+TS_LAGS = [3, 2, 1]
+TS_WINDOWS = [7]
+
+# Forecast days scored per chunk by ``iter_chain`` (streaming responses)
+STREAM_CHUNK_DAYS = 7
+
+_LAG_PATTERN = re.compile(r"^(?P<col>.+) \(Lag (?P<lag>\d+)\)$")
+_AVG_PATTERN = re.compile(r"^(?P<col>.+) (?P<window>\d+)-day avg$")
+
+
+def prepare_weather_frame(history, forecast, fish_count):
+    """
+    Builds the base feature frame from the history + forecast weather rows.
+
+    Args:
+        history (list): Daily weather dicts preceding the forecast window.
+        forecast (list): Daily weather dicts to predict.
+        fish_count (int): Number of fish in the raceway.
+
+    Returns:
+        pd.DataFrame: One row per day, history rows first.
+    """
+    df = pd.DataFrame(history + forecast)
+
+    df["Date"] = pd.to_datetime(df["date"])
+    df["# fish"] = fish_count
+    df["Season"] = season_of(df["Date"].dt.month)
+
+    # Rename for consistency with the training data
+    df.rename(columns={
+        "max_air_temp": "Max air temp",
+        "min_air_temp": "Min air temp",
+        "dec_rain": "Dec Rain",
+        "calmar_rain": "Calmar Rain"
+    }, inplace=True)
+
+    return add_rain_interactions(df, ["Total Rain", "Max Air Temp x Rain"])
+
+
+def predict_frame(model, df):
+    """
+    ``model.predict(df)``; a compiled model with a feature schema is given its
+    input matrix built by column position instead.
+    """
+    schema = getattr(model, "feature_schema", None)
+    if schema is not None and hasattr(model, "predict_matrix"):
+        return model.predict_matrix(schema.matrix(df))
+    return model.predict(df)
+
+
+def _self_lag_inputs(model, target):
+    """Returns the (column, lag) and (column, window) inputs a model derives from ``target``."""
+    lags, windows = {}, {}
+    for name in getattr(model, "feature_names_in_", []):
+        match = _LAG_PATTERN.match(name)
+        if match and match["col"] == target:
+            lags[name] = int(match["lag"])
+            continue
+        match = _AVG_PATTERN.match(name)
+        if match and match["col"] == target:
+            windows[name] = int(match["window"])
+    return lags, windows
+
+
+def predict_stage(model, df, rows, target):
+    """
+    Predicts ``target`` for the positional ``rows`` of ``df``.
+
+    Runs one batched ``predict`` unless the model reads lagged values of its
+    own target, in which case days are predicted in order and each day's lag
+    and rolling inputs are filled from the predictions made so far. ``rows``
+    must be increasing positions.
+    """
+    lags, windows = _self_lag_inputs(model, target)
+    if not lags and not windows:
+        return predict_frame(model, df.iloc[rows])
+
+    if target in df:
+        values = df[target].to_numpy(dtype=float, copy=True)
+    else:
+        values = np.full(len(df), np.nan)
+    frame = df.iloc[rows].copy()
+    preds = np.empty(len(rows), dtype=np.float32)
+
+    # The engine holds the target's lag/rolling state; each prediction is
+    # pushed as the day's value before the next day's inputs are derived
+    engine = TimeSeriesFeatureEngine(
+        [target], lags=sorted(set(lags.values())), rolling_windows=sorted(set(windows.values()))
+    )
+    positions = [frame.columns.get_loc(name) for name in engine.feature_names]
+    engine.run(values[:rows[0]].reshape(-1, 1))
+
+    for k, i in enumerate(rows):
+        if i > engine.seen:
+            engine.run(values[engine.seen:i].reshape(-1, 1))
+        frame.iloc[k, positions] = engine.preview([values[i]])
+        preds[k] = predict_frame(model, frame.iloc[k:k + 1])[0]
+        engine.push([preds[k]])
+
+    return preds
+
+
+def _predict_segments(model, df, segments, target):
+    """
+    ``predict_stage`` over stacked ``(start, stop, n_history)`` segments of ``df``.
+
+    One ``predict`` covers every segment unless the model reads lagged values
+    of its own target; then each segment runs its own recurrence.
+    """
+    lags, windows = _self_lag_inputs(model, target)
+    if not lags and not windows:
+        return predict_frame(model, df.iloc[_forecast_rows(segments)])
+    return np.concatenate([
+        predict_stage(model, df.iloc[start:stop], np.arange(n_history, stop - start), target)
+        for start, stop, n_history in segments
+    ])
+
+
+def _forecast_rows(segments):
+    return np.concatenate([np.arange(start + n_history, stop) for start, stop, n_history in segments])
+
+
+def _add_comment_features(df, embed_comments):
+    with timed("comments"):
+        df["Weather_Comment"] = weather_code_comments(df)
+    with timed("embeddings"):
+        df = pd.concat([df, embed_comments(df["Weather_Comment"], df.index)], axis=1)
+        df.reset_index(drop=True, inplace=True)
+    return df
+
+
+def _predict_downstream(df, segments, models):
+    """Transparency and survival stages; returns (df, am, pm, survival) for the forecast rows."""
+    rows = _forecast_rows(segments)
+
+    # Stage 2: transparency (one shared preprocessing pass with the multi-output model)
+    if models.transparency is not None:
+        with timed("transparency"):
+            both = np.maximum(predict_frame(models.transparency, df.iloc[rows]), 0)
+        am, pm = both[:, 0], both[:, 1]
+    else:
+        with timed("am_transparency"):
+            am = np.maximum(_predict_segments(models.am, df, segments, "AM Transparency"), 0)
+        with timed("pm_transparency"):
+            pm = np.maximum(_predict_segments(models.pm, df, segments, "PM Transparency"), 0)
+
+    # Stage 3: survival, fed by the clipped transparency predictions
+    df["AM Transparency"] = np.nan
+    df["PM Transparency"] = np.nan
+    df.loc[rows, "AM Transparency"] = am
+    df.loc[rows, "PM Transparency"] = pm
+    with timed("fish_survival"):
+        survival = np.clip(_predict_segments(models.fish, df, segments, "Fish survival rate"), 0.0, 100.0)
+    return df, am, pm, survival
+
+
+def run_chain(df, n_history, models, embed_comments):
+    """
+    Runs the full model chain over every forecast row of ``df``.
+
+    Args:
+        df (pd.DataFrame): Output of ``prepare_weather_frame``.
+        n_history (int): Number of leading history rows (not predicted).
+        models (ChainModels): The fitted pipelines.
+        embed_comments (callable): ``(comments, index) -> DataFrame`` of text_emb_* columns.
+
+    Returns:
+        ChainResult: The final feature frame plus per-forecast-day arrays.
+    """
+    return run_chain_batch([df], [n_history], models, embed_comments)[0]
+
+
+def run_chain_batch(frames, n_histories, models, embed_comments):
+    """
+    Runs the chain for several independent frames (e.g. sites) at once.
+
+    The frames are stacked into one matrix: time-series features are computed
+    per frame, every other step (comments, embeddings, each model stage) runs
+    once over all rows.
+
+    Args:
+        frames (list): ``prepare_weather_frame`` outputs, one per site.
+        n_histories (list): Leading history rows of each frame.
+        models (ChainModels): The fitted pipelines.
+        embed_comments (callable): ``(comments, index) -> DataFrame`` of text_emb_* columns.
+
+    Returns:
+        list: One ``ChainResult`` per frame, in order.
+    """
+    stops = np.cumsum([len(frame) for frame in frames])
+    segments = [(int(stop) - len(frame), int(stop), n_history)
+                for frame, stop, n_history in zip(frames, stops, n_histories)]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    df, am, pm, survival = run_stacked(df, segments, models, embed_comments)
+    dates = df["Date"].iloc[_forecast_rows(segments)].dt.strftime("%Y-%m-%d").tolist()
+
+    results = []
+    offset = 0
+    for start, stop, n_history in segments:
+        day = slice(offset, offset + stop - start - n_history)
+        frame = df if len(segments) == 1 else df.iloc[start:stop].reset_index(drop=True)
+        results.append(ChainResult(frame, dates[day], am[day], pm[day], survival[day]))
+        offset = day.stop
+    return results
+
+
+def run_stacked(df, segments, models, embed_comments):
+    """
+    Runs every stage once over a frame holding independent series.
+
+    Args:
+        df (pd.DataFrame): ``prepare_weather_frame`` rows of every series, stacked.
+        segments (list): ``(start, stop, n_history)`` row range of each series.
+        models (ChainModels): The fitted pipelines.
+        embed_comments (callable): ``(comments, index) -> DataFrame`` of text_emb_* columns.
+
+    Returns:
+        tuple: (featured frame, am, pm, survival), the arrays holding the
+        forecast rows of all segments in order.
+    """
+    rows = _forecast_rows(segments)
+
+    # Stage 1: spring temperature (history rows are left empty, as in training)
+    with timed("spring_temp"):
+        spring = _predict_segments(models.spring, df, segments, "Spring Temp (F)")
+    spring_col = np.full(len(df), np.nan)
+    spring_col[rows] = spring
+    df["Spring Temp (F)"] = spring_col
+
+    with timed("time_series_features"):
+        df = add_rain_interactions(df, ["Spring_Temp x Rain"])
+        df = generate_time_series_features(
+            df, cols=TS_COLUMNS, lags=TS_LAGS, rolling_windows=TS_WINDOWS,
+            bounds=[(start, stop) for start, stop, _ in segments],
+        )
+
+    df = _add_comment_features(df, embed_comments)
+    return _predict_downstream(df, segments, models)
+
+
+def iter_chain(df, n_history, models, embed_comments, chunk_days=STREAM_CHUNK_DAYS):
+    """
+    Runs the chain ``chunk_days`` forecast days at a time, yielding a
+    ``ChainResult`` for each chunk as soon as all its stages are done.
+
+    A streaming ``TimeSeriesFeatureEngine`` carries the lag/rolling state
+    from one chunk to the next, so the values equal ``run_chain``'s. If a
+    stage reads lags of its own prediction, the whole range is one chunk.
+
+    Args:
+        df (pd.DataFrame): Output of ``prepare_weather_frame``.
+        n_history (int): Number of leading history rows (not predicted).
+        models (ChainModels): The fitted pipelines.
+        embed_comments (callable): ``(comments, index) -> DataFrame`` of text_emb_* columns.
+        chunk_days (int): Forecast days per chunk.
+    """
+    stages = [(models.spring, "Spring Temp (F)"), (models.fish, "Fish survival rate")]
+    if models.transparency is None:
+        stages += [(models.am, "AM Transparency"), (models.pm, "PM Transparency")]
+    if any(any(_self_lag_inputs(model, target)) for model, target in stages):
+        yield run_chain(df, n_history, models, embed_comments)
+        return
+
+    # History rows only seed the lag/rolling state (their spring temp stays empty, as in run_chain)
+    engine = TimeSeriesFeatureEngine(TS_COLUMNS, lags=TS_LAGS, rolling_windows=TS_WINDOWS)
+    history = df.iloc[:n_history].assign(**{"Spring Temp (F)": np.nan})
+    engine.run(history[TS_COLUMNS].to_numpy(dtype=np.float64))
+
+    for start in range(n_history, len(df), max(1, chunk_days)):
+        chunk = df.iloc[start:start + chunk_days].reset_index(drop=True)
+        segments = [(0, len(chunk), 0)]
+
+        with timed("spring_temp"):
+            chunk["Spring Temp (F)"] = np.asarray(predict_frame(models.spring, chunk), dtype=np.float64)
+        with timed("time_series_features"):
+            chunk = engine.extend_frame(add_rain_interactions(chunk, ["Spring_Temp x Rain"]))
+
+        chunk = _add_comment_features(chunk, embed_comments)
+        chunk, am, pm, survival = _predict_downstream(chunk, segments, models)
+        yield ChainResult(chunk, chunk["Date"].dt.strftime("%Y-%m-%d").tolist(), am, pm, survival)
+
+
+def assess_risk(survival, am, pm, fish_count):
+    deaths = (100 - survival) / 100 * fish_count
+    high = (deaths >= 1000) | (survival < 99.95) | (am < 30) | (pm < 30) | (am < 0) | (pm < 0)
+    return np.where((survival != 100) & high, "High", "Low")
+
+
+def format_results(result, fish_count):
+    risk = assess_risk(result.survival, result.am, result.pm, fish_count)
+    return [
+        {
+            "date": date,
+            "am_transparency": float(round(am, 2)),
+            "pm_transparency": float(round(pm, 2)),
+            "predicted_survival": float(round(survival, 4)),
+            "risk_level": str(level)
+        }
+        for date, am, pm, survival, level in zip(result.dates, result.am, result.pm, result.survival, risk)
+    ]
@@ -0,0 +1,91 @@
+"""
+Prometheus metrics for the app, kept with ``prometheus_client``.
+
+Stage and request latencies are histograms, so p50/p95/p99 are computed by
+Prometheus (``histogram_quantile``) over any window and can be aggregated
+across workers and hosts. Values that other components already count
+(weather cache hits, upstream failures, model loads) stay with them:
+``add_collector`` registers a function reporting their current totals, and
+``publish()``, called after every request, adds what each total gained since
+the previous call to a Prometheus counter instead of double-counting on the
+request path.
+
+Under gunicorn every worker has its own process, so gunicorn.conf.py points
+``PROMETHEUS_MULTIPROC_DIR`` at a fresh directory before the workers start.
+Each worker then writes its samples to files there and a scrape merges all of
+them (``MultiProcessCollector``), whichever worker answers it. Without that
+variable (flask dev server, benchmarks) the process's own registry is used.
+"""
+import os
+import threading
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+
+# Model stages take from well under a millisecond to a few seconds
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "aquavitals_stage_seconds", "Time spent in each weather/inference stage.", ["stage"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "aquavitals_request_seconds", "End-to-end request latency.", ["endpoint", "status"], buckets=REQUEST_BUCKETS
+)
+ERRORS = Counter(
+    "aquavitals_errors_total", "Requests that failed, by cause.", ["cause"]
+)
+
+_collectors = []
+_collected = {}
+_published = {}
+_publish_lock = threading.Lock()
+
+
+def timed(stage):
+    """``with timed("spring_temp"): ...`` records the block under ``aquavitals_stage_seconds``."""
+    return STAGE_SECONDS.labels(stage).time()
+
+
+def add_collector(collect):
+    """
+    Registers ``collect() -> [(name, help, labelnames, [(label_values, total)])]``
+    reporting running totals owned by other components; ``publish`` turns them
+    into Prometheus counters.
+    """
+    _collectors.append(collect)
+
+
+def publish():
+    """Adds what every collected total gained since the last call to its counter."""
+    # Cheap enough to run per request; a thread finding it busy leaves the
+    # increments to the one already publishing
+    if not _publish_lock.acquire(blocking=False):
+        return
+    try:
+        for collect in _collectors:
+            for name, help_text, labelnames, samples in collect():
+                counter = _collected.get(name)
+                if counter is None:
+                    counter = _collected[name] = Counter(name, help_text, labelnames)
+                for label_values, total in samples:
+                    key = (name, tuple(label_values))
+                    child = counter.labels(*label_values) if labelnames else counter
+                    gained = total - _published.get(key, 0)
+                    if gained > 0:
+                        child.inc(gained)
+                    _published[key] = total
+    finally:
+        _publish_lock.release()
+
+
+def render():
+    """Returns ``(body, content type)`` of a scrape: every worker's samples in multiprocess mode."""
+    publish()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
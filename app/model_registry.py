@@ -0,0 +1,267 @@
+"""
+Process-wide registry for the serving models.
+
+Each artifact is loaded once (lazily on first use, or eagerly via ``preload``)
+and shared by every request thread in the worker. An artifact is reloaded when
+its file modification time changes, so models can be swapped on disk without
+restarting gunicorn.
+
+When a compiled ``.npz`` export (see ``src/compiled_model.py``) sits next to a
+``.joblib`` file it is served instead, which avoids importing sklearn/xgboost.
+Set ``AQUAVITALS_MODEL_FORMAT`` to ``joblib`` or ``compiled`` to force one.
+The format is chosen again whenever the ``.joblib``, ``.npz`` or schema file
+changes, so dropping in (or removing) an export is picked up like any swap.
+
+A ``<artifact>.schema.json`` feature schema (``src/feature_schema.py``) next
+to an artifact is checked against the model when it loads and attached as
+``model.feature_schema``; a model that doesn't match its schema is not served.
+"""
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; memory stats are reported as None
+    psutil = None
+
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+MODEL_FILES = {
+    "spring_temp": "spring_temp_model.joblib",
+    "am_transparency": "am_transparency_model.joblib",
+    "pm_transparency": "pm_transparency_model.joblib",
+    "fish_survival": "fish_survial_model.joblib",
+}
+
+# Artifacts that may be absent; callers check ``has_artifact`` before using them.
+# "transparency" is the multi-output AM+PM model (src/py/train_all.py); when it's
+# missing the chain falls back to the separate AM and PM models.
+OPTIONAL_MODEL_FILES = {
+    "transparency": "transparency_model.joblib",
+}
+
+# How often (seconds) an artifact's mtime is re-checked for hot reload
+RELOAD_CHECK_INTERVAL = float(os.environ.get("AQUAVITALS_RELOAD_CHECK_INTERVAL", 2.0))
+
+# "auto" serves the compiled .npz export when present, else the .joblib pipeline
+MODEL_FORMAT = os.environ.get("AQUAVITALS_MODEL_FORMAT", "auto")
+
+
+def _load_joblib(path):
+    import joblib
+    return joblib.load(path)
+
+
+def _load_compiled(path):
+    from compiled_model import CompiledPipeline
+    return CompiledPipeline.load(path)
+
+
+def _with_feature_schema(load, artifact_path):
+    """
+    Loads a model and attaches its ``<artifact>.schema.json`` (if any) as
+    ``model.feature_schema``, refusing a model that doesn't match it.
+    """
+    model = load()
+    from feature_schema import FeatureSchema, schema_path
+
+    path = schema_path(artifact_path)
+    if os.path.exists(path):
+        schema = FeatureSchema.load(path)
+        schema.check_model(model)
+        model.feature_schema = schema
+    return model
+
+
+def _watched_mtimes(artifact):
+    """mtimes of an artifact's .joblib, .npz export and schema (None for a missing file)."""
+    base = os.path.splitext(artifact)[0]
+    mtimes = []
+    for path in (artifact, base + ".npz", base + ".schema.json"):
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def _rss_bytes():
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+class _Entry:
+    def __init__(self, name, loader, artifact=None):
+        self.name = name
+        self.loader = loader
+        # File-backed entries: the .joblib artifact path, and the file served from it
+        self.artifact = artifact
+        self.path = None
+        self.model = None
+        # Set once the loader has run, so a loader that returns None isn't retried
+        self.loaded = False
+        self.mtimes = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+        self.load_count = 0
+        self.last_checked = 0.0
+
+
+class ModelRegistry:
+    """
+    Thread-safe, load-once cache of model objects keyed by name.
+
+    Args:
+        model_dir (str): Directory holding the ``.joblib`` artifacts.
+        files (dict): Mapping of model name -> artifact file name.
+        check_interval (float): Minimum seconds between mtime checks per model.
+        model_format (str): "auto", "compiled" or "joblib".
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, files=None, check_interval=RELOAD_CHECK_INTERVAL,
+                 model_format=MODEL_FORMAT):
+        if model_format not in ("auto", "compiled", "joblib"):
+            raise ValueError(f"Unknown model format: {model_format}")
+        self.model_dir = model_dir
+        self.check_interval = check_interval
+        self.model_format = model_format
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._fingerprint = None
+        self._fingerprint_checked = 0.0
+        for name, filename in (files or {**MODEL_FILES, **OPTIONAL_MODEL_FILES}).items():
+            self.register_file(name, filename)
+
+    def register_file(self, name, filename):
+        entry = _Entry(name, None, artifact=os.path.join(self.model_dir, filename))
+        entry.path, _ = self._artifact_choice(entry.artifact)
+        self._entries[name] = entry
+
+    def _artifact_choice(self, artifact):
+        """Returns (file to serve, loader) for ``artifact`` under the format setting and what's on disk now."""
+        compiled = os.path.splitext(artifact)[0] + ".npz"
+        if self.model_format == "compiled" or (self.model_format == "auto" and os.path.exists(compiled)):
+            return compiled, lambda: _with_feature_schema(lambda: _load_compiled(compiled), artifact)
+        return artifact, lambda: _with_feature_schema(lambda: _load_joblib(artifact), artifact)
+
+    def register(self, name, loader):
+        """
+        Registers a non-file resource (e.g. a text encoder) built by ``loader()``.
+        A loader that returns None (nothing to load) is not called again.
+        """
+        self._entries[name] = _Entry(name, loader)
+
+    def has_artifact(self, name):
+        """True if ``name`` is a loaded model or a file-backed entry whose file exists."""
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        return entry.model is not None or (
+            entry.artifact is not None and os.path.exists(self._artifact_choice(entry.artifact)[0])
+        )
+
+    def names(self):
+        return list(self._entries)
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry.loaded and not self._needs_reload(entry):
+            return entry.model
+
+        with self._lock:
+            # Another thread may have loaded it while we waited on the lock
+            if not entry.loaded:
+                self._load(entry)
+            elif self._needs_reload(entry, force_check=True):
+                try:
+                    self._load(entry)
+                except Exception:
+                    # A half-written artifact shouldn't take the worker down;
+                    # keep the previous model and retry on the next check.
+                    pass
+            return entry.model
+
+    def preload(self, names=None):
+        for name in names or self.names():
+            self.get(name)
+
+    def fingerprint(self):
+        """
+        Short hash of the name, size and mtime of every file in ``model_dir``.
+
+        Changes whenever any artifact is added, replaced or removed, so it can
+        version anything derived from the models. Re-checked at most every
+        ``check_interval`` seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._fingerprint is None or now - self._fingerprint_checked >= self.check_interval:
+                try:
+                    files = sorted(
+                        (item.name, item.stat().st_size, item.stat().st_mtime_ns)
+                        for item in os.scandir(self.model_dir) if item.is_file()
+                    )
+                except OSError:
+                    files = []
+                self._fingerprint = hashlib.sha256(repr(files).encode()).hexdigest()[:16]
+                self._fingerprint_checked = now
+            return self._fingerprint
+
+    def load_counts(self):
+        """Times each entry has been (re)loaded, without touching the disk."""
+        return {name: entry.load_count for name, entry in self._entries.items()}
+
+    def stats(self):
+        stats = {}
+        for name, entry in self._entries.items():
+            stats[name] = {
+                "path": entry.path,
+                "type": type(entry.model).__name__ if entry.model is not None else None,
+                "loaded": entry.loaded,
+                "load_count": entry.load_count,
+                "loaded_at": entry.loaded_at,
+                "load_seconds": entry.load_seconds,
+                "file_bytes": os.path.getsize(entry.path) if entry.path and os.path.exists(entry.path) else None,
+                "rss_delta_bytes": entry.rss_delta_bytes,
+                "feature_schema": getattr(getattr(entry.model, "feature_schema", None), "version", None),
+            }
+        return stats
+
+    def _needs_reload(self, entry, force_check=False):
+        if entry.artifact is None:
+            return False
+        now = time.monotonic()
+        if not force_check and now - entry.last_checked < self.check_interval:
+            return False
+        entry.last_checked = now
+        if not os.path.exists(self._artifact_choice(entry.artifact)[0]):
+            # Artifact vanished mid-swap: keep serving the copy we already have
+            return False
+        return _watched_mtimes(entry.artifact) != entry.mtimes
+
+    def _load(self, entry):
+        if entry.artifact is not None:
+            mtimes = _watched_mtimes(entry.artifact)
+            path, loader = self._artifact_choice(entry.artifact)
+        else:
+            mtimes, path, loader = None, None, entry.loader
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+
+        model = loader()
+
+        entry.load_seconds = time.perf_counter() - start
+        rss_after = _rss_bytes()
+        entry.rss_delta_bytes = rss_after - rss_before if rss_before is not None else None
+        entry.mtimes = mtimes
+        entry.path = path
+        entry.loaded_at = time.time()
+        entry.last_checked = time.monotonic()
+        entry.load_count += 1
+        entry.model = model
+        entry.loaded = True
@@ -0,0 +1,113 @@
+"""
+Bounded pool for the CPU-bound part of a request (the model chain).
+
+Under gevent workers (``AQUAVITALS_WORKER_CLASS=gevent``) every request is
+a greenlet on one event loop, so running inference inline would stall all
+the other requests, including ones only waiting on Open-Meteo. ``run_cpu``
+hands the call to gevent's native thread pool instead, and the greenlet
+yields until the result is ready.
+
+Under sync/gthread workers the call runs on the request thread. A semaphore
+limits how many requests run inference at once, so a burst doesn't
+oversubscribe the cores.
+
+``map_cpu`` splits a single large job (Monte Carlo scenarios) into pieces
+that run in parallel on the same pool, each piece taking one of its slots, so
+the pieces count against the same limit as every other request.
+
+Configuration (environment):
+    AQUAVITALS_CPU_WORKERS   Concurrent inference calls per worker (default: CPU count)
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import timed
+
+
+CPU_WORKERS = int(os.environ.get("AQUAVITALS_CPU_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def _gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:  # gevent is only needed for the async worker mode
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def _gevent_hub():
+    """Returns the gevent hub if this process has been monkey-patched, else None."""
+    if not _gevent_patched():
+        return None
+    from gevent import get_hub
+    return get_hub()
+
+
+class CpuPool:
+    """
+    Runs CPU-bound callables with at most ``size`` in flight.
+
+    Args:
+        size (int): Maximum concurrent calls.
+    """
+
+    def __init__(self, size=CPU_WORKERS):
+        self.size = size
+        self._hub = _gevent_hub()
+        if self._hub is not None:
+            self._hub.threadpool.maxsize = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def run(self, fn, *args, **kwargs):
+        if self._hub is not None:
+            return self._hub.threadpool.apply(fn, args, kwargs)
+        with timed("cpu_queue"):
+            self._slots.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._slots.release()
+
+    def map(self, fn, items):
+        """``[fn(item) for item in items]``, the items running concurrently as pool calls."""
+        if self._hub is not None:
+            return [result.get() for result in [self._hub.threadpool.spawn(fn, item) for item in items]]
+        if self.size <= 1 or len(items) <= 1:
+            return [self.run(fn, item) for item in items]
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="cpu")
+        # Each item still takes a slot, shared with the inline ``run`` calls
+        return list(self._executor.map(lambda item: self.run(fn, item), items))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _cpu_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Created lazily: gunicorn's gevent worker patches after the app is imported
+                _pool = CpuPool()
+    return _pool
+
+
+def run_cpu(fn, *args, **kwargs):
+    """Runs ``fn(*args, **kwargs)`` in this worker's bounded CPU pool and returns its result."""
+    return _cpu_pool().run(fn, *args, **kwargs)
+
+
+def map_cpu(fn, items):
+    """
+    ``[fn(item) for item in items]`` with the items spread over this worker's
+    bounded CPU pool, for splitting one large NumPy-bound job (NumPy releases
+    the GIL). Call it from the request, not from inside ``run_cpu``: the items
+    wait for free slots, and the caller would be holding one.
+    """
+    return _cpu_pool().map(fn, items)
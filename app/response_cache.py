@@ -0,0 +1,78 @@
+"""
+Memoized prediction responses.
+
+A prediction depends only on the fish count, the history/forecast weather
+rows and the model artifacts. Identical requests (the same weekly window
+asked for by several operators) are answered from a cache keyed by a
+SHA-256 of the normalized payload plus ``ModelRegistry.fingerprint()``.
+Replacing any file in ``app/models/`` changes every key, so stale results
+are never served; the old entries just age out.
+
+Configuration (environment):
+    AQUAVITALS_RESPONSE_CACHE_DB     SQLite file shared by all workers (default: in-memory per worker)
+    AQUAVITALS_RESPONSE_CACHE_TTL    Seconds an entry stays fresh (default 600; 0 disables the cache)
+    AQUAVITALS_RESPONSE_CACHE_SIZE   Maximum entries, least recently used evicted first (default 1024)
+"""
+import hashlib
+import json
+import os
+import threading
+
+from cache_backends import backend_from_env
+
+
+RESPONSE_CACHE_TTL = float(os.environ.get("AQUAVITALS_RESPONSE_CACHE_TTL", 600))
+RESPONSE_CACHE_SIZE = int(os.environ.get("AQUAVITALS_RESPONSE_CACHE_SIZE", 1024))
+
+
+def payload_key(fish_count, history, forecast, version=""):
+    """
+    Canonical hash of a prediction request.
+
+    Rows are serialized with sorted keys and no whitespace, and the fish count
+    as an int, so payloads that differ only in key order, spacing or
+    ``"25000"`` vs ``25000`` share a key.
+    """
+    canonical = json.dumps(
+        {"fish_count": int(fish_count), "history": history, "forecast": forecast},
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(f"{version}|{canonical}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Args:
+        backend: A ``cache_backends`` store.
+        ttl (float): Lifetime of an entry in seconds; 0 disables the cache.
+    """
+
+    def __init__(self, backend=None, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_SIZE):
+        self.backend = backend if backend is not None else backend_from_env(
+            "AQUAVITALS_RESPONSE_CACHE_DB", "responses", max_entries=max_entries
+        )
+        self.ttl = ttl
+        # Request threads share the cache; the counters are updated under this lock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        """Returns the cached results for ``key``, or None."""
+        if not self.enabled:
+            return None
+        found = self.backend.get_many([key]).get(key)
+        with self._lock:
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return found
+
+    def set(self, key, results):
+        if self.enabled:
+            self.backend.set_many({key: (results, self.ttl)})
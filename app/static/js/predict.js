@@ -1,5 +1,13 @@
 let reportHistory = {}; // store predictions by date
 
+// true: one POST to /forecast_risk (weather + models server-side)
+// false: legacy two-step /process_dates -> /predict_api flow
+const USE_FORECAST_RISK = true;
+
+// true: /forecast_risk streams one NDJSON line per day and rows are rendered
+// as they arrive (only used with USE_FORECAST_RISK)
+const USE_STREAMING = true;
+
 document.addEventListener("DOMContentLoaded", function () {
   const predictButton = document.getElementById("predictButton");
   const dateRangePickerInput = document.getElementById("date-range-picker");
@@ -51,25 +59,14 @@ document.addEventListener("DOMContentLoaded", function () {
     predictionTableBody.innerHTML = `<tr><td colspan="5">Fetching prediction...</td></tr>`;
 
     try {
-      const processRes = await fetch("/process_dates", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          start_date: startDate,
-          end_date: endDate,
-          fish_count: fishCount,
-        }),
-      });
-
-      const weatherData = await processRes.json();
-
-      const predictionRes = await fetch("/predict_api", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(weatherData),
-      });
-
-      const predictionData = await predictionRes.json();
+      if (USE_FORECAST_RISK && USE_STREAMING) {
+        await streamForecastRisk(startDate, endDate, fishCount);
+        return;
+      }
+
+      const predictionData = USE_FORECAST_RISK
+        ? await fetchForecastRisk(startDate, endDate, fishCount)
+        : await fetchTwoStepPrediction(startDate, endDate, fishCount);
 
       if (!Array.isArray(predictionData)) {
         predictionTableBody.innerHTML = `<tr><td colspan="5">Error: ${predictionData.error}</td></tr>`;
@@ -83,55 +80,146 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   });
 
+  async function fetchForecastRisk(startDate, endDate, fishCount) {
+    const res = await fetch("/forecast_risk", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        start_date: startDate,
+        end_date: endDate,
+        fish_count: fishCount,
+      }),
+    });
+    return res.json();
+  }
+
+  // Reads the NDJSON stream and appends each day's row as soon as it arrives
+  async function streamForecastRisk(startDate, endDate, fishCount) {
+    const res = await fetch("/forecast_risk?stream=ndjson", {
+      method: "POST",
+      headers: { "Content-Type": "application/json", Accept: "application/x-ndjson" },
+      body: JSON.stringify({
+        start_date: startDate,
+        end_date: endDate,
+        fish_count: fishCount,
+      }),
+    });
+
+    // Validation and weather errors are plain JSON responses
+    if (!(res.headers.get("Content-Type") || "").includes("application/x-ndjson")) {
+      const error = await res.json();
+      predictionTableBody.innerHTML = `<tr><td colspan="5">Error: ${error.error}</td></tr>`;
+      return;
+    }
+
+    const chartData = { dates: [], amValues: [], pmValues: [] };
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    let rows = 0;
+
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const entry = JSON.parse(line);
+      if (entry.error) {
+        predictionTableBody.insertAdjacentHTML("beforeend", `<tr><td colspan="5">Error: ${entry.error}</td></tr>`);
+        return;
+      }
+      if (rows === 0) predictionTableBody.innerHTML = "";
+      appendPredictionRow(entry, fishCount, chartData);
+      rows += 1;
+    };
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split("\n");
+      buffered = lines.pop();
+      lines.forEach(handleLine);
+    }
+    handleLine(buffered + decoder.decode());
+
+    renderCharts(chartData);
+  }
+
+  async function fetchTwoStepPrediction(startDate, endDate, fishCount) {
+    const processRes = await fetch("/process_dates", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        start_date: startDate,
+        end_date: endDate,
+        fish_count: fishCount,
+      }),
+    });
+
+    const weatherData = await processRes.json();
+
+    const predictionRes = await fetch("/predict_api", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(weatherData),
+    });
+
+    return predictionRes.json();
+  }
+
   function populatePredictionTable(data, fishCount) {
     predictionTableBody.innerHTML = "";
 
         // Create arrays for charts
-    const dates = [];
-    const amValues = [];
-    const pmValues = [];
-
-    data.forEach((entry) => {
-      const row = document.createElement("tr");
-
-
-      row.innerHTML = `
-        <td>${entry.date}</td>
-        <td>${entry.am_transparency.toFixed(2)}</td>
-        <td>${entry.pm_transparency.toFixed(2)}</td>
-        <td>${entry.predicted_survival.toFixed(2)}</td>
-        <td>${entry.risk_level}</td>
-      `;
-      if (entry.risk_level === "High") {
-        row.classList.add("high-risk");
-      }
-      predictionTableBody.appendChild(row);
-
-      // Store for report generation
-      reportHistory[entry.date] = {
-        fishCount: fishCount,
-        temp: entry.temperature || "N/A",
-        rainfall: entry.rainfall || "N/A",
-        amTransparency: entry.am_transparency,
-        pmTransparency: entry.pm_transparency,
-        survivalRate: entry.predicted_survival,
-        riskLevel: entry.risk_level,
-        suggestion: getSuggestion(entry.risk_level),
-      };
-
-      // Add to dropdown if not already there
-      const dropdown = document.getElementById("report-date");
-      if (![...dropdown.options].some((opt) => opt.value === entry.date)) {
-        const option = document.createElement("option");
-        option.value = entry.date;
-        option.textContent = entry.date;
-        dropdown.appendChild(option);
-      }
-            // Collect data for charts
-      dates.push(entry.date);
-      amValues.push(entry.am_transparency);
-      pmValues.push(entry.pm_transparency);
-    });
+    const chartData = { dates: [], amValues: [], pmValues: [] };
+
+    data.forEach((entry) => appendPredictionRow(entry, fishCount, chartData));
+
+    renderCharts(chartData);
+  }
+
+  function appendPredictionRow(entry, fishCount, chartData) {
+    const row = document.createElement("tr");
+
+
+    row.innerHTML = `
+      <td>${entry.date}</td>
+      <td>${entry.am_transparency.toFixed(2)}</td>
+      <td>${entry.pm_transparency.toFixed(2)}</td>
+      <td>${entry.predicted_survival.toFixed(2)}</td>
+      <td>${entry.risk_level}</td>
+    `;
+    if (entry.risk_level === "High") {
+      row.classList.add("high-risk");
+    }
+    predictionTableBody.appendChild(row);
+
+    // Store for report generation
+    reportHistory[entry.date] = {
+      fishCount: fishCount,
+      temp: entry.temperature || "N/A",
+      rainfall: entry.rainfall || "N/A",
+      amTransparency: entry.am_transparency,
+      pmTransparency: entry.pm_transparency,
+      survivalRate: entry.predicted_survival,
+      riskLevel: entry.risk_level,
+      suggestion: getSuggestion(entry.risk_level),
+    };
+
+    // Add to dropdown if not already there
+    const dropdown = document.getElementById("report-date");
+    if (![...dropdown.options].some((opt) => opt.value === entry.date)) {
+      const option = document.createElement("option");
+      option.value = entry.date;
+      option.textContent = entry.date;
+      dropdown.appendChild(option);
+    }
+
+    // Collect data for charts
+    chartData.dates.push(entry.date);
+    chartData.amValues.push(entry.am_transparency);
+    chartData.pmValues.push(entry.pm_transparency);
+  }
+
+  function renderCharts({ dates, amValues, pmValues }) {
         // Make sure predictionCard is visible first
     predictionCard.style.display = "block";
 
@@ -0,0 +1,173 @@
+"""
+Monte Carlo uncertainty for the survival risk.
+
+The deterministic chain scores one weather forecast. In uncertainty mode the
+forecast days are perturbed into ``scenarios`` plausible alternatives, and
+every scenario goes through the spring temp -> transparency -> survival
+chain. Each day then reports how often its risk thresholds were exceeded.
+
+The scenarios are stacked into one frame, so each model stage is a single
+batched ``predict`` over every scenario-day (``inference.run_stacked``), not a
+chain run per scenario. Large requests are split into chunks of
+``SCENARIO_CHUNK`` scenarios that ``offload.map_cpu`` scores in parallel on
+the worker's bounded CPU pool (``AQUAVITALS_CPU_WORKERS``), each chunk
+taking one slot like any other inference call.
+
+Forecast error model (history days are observations and stay as they are):
+    * air temperatures: max and min shift together by N(0, temp_sd * sqrt(lead day))
+    * rain: both stations scale by one lognormal(0, rain_log_sd) factor per day; a dry
+      day gets surprise rain (exponential, mean surprise_mean) with probability
+      surprise_prob
+
+The magnitudes are a ``ForecastError``; ``DEFAULT_FORECAST_ERROR`` is used
+unless a calibrated one is passed in.
+
+All draws come from one seeded generator before the work is split up, so a
+given ``seed`` gives the same answer for any chunk size or worker count.
+
+Configuration (environment):
+    AQUAVITALS_MAX_SCENARIOS   Largest ``scenarios`` one request may ask for (default 1000)
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from feature_assembly import add_rain_interactions
+from inference import assess_risk, format_results, run_chain, run_stacked
+from metrics import timed
+from offload import map_cpu, run_cpu
+
+
+DEFAULT_SCENARIOS = 200
+MAX_SCENARIOS = int(os.environ.get("AQUAVITALS_MAX_SCENARIOS", 1000))
+
+# Scenarios per stacked chain evaluation
+SCENARIO_CHUNK = 100
+
+# Starting values, not fitted to this site's forecasts:
+#   * 2.5 F is roughly the typical error of a next-day max/min temperature
+#     forecast; errors are taken to grow like a random walk, with sqrt(lead)
+#   * a log-sd of 0.6 puts two thirds of the days' rain between about half
+#     (x0.55) and double (x1.8) the forecast amount
+#   * one dry forecast day in ten gets light rain the forecast missed, 0.1 in
+#     on average
+# To calibrate, compare archived forecasts with the observed station weather
+# for the same days and pass the fitted ForecastError.
+TEMP_SD_F = 2.5
+RAIN_LOG_SD = 0.6
+RAIN_SURPRISE_PROB = 0.1
+RAIN_SURPRISE_MEAN = 0.1
+
+ForecastError = namedtuple("ForecastError", ["temp_sd", "rain_log_sd", "surprise_prob", "surprise_mean"])
+DEFAULT_FORECAST_ERROR = ForecastError(TEMP_SD_F, RAIN_LOG_SD, RAIN_SURPRISE_PROB, RAIN_SURPRISE_MEAN)
+
+
+def draw_perturbations(n_scenarios, n_history, n_days, seed=0, error=DEFAULT_FORECAST_ERROR):
+    """Returns (temperature shift, rain factor, surprise rain), each (n_scenarios, forecast days)."""
+    rng = np.random.default_rng(seed)
+    shape = (n_scenarios, n_days - n_history)
+    lead = np.arange(1, n_days - n_history + 1)
+    temp_shift = rng.normal(0.0, error.temp_sd, shape) * np.sqrt(lead)
+    rain_factor = rng.lognormal(0.0, error.rain_log_sd, shape)
+    surprise = (rng.random(shape) < error.surprise_prob) * rng.exponential(error.surprise_mean, shape)
+    return temp_shift, rain_factor, surprise
+
+
+def perturbed_frame(df, n_history, temp_shift, rain_factor, surprise):
+    """
+    Stacks one copy of ``df`` per row of the perturbation arrays, with the
+    forecast days perturbed; returns (frame, segments) for ``run_stacked``.
+    """
+    n_scenarios, n = len(temp_shift), len(df)
+    stacked = df.iloc[np.tile(np.arange(n), n_scenarios)].reset_index(drop=True)
+    rows = (np.arange(n_scenarios)[:, None] * n + np.arange(n_history, n)).ravel()
+
+    for col in ["Max air temp", "Min air temp"]:
+        values = stacked[col].to_numpy(dtype=np.float64, copy=True)
+        values[rows] += temp_shift.ravel()
+        stacked[col] = values
+    for col in ["Dec Rain", "Calmar Rain"]:
+        values = stacked[col].to_numpy(dtype=np.float64, copy=True)
+        base = values[rows]
+        values[rows] = np.where(base > 0, base * rain_factor.ravel(), surprise.ravel())
+        stacked[col] = values
+
+    stacked = add_rain_interactions(stacked, ["Total Rain", "Max Air Temp x Rain"])
+    return stacked, [(k * n, (k + 1) * n, n_history) for k in range(n_scenarios)]
+
+
+def run_scenarios(df, n_history, models, embed_comments, n_scenarios, seed=0, chunk=SCENARIO_CHUNK,
+                  error=DEFAULT_FORECAST_ERROR):
+    """
+    Scores ``n_scenarios`` perturbed copies of the forecast in ``df``.
+
+    Args:
+        df (pd.DataFrame): Output of ``prepare_weather_frame``.
+        n_history (int): Number of leading history rows (not perturbed or predicted).
+        models (ChainModels): The fitted pipelines.
+        embed_comments (callable): ``(comments, index) -> DataFrame`` of text_emb_* columns.
+        n_scenarios (int): Number of scenarios.
+        seed (int): Seed of the perturbation draws.
+        chunk (int): Scenarios per stacked evaluation.
+        error (ForecastError): Magnitudes of the forecast perturbations.
+
+    Returns:
+        tuple: (am, pm, survival) arrays of shape (n_scenarios, forecast days).
+    """
+    temp_shift, rain_factor, surprise = draw_perturbations(n_scenarios, n_history, len(df), seed, error)
+
+    def score(part):
+        stacked, segments = perturbed_frame(df, n_history, temp_shift[part], rain_factor[part], surprise[part])
+        _, am, pm, survival = run_stacked(stacked, segments, models, embed_comments)
+        return am, pm, survival
+
+    parts = [slice(start, start + chunk) for start in range(0, n_scenarios, chunk)]
+    with timed("scenarios"):
+        scored = map_cpu(score, parts)
+    days = len(df) - n_history
+    return tuple(np.concatenate([s[k] for s in scored]).reshape(n_scenarios, days) for k in range(3))
+
+
+def summarize(base_results, am, pm, survival, fish_count):
+    """
+    Adds an ``uncertainty`` entry to each day of ``base_results`` (the
+    deterministic ``format_results`` rows) with the scenario quantiles and
+    the probability of exceeding each risk threshold of ``assess_risk``.
+    """
+    high = assess_risk(survival, am, pm, fish_count) == "High"
+    deaths = (100 - survival) / 100 * fish_count
+    exceed = {
+        "p_high_risk": high,
+        "p_deaths_over_1000": deaths >= 1000,
+        "p_survival_below_99_95": survival < 99.95,
+        "p_am_transparency_below_30": am < 30,
+        "p_pm_transparency_below_30": pm < 30,
+    }
+    probabilities = {name: mask.mean(axis=0) for name, mask in exceed.items()}
+    quantiles = {
+        name: np.percentile(values, [5, 50, 95], axis=0)
+        for name, values in [("survival", survival), ("am_transparency", am), ("pm_transparency", pm)]
+    }
+
+    for j, record in enumerate(base_results):
+        record["uncertainty"] = {
+            "scenarios": len(survival),
+            **{name: float(round(p[j], 4)) for name, p in probabilities.items()},
+            **{f"{name}_{label}": float(round(q[k, j], 4))
+               for name, q in quantiles.items() for k, label in enumerate(["p05", "p50", "p95"])},
+        }
+    return base_results
+
+
+def predict_with_uncertainty(df, n_history, models, embed_comments, fish_count, n_scenarios, seed=0,
+                             error=DEFAULT_FORECAST_ERROR):
+    """
+    The deterministic results for ``df``, each day extended with its Monte
+    Carlo summary (scenarios drawn with the ``error`` magnitudes). Runs its
+    own model work on the CPU pool, so call it from the request rather than
+    through ``run_cpu``.
+    """
+    base = format_results(run_cpu(run_chain, df.copy(), n_history, models, embed_comments), fish_count)
+    am, pm, survival = run_scenarios(df, n_history, models, embed_comments, n_scenarios, seed, error=error)
+    return summarize(base, am, pm, survival, fish_count)
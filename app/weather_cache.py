@@ -0,0 +1,144 @@
+"""
+Day-level cache in front of the Open-Meteo daily forecast API.
+
+Weather is cached per (location, variables, day). A request for a date range
+is served from cached days, and only the missing sub-ranges are fetched
+upstream. Days before today (in the forecast timezone) never expire. Today
+and future days expire after ``FORECAST_TTL`` seconds, because the forecast
+for them keeps changing.
+
+Configuration (environment):
+    OPEN_METEO_URL                    Upstream endpoint (point at a local stub for testing)
+    AQUAVITALS_WEATHER_CACHE_DB       SQLite file shared by all workers (default: in-memory)
+    AQUAVITALS_WEATHER_FORECAST_TTL   Seconds a forecast day stays fresh (default 3600)
+"""
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import requests
+
+from cache_backends import backend_from_env
+
+
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+TIMEZONE = "America/Chicago"
+FORECAST_TTL = float(os.environ.get("AQUAVITALS_WEATHER_FORECAST_TTL", 3600))
+REQUEST_TIMEOUT = 10
+
+Location = namedtuple("Location", ["name", "latitude", "longitude"])
+
+
+def fetch_open_meteo(location, variables, start, end):
+    """Fetches ``variables`` for ``start``..``end`` (inclusive); returns the ``daily`` block."""
+    params = {
+        "latitude": location.latitude,
+        "longitude": location.longitude,
+        "daily": list(variables),
+        "timezone": TIMEZONE,
+        "start_date": start.strftime('%Y-%m-%d'),
+        "end_date": end.strftime('%Y-%m-%d')
+    }
+    response = requests.get(OPEN_METEO_URL, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["daily"]
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _missing_ranges(days, cached):
+    """Groups the days that aren't cached into contiguous (start, end) ranges."""
+    ranges = []
+    for day in days:
+        if day.isoformat() in cached:
+            continue
+        if ranges and ranges[-1][1] == day - timedelta(days=1):
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(r) for r in ranges]
+
+
+class WeatherCache:
+    """
+    Serves daily weather ranges from a cache, fetching only the missing days.
+
+    Args:
+        backend: A ``cache_backends`` store.
+        fetch (callable): ``(location, variables, start, end) -> daily dict``.
+        forecast_ttl (float): Lifetime in seconds of today's and future days.
+        past_ttl (float or None): Lifetime of past days; None never expires.
+    """
+
+    def __init__(self, backend=None, fetch=fetch_open_meteo, forecast_ttl=FORECAST_TTL, past_ttl=None):
+        self.backend = backend if backend is not None else backend_from_env("AQUAVITALS_WEATHER_CACHE_DB", "weather")
+        self.fetch = fetch
+        self.forecast_ttl = forecast_ttl
+        self.past_ttl = past_ttl
+        # Request threads share the cache; the counters are updated under this lock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_fallbacks = 0
+
+    def today(self):
+        return datetime.now(ZoneInfo(TIMEZONE)).date()
+
+    def _key(self, location, variables, day):
+        return f"{location.latitude:.4f},{location.longitude:.4f}|{','.join(variables)}|{day}"
+
+    def get_range(self, location, variables, start, end, allow_stale=False):
+        """
+        Returns ``{"time": [...], <variable>: [...]}`` for every day in ``start``..``end``.
+
+        Args:
+            allow_stale (bool): Serve expired entries and never call upstream
+                (used as a fallback when the upstream is unavailable).
+        """
+        variables = tuple(sorted(variables))
+        start, end = _as_date(start), _as_date(end)
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        keys = {day.isoformat(): self._key(location, variables, day) for day in days}
+
+        found = self.backend.get_many(keys.values(), allow_stale=allow_stale)
+        cached = {day: found[key] for day, key in keys.items() if key in found}
+
+        missing = _missing_ranges(days, cached)
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(days) - len(cached)
+        if missing and allow_stale:
+            raise LookupError(f"No cached weather for {location.name} on {len(days) - len(cached)} day(s)")
+
+        today = self.today()
+        for range_start, range_end in missing:
+            daily = self.fetch(location, variables, range_start, range_end)
+            fetched = {}
+            for i, day_str in enumerate(daily["time"]):
+                values = {var: daily[var][i] for var in variables}
+                ttl = self.past_ttl if _as_date(day_str) < today else self.forecast_ttl
+                fetched[keys.get(day_str, self._key(location, variables, day_str))] = (values, ttl)
+                cached[day_str] = values
+            self.backend.set_many(fetched)
+
+        result = {"time": [day.isoformat() for day in days]}
+        for var in variables:
+            result[var] = [cached[day.isoformat()][var] for day in days]
+        return result
+
+    def get_range_or_stale(self, location, variables, start, end):
+        """Like ``get_range``, but serves expired entries when the upstream fails."""
+        try:
+            return self.get_range(location, variables, start, end)
+        except requests.RequestException:
+            with self._lock:
+                self.stale_fallbacks += 1
+            return self.get_range(location, variables, start, end, allow_stale=True)
@@ -0,0 +1,197 @@
+"""
+Pooled, concurrent HTTP client for the Open-Meteo calls.
+
+All upstream requests share one keep-alive ``requests.Session``. Each call
+has a (connect, read) timeout and bounded retries with exponential backoff.
+Every upstream (one per location) gets its own circuit breaker. While a
+breaker is open, calls fail immediately with ``CircuitOpenError``, so callers
+can serve cached data instead of waiting on a dead upstream.
+
+Configuration (environment):
+    AQUAVITALS_WEATHER_CONNECT_TIMEOUT   Seconds (default 3)
+    AQUAVITALS_WEATHER_READ_TIMEOUT      Seconds (default 10)
+    AQUAVITALS_WEATHER_RETRIES           Retries per call (default 2)
+    AQUAVITALS_WEATHER_POOL_SIZE         Concurrent upstream calls and pooled connections (default 8)
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import weather_cache
+
+
+CONNECT_TIMEOUT = float(os.environ.get("AQUAVITALS_WEATHER_CONNECT_TIMEOUT", 3))
+READ_TIMEOUT = float(os.environ.get("AQUAVITALS_WEATHER_READ_TIMEOUT", 10))
+RETRIES = int(os.environ.get("AQUAVITALS_WEATHER_RETRIES", 2))
+POOL_SIZE = int(os.environ.get("AQUAVITALS_WEATHER_POOL_SIZE", 8))
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and stays open for
+    ``reset_timeout`` seconds. After that, one trial call is let through. If
+    it succeeds the breaker closes; if it fails the breaker opens again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class UpstreamStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = None
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            self.errors += 0 if ok else 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.last_seconds = seconds
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "mean_seconds": self.total_seconds / self.calls if self.calls else None,
+            "max_seconds": self.max_seconds,
+            "last_seconds": self.last_seconds,
+        }
+
+
+class WeatherClient:
+    """
+    Args:
+        base_url (str): Open-Meteo daily forecast endpoint.
+        timeout (tuple): (connect, read) timeout in seconds per attempt.
+        retries (int): Retries for connection errors and 429/5xx responses.
+        backoff (float): Exponential backoff factor between retries.
+        max_workers (int): Concurrent upstream calls (also the connection pool size).
+    """
+
+    def __init__(self, base_url=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), retries=RETRIES,
+                 backoff=0.3, max_workers=POOL_SIZE, failure_threshold=3, reset_timeout=30.0):
+        self.base_url = base_url or weather_cache.OPEN_METEO_URL
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="weather")
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._stats = {}
+
+    def _upstream(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._stats[name] = UpstreamStats()
+            return self._breakers[name], self._stats[name]
+
+    def fetch(self, location, variables, start, end):
+        """Same contract as ``weather_cache.fetch_open_meteo``; usable as a WeatherCache fetcher."""
+        breaker, stats = self._upstream(location.name)
+        if not breaker.allow():
+            stats.record_rejected()
+            raise CircuitOpenError(f"Circuit open for {location.name}")
+
+        params = {
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "daily": list(variables),
+            "timezone": weather_cache.TIMEZONE,
+            "start_date": start.strftime('%Y-%m-%d'),
+            "end_date": end.strftime('%Y-%m-%d')
+        }
+        started = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            daily = response.json()["daily"]
+        except (requests.RequestException, ValueError, KeyError):
+            stats.record(time.perf_counter() - started, ok=False)
+            breaker.record_failure()
+            raise
+        stats.record(time.perf_counter() - started, ok=True)
+        breaker.record_success()
+        return daily
+
+    def gather(self, *calls):
+        """Runs zero-argument callables concurrently; returns their results in order."""
+        futures = [self._executor.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(self._stats[name].as_dict(), breaker=self._breakers[name].state)
+                for name in self._stats
+            }
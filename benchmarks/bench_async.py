@@ -0,0 +1,133 @@
+"""
+Load test: gthread vs gevent gunicorn workers against a slow weather upstream.
+
+Starts the Open-Meteo stub with ``--delay`` seconds of latency, then for each
+worker class starts gunicorn (gunicorn.conf.py, models preloaded) and keeps
+``--concurrency`` clients posting /forecast_risk for ``--duration`` seconds.
+Forecast days expire immediately and the response cache is off, so every
+request waits on the upstream and runs the chain, as a cold cache would.
+
+    python benchmarks/bench_async.py --delay 0.5 --concurrency 32 --duration 15
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from open_meteo_stub import start_stub_server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# Every request misses the weather and response caches
+COLD_CACHE_ENV = {"AQUAVITALS_WEATHER_FORECAST_TTL": "0", "AQUAVITALS_RESPONSE_CACHE_TTL": "0"}
+
+
+def start_gunicorn(worker_class, port, stub_url, workers, threads, env=None):
+    """Starts gunicorn with the models preloaded; returns (process, base URL) once it answers."""
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        OPEN_METEO_URL=stub_url,
+        AQUAVITALS_WORKER_CLASS=worker_class,
+        AQUAVITALS_PRELOAD_MODELS="1",
+        WEB_CONCURRENCY=str(workers),
+        AQUAVITALS_THREADS=str(threads),
+        AQUAVITALS_LOG_LEVEL="WARNING",
+        **(env or {}),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.app:app", "-c", "gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base}/model_status", timeout=1)
+            return process, base
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({worker_class}) did not start")
+
+
+def forecast_body():
+    start = date.today() + timedelta(days=1)
+    return {
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=4)).isoformat(),
+        "fish_count": 25000,
+    }
+
+
+def run_load(base, concurrency, duration):
+    """Returns (completed, errors, latencies) from ``concurrency`` clients over ``duration`` seconds."""
+    body = forecast_body()
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = session.post(f"{base}/forecast_risk", json=body, timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                (latencies if ok else errors).append(time.perf_counter() - started)
+
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return len(latencies), len(errors), np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["gthread", "gevent"])
+    parser.add_argument("--delay", type=float, default=0.5, help="Upstream latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gthread worker")
+    args = parser.parse_args()
+
+    _, stub_state, stub_url = start_stub_server(delay=args.delay)
+
+    print(f"upstream delay {args.delay}s, {args.concurrency} clients, {args.workers} worker(s)\n")
+    print(f"{'mode':<9} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'upstream calls':>15}")
+    for mode in args.modes:
+        process, base = start_gunicorn(mode, free_port(), stub_url, args.workers, args.threads, COLD_CACHE_ENV)
+        try:
+            requests.post(f"{base}/forecast_risk", json=forecast_body(), timeout=60)  # warm up
+            calls_before = stub_state.requests
+            completed, errors, latencies = run_load(base, args.concurrency, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        p50, p95 = (np.percentile(latencies, [50, 95]) * 1000) if completed else (float("nan"),) * 2
+        print(f"{mode:<9} {completed / args.duration:>7.1f} {p50:>8.0f} {p95:>8.0f} {errors:>7} "
+              f"{stub_state.requests - calls_before:>15}")
+
+
+if __name__ == "__main__":
+    main()
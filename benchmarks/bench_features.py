@@ -0,0 +1,169 @@
+"""
+Benchmark: row-wise feature assembly vs the vectorized ``feature_assembly`` module.
+
+Times every vectorized feature (season, rain interactions, the serving
+weather-code comment and the two training comments) against the original
+row-wise code at each ``--rows`` size. tests/test_feature_assembly.py checks
+that both give the same values.
+
+    python benchmarks/bench_features.py --rows 14 400 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "src"))
+
+from comment_embeddings import (
+    CARETAKER_CLARITY_COMMENTS, CARETAKER_RAIN_COMMENT, CARETAKER_TEMP_COMMENTS,
+    TRANSPARENCY_WEATHER_COMMENTS, WEATHER_CODE_COMMENTS,
+)
+from feature_assembly import (
+    add_rain_interactions, fish_caretaker_comments, season_of, transparency_weather_comments,
+    weather_code_comments,
+)
+
+
+# === The original row-wise code, kept as the reference ===
+
+def get_season(month):
+    if month in [12, 1, 2]:
+        return "Winter"
+    elif month in [3, 4, 5]:
+        return "Spring"
+    elif month in [6, 7, 8]:
+        return "Summer"
+    else:
+        return "Fall"
+
+
+def generate_weather_comment_from_code(code, rain, temp_f):
+    if code in WEATHER_CODE_COMMENTS:
+        return WEATHER_CODE_COMMENTS[code]
+    if rain > 0.5:
+        return "Heavy rainfall today."
+    elif rain > 0.2:
+        return "Moderate rain today."
+    elif temp_f > 65:
+        return "Warm and clear."
+    else:
+        return "Cool and calm."
+
+
+def rowwise_weather_comments(df):
+    comments = []
+    for i in range(len(df)):
+        row = df.iloc[i]
+        weather_code = row.get("weathercode", None)
+        rain = row.get("Total Rain", 0)
+        temp_f = row.get("Spring Temp (F)", 0)
+        comments.append(generate_weather_comment_from_code(weather_code, rain, temp_f))
+    return comments
+
+
+def generate_transparency_comment(row):
+    rain = row.get("Total Rain", 0)
+    temp = row.get("Spring Temp (F)", 0)
+
+    heavy, moderate, light, warm, calm = TRANSPARENCY_WEATHER_COMMENTS
+    if rain > 0.5:
+        return heavy
+    elif rain > 0.2:
+        return moderate
+    elif rain > 0:
+        return light
+    elif temp > 65:
+        return warm
+    else:
+        return calm
+
+
+def generate_caretaker_comment(row):
+    murky, clear = CARETAKER_CLARITY_COMMENTS
+    colder, warmer = CARETAKER_TEMP_COMMENTS
+    comments = []
+    if row["AM Transparency"] < 80:
+        comments.append(murky)
+    else:
+        comments.append(clear)
+    if row["Spring Temp (F)"] < 50:
+        comments.append(colder)
+    elif row["Spring Temp (F)"] > 60:
+        comments.append(warmer)
+    if row["Total Rain"] > 0.4:
+        comments.append(CARETAKER_RAIN_COMMENT)
+    return " ".join(comments)
+
+
+def rowwise_assembly(df):
+    df = df.copy()
+    df["Season"] = df["Month"].apply(get_season)
+    df["Spring_Temp x Rain"] = df["Spring Temp (F)"] * (df["Dec Rain"] + df["Calmar Rain"])
+    df["Max Air Temp x Rain"] = df["Max air temp"] * (df["Dec Rain"] + df["Calmar Rain"])
+    df["Total Rain"] = df["Dec Rain"] + df["Calmar Rain"]
+    df["Weather_Comment"] = rowwise_weather_comments(df)
+    df["Transparency_Comment"] = df.apply(generate_transparency_comment, axis=1)
+    df["Caretaker_Comment"] = df.apply(generate_caretaker_comment, axis=1)
+    return df
+
+
+def vectorized_assembly(df):
+    df = df.copy()
+    df["Season"] = season_of(df["Month"])
+    df = add_rain_interactions(df, ["Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain"])
+    df["Weather_Comment"] = weather_code_comments(df)
+    df["Transparency_Comment"] = transparency_weather_comments(df)
+    df["Caretaker_Comment"] = fish_caretaker_comments(df)
+    return df
+
+
+# === Timing ===
+
+def synthetic_frame(n_rows, rng):
+    codes = rng.choice(list(WEATHER_CODE_COMMENTS) + [4, 50, 100, -1], n_rows).astype(float)
+    codes[rng.random(n_rows) < 0.1] = np.nan
+    df = pd.DataFrame({
+        "Month": rng.integers(0, 14, n_rows).astype(float),
+        "weathercode": codes,
+        # Rain and temperatures land on the comment thresholds now and then
+        "Dec Rain": rng.choice([0, 0.1, 0.2, 0.25, 0.4, 0.5], n_rows) * (rng.random(n_rows) < 0.6),
+        "Calmar Rain": rng.choice([0, 0.05, 0.2, 0.3], n_rows) * (rng.random(n_rows) < 0.5),
+        "Spring Temp (F)": rng.choice([45, 50, 55, 60, 65, 70.5], n_rows) + rng.normal(0, 0.5, n_rows).round(),
+        "Max air temp": rng.normal(60, 15, n_rows),
+        "AM Transparency": rng.choice([40, 79.9, 80, 120], n_rows),
+    })
+    for col in ["Month", "Dec Rain", "Spring Temp (F)", "Max air temp"]:
+        df.loc[rng.random(n_rows) < 0.05, col] = np.nan
+    return df
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[14, 37, 400, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'row-wise ms':>12} {'vectorized ms':>14} {'x':>7}")
+    for n_rows in args.rows:
+        df = synthetic_frame(n_rows, np.random.default_rng(n_rows))
+        t_rows = best_of(lambda: rowwise_assembly(df), args.repeat)
+        t_vector = best_of(lambda: vectorized_assembly(df), args.repeat)
+        print(f"{n_rows:>6} {t_rows * 1000:>12.2f} {t_vector * 1000:>14.2f} {t_rows / t_vector:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures worker boot cost with ``python -X importtime``.
+
+Reports the total time to import ``app.app`` and the slowest top-level
+packages, and with --warm also the cost of the first prediction's imports
+and model loads (``app.warm_up()``).
+
+    python benchmarks/bench_importtime.py
+    python benchmarks/bench_importtime.py --warm --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def parse_importtime(stderr):
+    """Returns [(module, self_us, cumulative_us, depth)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def run(statement):
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    return wall, parse_importtime(proc.stderr)
+
+
+def report(label, wall, rows, top):
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"\n{label}: {wall * 1000:.0f} ms wall, {sum(by_package.values()) / 1000:.0f} ms importing "
+          f"{len(rows)} modules")
+    print(f"  {'package':<28}{'self ms':>10}")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {package:<28}{us / 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top", type=int, default=10, help="Packages to list")
+    parser.add_argument("--warm", action="store_true", help="Also time app.warm_up()")
+    args = parser.parse_args()
+
+    wall, rows = run("import app.app")
+    report("import app.app", wall, rows, args.top)
+
+    if args.warm:
+        wall, rows = run("import app.app; app.app.warm_up()")
+        report("import app.app + warm_up()", wall, rows, args.top)
+
+
+if __name__ == "__main__":
+    main()
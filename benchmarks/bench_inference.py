@@ -0,0 +1,171 @@
+"""
+Benchmark: per-day model loop (the original predict_api) vs the batched chain.
+
+Checks that both paths give identical results and prints the speedup for a
+range of forecast horizons. ``--sites`` also compares one ``run_chain`` per
+site with a single stacked ``run_chain_batch`` (the /forecast_risk_batch path).
+
+    python benchmarks/bench_inference.py --horizons 1 5 14 30 90 365
+    python benchmarks/bench_inference.py --horizons 14 --sites 1 10 50 200
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "app"))
+sys.path.append(os.path.join(ROOT, "src"))
+
+from comment_embeddings import EMBEDDING_DIM, load_comment_embeddings
+from feature_assembly import weather_code_comments
+from inference import (
+    TS_COLUMNS, TS_LAGS, TS_WINDOWS, ChainModels, prepare_weather_frame,
+    run_chain, run_chain_batch
+)
+from model_registry import ModelRegistry
+from timeseries_utils import generate_time_series_features
+
+warnings.filterwarnings("ignore")
+
+
+def synthetic_weather(n_days, n_history=7, seed=0):
+    rng = np.random.default_rng(seed)
+    start = date(2025, 4, 1)
+    rows = []
+    for i in range(n_history + n_days):
+        day = start + timedelta(days=i)
+        rows.append({
+            "date": day.isoformat(),
+            "weathercode": int(rng.choice([0, 1, 2, 3, 45, 61, 63, 80, 95])),
+            "max_air_temp": int(rng.integers(30, 90)),
+            "min_air_temp": int(rng.integers(20, 60)),
+            "dec_rain": round(float(rng.random() * 0.8), 1),
+            "calmar_rain": round(float(rng.random() * 0.8), 1),
+            "month": day.month,
+        })
+    return rows[:n_history], rows[n_history:]
+
+
+def make_embedder():
+    table = load_comment_embeddings()
+
+    def embed(comments, index):
+        if table is not None:
+            return table.frame(comments, index=index)
+        # The models drop text_emb_* columns, so zeros are enough for timing
+        return pd.DataFrame(
+            np.zeros((len(index), EMBEDDING_DIM), dtype=np.float32),
+            index=index,
+            columns=[f"text_emb_{j}" for j in range(EMBEDDING_DIM)],
+        )
+    return embed
+
+
+def per_day_chain(df, n_history, models, embed):
+    """The original predict_api loop: every model is called once per forecast day."""
+    for i in range(n_history, len(df)):
+        row = df.iloc[i:i + 1].copy()
+        df.loc[df.index[i], "Spring Temp (F)"] = models.spring.predict(row)[0]
+
+    df["Spring_Temp x Rain"] = df["Spring Temp (F)"] * (df["Dec Rain"] + df["Calmar Rain"])
+    df = generate_time_series_features(df, cols=TS_COLUMNS, lags=TS_LAGS, rolling_windows=TS_WINDOWS)
+    df["Weather_Comment"] = weather_code_comments(df)
+    df = pd.concat([df, embed(df["Weather_Comment"], df.index)], axis=1)
+    df.reset_index(drop=True, inplace=True)
+
+    am_out, pm_out, survival_out = [], [], []
+    for i in range(n_history, len(df)):
+        row = df.iloc[i:i + 1].copy()
+        am = max(0, models.am.predict(row)[0])
+        pm = max(0, models.pm.predict(row)[0])
+        row["AM Transparency"] = am
+        row["PM Transparency"] = pm
+        survival = min(max(models.fish.predict(row)[0], 0.0), 100.0)
+        am_out.append(am)
+        pm_out.append(pm)
+        survival_out.append(survival)
+    return np.array(am_out), np.array(pm_out), np.array(survival_out)
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def compare_sites(n_sites, horizon, models, embed, repeat):
+    """One run_chain per site vs one stacked run_chain_batch; returns (per-site s, batch s, match)."""
+    sites = [synthetic_weather(horizon, seed=seed) for seed in range(n_sites)]
+    counts = [1000 + 500 * seed for seed in range(n_sites)]
+
+    def frames():
+        return [prepare_weather_frame(history, forecast, count) for (history, forecast), count in zip(sites, counts)]
+
+    single_time, singles = best_of(
+        lambda: [run_chain(frame, 7, models, embed) for frame in frames()], repeat
+    )
+    batch_time, stacked = best_of(lambda: run_chain_batch(frames(), [7] * n_sites, models, embed), repeat)
+    match = all(
+        np.array_equal(a, b)
+        for one, many in zip(singles, stacked)
+        for a, b in zip((one.am, one.pm, one.survival), (many.am, many.pm, many.survival))
+    )
+    return single_time, batch_time, match
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 14, 30, 90, 365])
+    parser.add_argument("--sites", type=int, nargs="*", default=[],
+                        help="Also compare per-site and stacked multi-site chains for these site counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    models = ChainModels(
+        spring=registry.get("spring_temp"),
+        am=registry.get("am_transparency"),
+        pm=registry.get("pm_transparency"),
+        fish=registry.get("fish_survival"),
+    )
+    embed = make_embedder()
+
+    print(f"{'days':>6} {'per-day (s)':>12} {'batched (s)':>12} {'speedup':>8}  match")
+    for horizon in args.horizons:
+        history, forecast = synthetic_weather(horizon)
+
+        loop_time, loop_out = best_of(
+            lambda: per_day_chain(prepare_weather_frame(history, forecast, 25000), len(history), models, embed),
+            args.repeat,
+        )
+        batch_time, result = best_of(
+            lambda: run_chain(prepare_weather_frame(history, forecast, 25000), len(history), models, embed),
+            args.repeat,
+        )
+
+        match = all(
+            np.array_equal(np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32))
+            for a, b in zip(loop_out, (result.am, result.pm, result.survival))
+        )
+        print(f"{horizon:>6} {loop_time:>12.4f} {batch_time:>12.4f} {loop_time / batch_time:>7.1f}x  {match}")
+
+    if args.sites:
+        horizon = args.horizons[0]
+        print(f"\n{'sites':>6} {'per-site (s)':>13} {'stacked (s)':>12} {'sites/s':>9} {'speedup':>8}  match")
+        for n_sites in args.sites:
+            single_time, batch_time, match = compare_sites(n_sites, horizon, models, embed, args.repeat)
+            print(f"{n_sites:>6} {single_time:>13.4f} {batch_time:>12.4f} {n_sites / batch_time:>9.1f} "
+                  f"{single_time / batch_time:>7.1f}x  {match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+End-to-end benchmark suite: endpoint load tests plus in-process micro-benchmarks.
+
+Endpoints: starts the Open-Meteo stub and gunicorn (gunicorn.conf.py, models
+preloaded), then drives /process_dates, /predict_api, /forecast_risk (plain
+and streamed) and /forecast_risk_batch at each ``--concurrency`` level for
+``--duration`` seconds. Records throughput, latency percentiles and the RSS
+of every gunicorn worker. The weather and response caches are off unless
+``--warm-caches`` is given, so each request runs the full chain.
+
+Micro-benchmarks: ``generate_time_series_features``, comment embedding and
+each model's ``predict`` on real chain inputs, at a few sizes.
+
+Results are written as JSON. ``--compare`` prints the change against an
+earlier run and exits non-zero when a metric regressed by more than
+``--tolerance``:
+
+    python benchmarks/bench_suite.py --output bench-$(git rev-parse --short HEAD).json
+    python benchmarks/bench_suite.py --output new.json --compare bench-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+sys.path.append(BENCH_DIR)
+sys.path.append(os.path.join(ROOT, "app"))
+sys.path.append(os.path.join(ROOT, "src"))
+
+from bench_async import COLD_CACHE_ENV, free_port, start_gunicorn
+from open_meteo_stub import start_stub_server
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; worker memory falls back to /proc
+    psutil = None
+
+warnings.filterwarnings("ignore")
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+# === Endpoint load tests ===
+
+def date_range_body(days=5, fish_count=25000):
+    start = date.today() + timedelta(days=1)
+    return {
+        "start_date": start.isoformat(),
+        "end_date": (start + timedelta(days=days - 1)).isoformat(),
+        "fish_count": fish_count,
+    }
+
+
+def scenarios(base, batch_sites):
+    """Returns [(name, method, path, body)] for every endpoint under test."""
+    body = date_range_body()
+    weather = requests.post(f"{base}/process_dates", json=body, timeout=60).json()
+    batch = {"sites": [dict(date_range_body(fish_count=1000 + 100 * i), id=i) for i in range(batch_sites)]}
+    return [
+        ("process_dates", "POST", "/process_dates", body),
+        ("predict_api", "POST", "/predict_api", weather),
+        ("forecast_risk", "POST", "/forecast_risk", body),
+        ("forecast_risk_ndjson", "POST", "/forecast_risk?stream=ndjson", body),
+        (f"forecast_risk_batch_{batch_sites}", "POST", "/forecast_risk_batch", batch),
+    ]
+
+
+def drive(url, body, concurrency, duration):
+    """Keeps ``concurrency`` clients posting ``body`` for ``duration`` seconds."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client():
+        nonlocal errors
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                response = session.post(url, json=body, timeout=120)
+                ok = response.status_code == 200 and bool(response.content)
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    result = {"requests": int(len(latencies)), "errors": errors, "rps": len(latencies) / wall}
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = float(np.percentile(latencies, p)) if len(latencies) else None
+    result["max_ms"] = float(latencies.max()) if len(latencies) else None
+    return result
+
+
+def worker_rss(master_pid):
+    """RSS in MB of each gunicorn worker (children of the master); None if it can't be read."""
+    if psutil is not None:
+        try:
+            children = psutil.Process(master_pid).children()
+            return {str(child.pid): round(child.memory_info().rss / 2**20, 1) for child in children}
+        except psutil.Error:
+            return None
+    # Linux without psutil: children and VmRSS from /proc
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            pids = f.read().split()
+        rss = {}
+        for pid in pids:
+            with open(f"/proc/{pid}/status") as f:
+                kb = next(line.split()[1] for line in f if line.startswith("VmRSS:"))
+            rss[pid] = round(int(kb) / 1024, 1)
+        return rss
+    except (OSError, StopIteration):
+        return None
+
+
+def run_endpoint_benchmarks(args):
+    _, stub_state, stub_url = start_stub_server(delay=args.upstream_delay)
+    env = {} if args.warm_caches else COLD_CACHE_ENV
+    process, base = start_gunicorn(args.worker_class, free_port(), stub_url, args.workers, args.threads, env)
+    results = []
+    try:
+        rss_idle = worker_rss(process.pid)
+        for name, _, path, body in scenarios(base, args.batch_sites):
+            requests.post(f"{base}{path}", json=body, timeout=120)  # warm up
+            for concurrency in args.concurrency:
+                calls_before = stub_state.requests
+                result = drive(f"{base}{path}", body, concurrency, args.duration)
+                result.update(scenario=name, concurrency=concurrency,
+                              upstream_calls=stub_state.requests - calls_before,
+                              worker_rss_mb=worker_rss(process.pid))
+                results.append(result)
+                p95 = result["p95_ms"]
+                print(f"  {name:<26}{concurrency:>4}{result['rps']:>9.1f}"
+                      f"{result['p50_ms'] or float('nan'):>9.1f}{p95 or float('nan'):>9.1f}{result['errors']:>7}")
+    finally:
+        process.terminate()
+        process.wait()
+    return {"worker_rss_idle_mb": rss_idle, "runs": results}
+
+
+# === Micro-benchmarks ===
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times) * 1000
+
+
+def chain_frame(n_days, models, embed):
+    """The fully featured frame the transparency/survival models see (history + ``n_days``)."""
+    from bench_inference import synthetic_weather
+    from inference import prepare_weather_frame, run_chain
+
+    history, forecast = synthetic_weather(n_days)
+    result = run_chain(prepare_weather_frame(history, forecast, 25000), len(history), models, embed)
+    return result.frame, len(history)
+
+
+def run_micro_benchmarks(sizes, repeat):
+    from bench_inference import make_embedder, synthetic_weather
+    from bench_timeseries import COLUMNS, LAGS, WINDOWS, synthetic_series
+    from comment_embeddings import (
+        CommentEmbeddingTable, EMBEDDING_DIM, comment_vocabulary, load_comment_embeddings,
+    )
+    from feature_assembly import weather_code_comments
+    from inference import ChainModels, prepare_weather_frame
+    from model_registry import MODEL_FILES, OPTIONAL_MODEL_FILES, ModelRegistry
+    from timeseries_utils import generate_time_series_features
+
+    micro = {}
+    print(f"\n  {'micro-benchmark':<40}{'rows':>6}{'best ms':>10}")
+
+    def record(name, rows, ms):
+        micro.setdefault(name, {})[str(rows)] = ms
+        print(f"  {name:<40}{rows:>6}{ms:>10.3f}")
+
+    for rows in sizes:
+        df = synthetic_series(rows)
+        record("generate_time_series_features", rows,
+               best_of(lambda: generate_time_series_features(df, COLUMNS, LAGS, WINDOWS), repeat))
+
+    # Embedding lookup: the shipped table when it's built, else one with random vectors
+    table = load_comment_embeddings()
+    if table is None:
+        vocab = comment_vocabulary()
+        vectors = np.random.default_rng(0).random((len(vocab), EMBEDDING_DIM), dtype=np.float32)
+        table = CommentEmbeddingTable(vocab, vectors)
+    for rows in sizes:
+        history, forecast = synthetic_weather(rows)
+        comments = weather_code_comments(prepare_weather_frame(history, forecast, 25000))
+        record("comment_embeddings.gather", rows, best_of(lambda: table.gather(comments), repeat))
+
+    registry = ModelRegistry()
+    models = ChainModels(
+        spring=registry.get("spring_temp"),
+        am=registry.get("am_transparency"),
+        pm=registry.get("pm_transparency"),
+        fish=registry.get("fish_survival"),
+        transparency=registry.get("transparency") if registry.has_artifact("transparency") else None,
+    )
+    embed = make_embedder()
+    for rows in sizes:
+        frame, n_history = chain_frame(rows, models, embed)
+        forecast_rows = frame.iloc[n_history:]
+        for name in list(MODEL_FILES) + list(OPTIONAL_MODEL_FILES):
+            if not registry.has_artifact(name):
+                continue
+            model = registry.get(name)
+            record(f"{name}.predict", rows, best_of(lambda: model.predict(forecast_rows), repeat))
+    return micro
+
+
+# === Results ===
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """Prints per-metric changes; returns the regressions beyond ``tolerance`` (a fraction)."""
+    regressions = []
+    print(f"\nChange vs {baseline.get('commit', '?')[:10]} (tolerance {tolerance:.0%}):")
+
+    old_runs = {(r["scenario"], r["concurrency"]): r for r in baseline.get("endpoints", {}).get("runs", [])}
+    for run in current.get("endpoints", {}).get("runs", []):
+        old = old_runs.get((run["scenario"], run["concurrency"]))
+        if not old:
+            continue
+        for metric, higher_is_better in [("rps", True), ("p95_ms", False)]:
+            if not old.get(metric) or run.get(metric) is None:
+                continue
+            change = run[metric] / old[metric] - 1
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"  {run['scenario']:<26}c={run['concurrency']:<4}{metric:<8}{old[metric]:>10.1f} -> "
+                  f"{run[metric]:>10.1f} ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((run["scenario"], run["concurrency"], metric))
+
+    for name, by_rows in current.get("micro", {}).items():
+        for rows, ms in by_rows.items():
+            old = baseline.get("micro", {}).get(name, {}).get(rows)
+            if not old:
+                continue
+            change = ms / old - 1
+            flag = "  REGRESSION" if change > tolerance else ""
+            print(f"  {name:<40}{rows:>6} {old:>9.3f} -> {ms:>9.3f} ms ({change:+.1%}){flag}")
+            if flag:
+                regressions.append((name, rows, "ms"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario and concurrency")
+    parser.add_argument("--upstream-delay", type=float, default=0.05, help="Stub latency in seconds")
+    parser.add_argument("--worker-class", default="gthread", choices=["gthread", "gevent"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--batch-sites", type=int, default=10)
+    parser.add_argument("--warm-caches", action="store_true", help="Leave the weather/response caches on")
+    parser.add_argument("--micro-sizes", type=int, nargs="+", default=[5, 30, 365])
+    parser.add_argument("--repeat", type=int, default=5, help="Repeats per micro-benchmark (best is kept)")
+    parser.add_argument("--skip-endpoints", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", default=None, help="Write the results JSON here")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+
+    if not args.skip_endpoints:
+        print(f"\n  {'endpoint':<26}{'c':>4}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>7}")
+        results["endpoints"] = run_endpoint_benchmarks(args)
+    if not args.skip_micro:
+        results["micro"] = run_micro_benchmarks(args.micro_sizes, args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: pandas shift/rolling features vs the streaming TimeSeriesFeatureEngine.
+
+Times:
+
+  * full frame: ``generate_time_series_features`` (pandas, used by training
+    prep) vs ``engine.run`` over the same rows
+  * one new day: ``engine.push`` onto existing state (the pandas path has to
+    recompute the whole frame, i.e. the "pandas ms" column)
+
+tests/test_timeseries_utils.py checks that both give identical values.
+
+    python benchmarks/bench_timeseries.py --rows 14 400 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "src"))
+
+from timeseries_utils import TimeSeriesFeatureEngine, generate_time_series_features
+
+
+COLUMNS = ["Spring Temp (F)", "Dec Rain", "Calmar Rain"]
+LAGS = [3, 2, 1]
+WINDOWS = [7]
+
+
+def synthetic_series(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Spring Temp (F)": rng.normal(48, 3, n_rows).round(2),
+        "Dec Rain": rng.exponential(0.1, n_rows).round(2) * (rng.random(n_rows) < 0.4),
+        "Calmar Rain": rng.exponential(0.1, n_rows).round(2) * (rng.random(n_rows) < 0.4),
+    })
+    df.loc[rng.random(n_rows) < 0.05, "Spring Temp (F)"] = np.nan
+    return df
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[14, 37, 400, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'pandas ms':>10} {'engine ms':>10} {'x':>6} {'push +1 day us':>15}")
+    for n_rows in args.rows:
+        df = synthetic_series(n_rows)
+        t_pandas = best_of(lambda: generate_time_series_features(df, COLUMNS, LAGS, WINDOWS), args.repeat)
+        engine = TimeSeriesFeatureEngine(COLUMNS, LAGS, WINDOWS)
+
+        def engine_frame():
+            engine.reset()
+            engine.run(df[COLUMNS].to_numpy())
+
+        t_engine = best_of(engine_frame, args.repeat)
+
+        # Streaming one more day onto existing state vs recomputing everything
+        next_day = df[COLUMNS].to_numpy()[-1]
+        out = np.empty(len(engine.feature_names))
+        t_push = best_of(lambda: engine.push(next_day, out), args.repeat)
+
+        print(f"{n_rows:>6} {t_pandas * 1000:>10.2f} {t_engine * 1000:>10.2f} {t_pandas / t_engine:>6.1f} "
+              f"{t_push * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: Monte Carlo uncertainty as one chain run per scenario vs stacked scenarios.
+
+Checks that ``uncertainty.run_scenarios`` (perturbed forecasts stacked into
+one frame, scored in chunks) gives the same arrays as running ``run_chain``
+on each perturbed forecast in turn, then prints scenarios/s for each
+scenario count and horizon. The per-scenario loop is only timed up to
+``--loop-max`` scenarios.
+
+    python benchmarks/bench_uncertainty.py --scenarios 50 200 1000 --horizons 5 14
+"""
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(ROOT, "app"))
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_inference import best_of, make_embedder, synthetic_weather
+from inference import ChainModels, prepare_weather_frame, run_chain
+from model_registry import ModelRegistry
+from uncertainty import SCENARIO_CHUNK, draw_perturbations, perturbed_frame, run_scenarios
+
+warnings.filterwarnings("ignore")
+
+
+def per_scenario_chain(df, n_history, models, embed, n_scenarios, seed):
+    """Every perturbed forecast through its own ``run_chain``; returns (am, pm, survival)."""
+    temp_shift, rain_factor, surprise = draw_perturbations(n_scenarios, n_history, len(df), seed)
+    out = []
+    for k in range(n_scenarios):
+        frame, _ = perturbed_frame(df, n_history, temp_shift[k:k + 1], rain_factor[k:k + 1], surprise[k:k + 1])
+        result = run_chain(frame, n_history, models, embed)
+        out.append((result.am, result.pm, result.survival))
+    return tuple(np.stack([scenario[j] for scenario in out]) for j in range(3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[5, 14])
+    parser.add_argument("--chunk", type=int, default=SCENARIO_CHUNK)
+    parser.add_argument("--loop-max", type=int, default=200,
+                        help="Largest scenario count to also time with one run_chain per scenario")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    models = ChainModels(
+        spring=registry.get("spring_temp"),
+        am=registry.get("am_transparency"),
+        pm=registry.get("pm_transparency"),
+        fish=registry.get("fish_survival"),
+    )
+    embed = make_embedder()
+
+    print(f"{'days':>6} {'scenarios':>10} {'loop (s)':>10} {'stacked (s)':>12} {'scen/s':>9} {'speedup':>8}  match")
+    for horizon in args.horizons:
+        history, forecast = synthetic_weather(horizon)
+        df = prepare_weather_frame(history, forecast, 25000)
+
+        for n_scenarios in args.scenarios:
+            stacked_time, stacked = best_of(
+                lambda: run_scenarios(df, len(history), models, embed, n_scenarios, chunk=args.chunk), args.repeat
+            )
+            if n_scenarios <= args.loop_max:
+                loop_time, loop_out = best_of(
+                    lambda: per_scenario_chain(df, len(history), models, embed, n_scenarios, 0), 1
+                )
+                match = all(np.array_equal(a, b) for a, b in zip(loop_out, stacked))
+                loop_col, speedup, match_col = f"{loop_time:>10.3f}", f"{loop_time / stacked_time:>7.1f}x", match
+            else:
+                loop_col, speedup, match_col = f"{'-':>10}", f"{'-':>8}", "-"
+            print(f"{horizon:>6} {n_scenarios:>10} {loop_col} {stacked_time:>12.3f} "
+                  f"{n_scenarios / stacked_time:>9.0f} {speedup}  {match_col}")
+
+
+if __name__ == "__main__":
+    main()
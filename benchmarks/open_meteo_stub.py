@@ -0,0 +1,111 @@
+"""
+Local stand-in for the Open-Meteo daily forecast API.
+
+Returns deterministic pseudo-random weather for any coordinates and date range,
+with optional artificial latency and failure rate, so the app can be exercised
+without network access:
+
+    python benchmarks/open_meteo_stub.py --port 8765 --delay 0.2
+    OPEN_METEO_URL=http://127.0.0.1:8765/v1/forecast python app/app.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+WEATHER_CODES = [0, 1, 2, 3, 45, 51, 61, 63, 65, 71, 80, 95]
+
+
+def _daily_value(variable, latitude, longitude, day):
+    seed = hashlib.sha256(f"{variable}|{latitude}|{longitude}|{day}".encode()).digest()
+    rng = random.Random(seed)
+    seasonal = -10 * math.cos(2 * math.pi * day.timetuple().tm_yday / 365)
+    if variable == "weathercode":
+        return rng.choice(WEATHER_CODES)
+    if variable == "temperature_2m_max":
+        return round(18 + seasonal + rng.uniform(-4, 4), 1)
+    if variable == "temperature_2m_min":
+        return round(6 + seasonal + rng.uniform(-4, 4), 1)
+    if variable == "precipitation_sum":
+        return round(max(0.0, rng.uniform(-0.6, 0.8)), 1)
+    return 0.0
+
+
+class StubState:
+    def __init__(self, delay=0.0, failure_rate=0.0):
+        self.delay = delay
+        self.failure_rate = failure_rate
+        # The next ``fail_next`` requests are answered 503 (for retry tests)
+        self.fail_next = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+                forced_failure = state.fail_next > 0
+                if forced_failure:
+                    state.fail_next -= 1
+            if state.delay:
+                time.sleep(state.delay)
+            if forced_failure or (state.failure_rate and random.random() < state.failure_rate):
+                self.send_error(503, "stub failure")
+                return
+
+            query = parse_qs(urlparse(self.path).query)
+            latitude = float(query["latitude"][0])
+            longitude = float(query["longitude"][0])
+            start = date.fromisoformat(query["start_date"][0])
+            end = date.fromisoformat(query["end_date"][0])
+            variables = [v for value in query.get("daily", []) for v in value.split(",")]
+
+            days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+            daily = {"time": [day.isoformat() for day in days]}
+            for variable in variables:
+                daily[variable] = [_daily_value(variable, latitude, longitude, day) for day in days]
+
+            body = json.dumps({"latitude": latitude, "longitude": longitude, "daily": daily}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub_server(port=0, delay=0.0, failure_rate=0.0):
+    """Starts the stub on a background thread; returns (server, state, url)."""
+    state = StubState(delay, failure_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+    return server, state, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Open-Meteo stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of latency per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    args = parser.parse_args()
+
+    server, _, url = start_stub_server(args.port, args.delay, args.failure_rate)
+    print(f"Open-Meteo stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,70 @@
+"""
+Gunicorn settings (picked up automatically from the working directory).
+
+By default each worker imports only Flask and the model registry at boot;
+numpy/pandas, the models and the weather client are loaded on first use.
+With AQUAVITALS_PRELOAD_MODELS=1 the master imports the app and loads every
+model before forking, so workers start warm and share those pages
+copy-on-write instead of each holding its own copy.
+
+The defaults are those of the plain ``gunicorn app.app:app`` in the Procfile:
+gunicorn's own bind (0.0.0.0:$PORT when PORT is set), WEB_CONCURRENCY
+workers (1 if unset) and the sync worker. AQUAVITALS_WORKER_CLASS opts into
+another worker type:
+
+  * "sync" (default): one request at a time per worker.
+  * "gthread": AQUAVITALS_THREADS request threads per worker; a request
+    waiting on Open-Meteo holds one of them.
+  * "gevent": each request is a greenlet and the outbound HTTP calls are
+    non-blocking (gevent patches sockets), so up to ``worker_connections``
+    requests can wait on the upstream at once (the weather client's pool is
+    sized to match). The model chain runs in a
+    bounded native thread pool (see app/offload.py) so it doesn't stall the
+    event loop.
+
+Metrics: each worker writes its Prometheus samples under
+PROMETHEUS_MULTIPROC_DIR (a fresh temporary directory unless set) and
+/metrics merges them, so a scrape covers every worker (see app/metrics.py).
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("AQUAVITALS_THREADS", 1))
+
+worker_class = os.environ.get("AQUAVITALS_WORKER_CLASS", "sync")
+worker_connections = int(os.environ.get("AQUAVITALS_WORKER_CONNECTIONS", 200))
+
+preload_app = os.environ.get("AQUAVITALS_PRELOAD_MODELS") == "1"
+
+# Must be set before prometheus_client is imported (by the app, in the master
+# when preloading or in each worker)
+_own_metrics_dir = "PROMETHEUS_MULTIPROC_DIR" not in os.environ
+if _own_metrics_dir:
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="aquavitals-metrics-")
+
+if worker_class == "gevent":
+    # Greenlets are cheap: let every connection have its upstream calls in flight
+    os.environ.setdefault("AQUAVITALS_WEATHER_POOL_SIZE", str(2 * worker_connections))
+    if preload_app:
+        # The master imports the app (and requests) before forking, so patch first
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def on_starting(server):
+    # Samples left by an earlier run would be merged into this one's
+    for path in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
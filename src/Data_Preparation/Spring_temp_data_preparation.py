@@ -6,21 +6,29 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.impute import KNNImputer
+from dataset import load_raw_data, memoize_frame
 from timeseries_utils import generate_time_series_features
+from feature_assembly import add_rain_interactions, season_of
+from time_splits import split_frame
 
 
+# Workbook columns the loader reads (see dataset.load_raw_data)
+SPRING_TEMP_RAW_COLUMNS = [
+    "Date", "Month", "Year", "Year class", "Spring Temp (F)", "AM Feed", "PM Feed",
+    "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
+]
+
+# Model inputs, read by both the pipeline and the split
+SPRING_TEMP_NUMERICAL_FEATURES = [
+    "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
+    "Max Air Temp x Rain", "Total Rain",
+]
+SPRING_TEMP_CATEGORICAL_FEATURES = ["Season"]
+SPRING_TEMP_FEATURES = SPRING_TEMP_NUMERICAL_FEATURES + SPRING_TEMP_CATEGORICAL_FEATURES
+
+@memoize_frame
 def load_spring_temp_data():
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return "Winter"
-        elif month in [3, 4, 5]:
-            return "Spring"
-        elif month in [6, 7, 8]:
-            return "Summer"
-        else:
-            return "Fall"
-
-    df = pd.read_excel("../../Data/Raw/Main_Data_edited.xlsx")
+    df = load_raw_data(columns=SPRING_TEMP_RAW_COLUMNS)
     df["Date"] = pd.to_datetime(df["Date"])
     df = df.sort_values("Date")
 
@@ -32,9 +40,8 @@ def load_spring_temp_data():
     df["PM Feed"] = df["PM Feed"].fillna("X")
 
     # Feature engineering
-    df["Season"] = df["Month"].apply(get_season)
-    df["Max Air Temp x Rain"] = df["Max air temp"] * (df["Dec Rain"] + df["Calmar Rain"])
-    df["Total Rain"] = df["Dec Rain"] + df["Calmar Rain"]
+    df["Season"] = season_of(df["Month"])
+    df = add_rain_interactions(df, ["Max Air Temp x Rain", "Total Rain"])
     df["Day of Year"] = df["Date"].dt.dayofyear
 
     df["Year class"] = pd.to_numeric(df["Year class"], errors="coerce")
@@ -48,13 +55,6 @@ def load_spring_temp_data():
 
 # === Preprocessing Pipeline ===
 def create_spring_temp_pipeline():
-    numerical_features = [
-        "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
-        "Max Air Temp x Rain", "Total Rain", 
-    ]
-
-    categorical_features = ["Season"]
-
     num_transformer = Pipeline([
         ("imputer", SimpleImputer(strategy="median")),
         ("scaler", StandardScaler())
@@ -65,40 +65,15 @@ def create_spring_temp_pipeline():
     ])
 
     preprocessor = ColumnTransformer([
-        ("num", num_transformer, numerical_features),
-        ("cat", cat_transformer, categorical_features)
+        ("num", num_transformer, SPRING_TEMP_NUMERICAL_FEATURES),
+        ("cat", cat_transformer, SPRING_TEMP_CATEGORICAL_FEATURES)
     ])
 
     return Pipeline([("preprocessor", preprocessor)])
 
 def split_spring_temp_data(df, ratios):
-    df = df.sample(frac=1, random_state=42)
-
-    features = [
-        "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain", "Season",
-        "Max Air Temp x Rain", "Total Rain",
-    ]
-
-    df = df.dropna(subset=features + ["Spring Temp (F)"])
-
-    X = df[features]
-    y = df["Spring Temp (F)"]
-
-    dev_ratio, test_ratio = ratios
-    total_len = len(X)
-    dev_size = int(dev_ratio * total_len)
-    test_size = int(test_ratio * total_len)
-
-    X_train = X[:-(dev_size + test_size)]
-    y_train = y[:-(dev_size + test_size)]
-
-    X_dev = X[-(dev_size + test_size):-test_size]
-    y_dev = y[-(dev_size + test_size):-test_size]
-
-    X_test = X[-test_size:]
-    y_test = y[-test_size:]
-
-    return X_train, X_dev, X_test, y_train, y_dev, y_test
+    # Time-ordered split: the newest days are dev and test
+    return split_frame(df, SPRING_TEMP_FEATURES, "Spring Temp (F)", ratios)
 
 # === Convenience Loader ===
 def prepare_spring_temp_data(ratios=(0.1, 0.1)):
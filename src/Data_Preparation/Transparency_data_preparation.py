@@ -6,23 +6,50 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.impute import KNNImputer
+from dataset import load_raw_data, memoize_frame
 from timeseries_utils import generate_time_series_features
-from sentence_transformers import SentenceTransformer
-
-
-
+from comment_embeddings import embed_comments
+from feature_assembly import add_rain_interactions, season_of, transparency_weather_comments
+from time_splits import split_frame
+
+
+
+# Workbook columns the loader reads (see dataset.load_raw_data)
+TRANSPARENCY_RAW_COLUMNS = [
+    "Date", "Month", "Year", "# fish", "AM Transparency", "PM Transparency", "AM Feed", "PM Feed",
+    "Spring Temp (F)", "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
+]
+
+# Column order of the multi-output model's predictions
+TRANSPARENCY_TARGETS = ["AM Transparency", "PM Transparency"]
+
+# Model inputs, read by both the pipeline and the split
+TRANSPARENCY_NUMERICAL_FEATURES = [
+    # Core features
+    "Spring Temp (F)", "Max air temp", "Min air temp",
+    "Dec Rain", "Calmar Rain",
+    "Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain",
+
+    # Lag features (match actual naming style)
+    "Dec Rain (Lag 1)", "Calmar Rain (Lag 1)",
+    "Dec Rain (Lag 2)", "Calmar Rain (Lag 2)",
+    "Dec Rain (Lag 3)", "Calmar Rain (Lag 3)",
+
+    # Rolling features
+    "Dec Rain 7-day avg", "Calmar Rain 7-day avg"
+]
+TRANSPARENCY_CATEGORICAL_FEATURES = ["Season"]
+# Split columns the pipeline drops: rows missing the fish count are still left
+# out of training, and serving passes it through
+TRANSPARENCY_SPLIT_ONLY_FEATURES = ["# fish"]
+TRANSPARENCY_FEATURES = (
+    TRANSPARENCY_NUMERICAL_FEATURES + TRANSPARENCY_CATEGORICAL_FEATURES + TRANSPARENCY_SPLIT_ONLY_FEATURES
+)
+
+
+@memoize_frame
 def load_transparency__data():
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return "Winter"
-        elif month in [3, 4, 5]:
-            return "Spring"
-        elif month in [6, 7, 8]:
-            return "Summer"
-        else:
-            return "Fall"
-
-    df = pd.read_excel("../../Data/Raw/Main_Data_edited.xlsx")
+    df = load_raw_data(columns=TRANSPARENCY_RAW_COLUMNS)
     df["Date"] = pd.to_datetime(df["Date"])
     df = df.sort_values("Date")
 
@@ -34,10 +61,8 @@ def load_transparency__data():
     df["PM Feed"] = df["PM Feed"].fillna("X")
 
     # Feature engineering
-    df["Season"] = df["Month"].apply(get_season)
-    df["Spring_Temp x Rain"] = df["Spring Temp (F)"] * (df["Dec Rain"] + df["Calmar Rain"])
-    df["Max Air Temp x Rain"] = df["Max air temp"] * (df["Dec Rain"] + df["Calmar Rain"])
-    df["Total Rain"] = df["Dec Rain"] + df["Calmar Rain"]
+    df["Season"] = season_of(df["Month"])
+    df = add_rain_interactions(df, ["Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain"])
     df["Day of Year"] = df["Date"].dt.dayofyear
 
     df["Year"] = pd.to_numeric(df["Year"], errors="coerce")
@@ -47,55 +72,18 @@ def load_transparency__data():
     df = generate_time_series_features(df, cols=ts_columns, lags=[3,2,1], rolling_windows=[7])
 
     # ✅ Simulate natural language weather comment
-    def generate_weather_comment(row):
-        rain = row.get("Total Rain", 0)
-        temp = row.get("Spring Temp (F)", 0)
-
-        if rain > 0.5:
-            return "Heavy rain affected the tanks today."
-        elif rain > 0.2:
-            return "Moderate rain was observed today."
-        elif rain > 0:
-            return "Light rain occurred earlier in the day."
-        elif temp > 65:
-            return "It was a warm and dry day."
-        else:
-            return "The day was calm with no rainfall."
-
-    df["Weather_Comment"] = df.apply(generate_weather_comment, axis=1)
-
-    # ✅ NLP Embedding for weather-style comments
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    df["comment_embedding"] = df["Weather_Comment"].apply(lambda x: model.encode(str(x)))
-
-    # Split embedding into multiple columns
-    embedding_df = pd.DataFrame(df["comment_embedding"].tolist(), index=df.index)
-    embedding_df.columns = [f"text_emb_{i}" for i in range(embedding_df.shape[1])]
+    df["Weather_Comment"] = transparency_weather_comments(df)
+
+    # ✅ NLP Embedding for weather-style comments (shared table; new texts are encoded once and cached)
+    embedding_df = embed_comments(df["Weather_Comment"], index=df.index)
 
     # Add embeddings to main dataframe
-    df = pd.concat([df.drop(columns=["comment_embedding"]), embedding_df], axis=1)
+    df = pd.concat([df, embedding_df], axis=1)
 
     return df
 
 # === Preprocessing Pipeline ===
 def create_transparency_pipeline():
-    numerical_features = [
-        # Core features
-        "Spring Temp (F)", "Max air temp", "Min air temp",
-        "Dec Rain", "Calmar Rain",
-        "Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain",
-
-        # Lag features (match actual naming style)
-        "Dec Rain (Lag 1)", "Calmar Rain (Lag 1)",
-        "Dec Rain (Lag 2)", "Calmar Rain (Lag 2)",
-        "Dec Rain (Lag 3)", "Calmar Rain (Lag 3)",
-
-        # Rolling features
-        "Dec Rain 7-day avg", "Calmar Rain 7-day avg"
-    ]
-
-    categorical_features = ["Season"]
-
     num_transformer = Pipeline([
         ("imputer", SimpleImputer(strategy="median")),
         ("scaler", StandardScaler())
@@ -106,8 +94,8 @@ def create_transparency_pipeline():
     ])
 
     preprocessor = ColumnTransformer([
-        ("num", num_transformer, numerical_features),
-        ("cat", cat_transformer, categorical_features)
+        ("num", num_transformer, TRANSPARENCY_NUMERICAL_FEATURES),
+        ("cat", cat_transformer, TRANSPARENCY_CATEGORICAL_FEATURES)
     ])
 
     return Pipeline([("preprocessor", preprocessor)])
@@ -116,50 +104,17 @@ def split_transparency_data(df, target_col, ratios):
     """
     Splits fish data into training, dev, and test sets.
     Assumes engineered features like 'Season', 'Temp x Rain' already exist in the DataFrame.
+    The split keeps time order: the newest days are dev and test.
     """
-    df = df.sample(frac=1, random_state=42)
-
-    features = [
-        "Spring Temp (F)", "# fish", "Dec Rain", "Max air temp", "Min air temp", "Calmar Rain",
-        "Season", "Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain",
-        # Lag features
-        "Dec Rain (Lag 3)", 
-        "Calmar Rain (Lag 3)", 
-        "Dec Rain (Lag 2)", 
-        "Calmar Rain (Lag 2)", 
-        "Dec Rain (Lag 1)", 
-        "Calmar Rain (Lag 1)", 
-        # Rolling averages
-        "Dec Rain 7-day avg", "Calmar Rain 7-day avg"
-    ]
 
       # NLP embedding features
     text_features = [col for col in df.columns if col.startswith("text_emb_")]
 
         # Final full feature list
-    features = features + text_features
-
-    df = df.dropna(subset=features + [target_col])
+    features = TRANSPARENCY_FEATURES + text_features
 
-    X = df[features]
-    y = df[target_col]
-
-    dev_ratio, test_ratio = ratios
-    total_len = len(X)
-    dev_size = int(dev_ratio * total_len)
-    test_size = int(test_ratio * total_len)
-
-
-    X_train = X[:-(dev_size + test_size)]
-    y_train = y[:-(dev_size + test_size)]
-
-    X_dev = X[-(dev_size + test_size):-test_size]
-    y_dev = y[-(dev_size + test_size):-test_size]
-
-    X_test = X[-test_size:]
-    y_test = y[-test_size:]
-
-    return X_train, X_dev, X_test, y_train, y_dev, y_test
+    # A list of targets (e.g. both AM and PM) gives a DataFrame y for a multi-output model
+    return split_frame(df, features, target_col, ratios)
 
 # === Convenience Loaders ===
 def prepare_am_transparency_data(ratios=(0.1, 0.1)):
@@ -168,4 +123,9 @@ def prepare_am_transparency_data(ratios=(0.1, 0.1)):
 
 def prepare_pm_transparency_data(ratios=(0.1, 0.1)):
     df = load_transparency__data()
-    return split_transparency_data(df, target_col="PM Transparency", ratios=ratios)
\ No newline at end of file
+    return split_transparency_data(df, target_col="PM Transparency", ratios=ratios)
+
+def prepare_transparency_data(ratios=(0.1, 0.1)):
+    """Both targets as a two-column y (AM, PM), for the multi-output transparency model."""
+    df = load_transparency__data()
+    return split_transparency_data(df, target_col=TRANSPARENCY_TARGETS, ratios=ratios)
\ No newline at end of file
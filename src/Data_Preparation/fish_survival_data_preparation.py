@@ -6,11 +6,40 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.impute import KNNImputer
+from dataset import load_raw_data, memoize_frame
 from timeseries_utils import generate_time_series_features
-from sentence_transformers import SentenceTransformer
-
-
-
+from comment_embeddings import embed_comments
+from feature_assembly import add_rain_interactions, fish_caretaker_comments, season_of
+from time_splits import split_frame
+
+
+
+# Workbook columns the loader reads (see dataset.load_raw_data)
+FISH_RAW_COLUMNS = [
+    "Date", "Month", "Year", "Year class", "# fish", "Fish survival rate",
+    "AM Transparency", "PM Transparency", "AM Feed", "PM Feed",
+    "Spring Temp (F)", "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
+]
+
+# Model inputs, read by both the pipeline and the split
+FISH_NUMERICAL_FEATURES = [
+    "Spring Temp (F)", "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
+    "# fish", "Spring_Temp x Rain", "Max Air Temp x Rain",
+    # Lag features
+    "Dec Rain (Lag 3)", "Calmar Rain (Lag 3)",
+    # "AM Transparency (Lag 2)", "PM Transparency (Lag 2)",
+    "Dec Rain (Lag 2)", "Calmar Rain (Lag 2)",
+    # "AM Transparency (Lag 1)", "PM Transparency (Lag 1)",
+    "Dec Rain (Lag 1)", "Calmar Rain (Lag 1)",
+    # "AM Transparency 7-day avg", "PM Transparency 7-day avg",
+    "Dec Rain 7-day avg", "Calmar Rain 7-day avg",
+]
+# Direct transparency features (imputed in load_fish_data)
+FISH_TRANSPARENCY_FEATURES = ["AM Transparency", "PM Transparency"]
+FISH_CATEGORICAL_FEATURES = ["Season"]
+FISH_FEATURES = FISH_NUMERICAL_FEATURES + FISH_TRANSPARENCY_FEATURES + FISH_CATEGORICAL_FEATURES
+
+@memoize_frame
 def load_fish_data():
     """
     Loads fish data from a specified local Excel file and performs feature engineering.
@@ -19,17 +48,7 @@ def load_fish_data():
         pd.DataFrame: Preprocessed DataFrame.
     """
 
-    def get_season(month):
-        if month in [12, 1, 2]:
-            return "Winter"
-        elif month in [3, 4, 5]:
-            return "Spring"
-        elif month in [6, 7, 8]:
-            return "Summer"
-        else:
-            return "Fall"
-
-    df = pd.read_excel("../../Data/Raw/Main_Data_edited.xlsx")
+    df = load_raw_data(columns=FISH_RAW_COLUMNS)
 
     # ✅ Convert dates and sort
     df["Date"] = pd.to_datetime(df["Date"])
@@ -44,10 +63,8 @@ def load_fish_data():
     df[transparency_cols] = knn_imputer.fit_transform(df[transparency_cols])
 
     # ✅ Feature Engineering
-    df["Season"] = df["Month"].apply(get_season)
-    df["Spring_Temp x Rain"] = df["Spring Temp (F)"] * (df["Dec Rain"] + df["Calmar Rain"])
-    df["Max Air Temp x Rain"] = df["Max air temp"] * (df["Dec Rain"] + df["Calmar Rain"])
-    df["Total Rain"] = df["Dec Rain"] + df["Calmar Rain"]
+    df["Season"] = season_of(df["Month"])
+    df = add_rain_interactions(df, ["Spring_Temp x Rain", "Max Air Temp x Rain", "Total Rain"])
 
     df["Day of Year"] = df["Date"].dt.dayofyear
 
@@ -59,33 +76,14 @@ def load_fish_data():
     ts_columns = ["Spring Temp (F)", "AM Transparency", "PM Transparency", "Dec Rain", "Calmar Rain"]
     df = generate_time_series_features(df, cols=ts_columns, lags=[3,2,1], rolling_windows=[7])
 
-     # ✅ Simulate caretaker comment
-    def generate_comment(row):
-        comments = []
-        if row["AM Transparency"] < 80:
-            comments.append("Water looked slightly murky today.")
-        else:
-            comments.append("Water appeared clear and calm.")
-        if row["Spring Temp (F)"] < 50:
-            comments.append("Tank felt colder than usual.")
-        elif row["Spring Temp (F)"] > 60:
-            comments.append("Tank felt warmer than usual.")
-        if row["Total Rain"] > 0.4:
-            comments.append("Rain might have affected clarity.")
-        return " ".join(comments)
-
-    df["Caretaker_Comment"] = df.apply(generate_comment, axis=1)
-
-    # ✅ NLP Embedding for text comments
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    df["comment_embedding"] = df["Caretaker_Comment"].apply(lambda x: model.encode(str(x)))
-    
-    # Split the embedding into multiple columns
-    embedding_df = pd.DataFrame(df["comment_embedding"].tolist(), index=df.index)
-    embedding_df.columns = [f"text_emb_{i}" for i in range(embedding_df.shape[1])]
-    
+    # ✅ Simulate caretaker comment
+    df["Caretaker_Comment"] = fish_caretaker_comments(df)
+
+    # ✅ NLP Embedding for text comments (shared table; new texts are encoded once and cached)
+    embedding_df = embed_comments(df["Caretaker_Comment"], index=df.index)
+
     # Add embeddings to main dataframe
-    df = pd.concat([df.drop(columns=["comment_embedding"]), embedding_df], axis=1)
+    df = pd.concat([df, embedding_df], axis=1)
 
     return df
 
@@ -96,24 +94,6 @@ def create_fish_pipeline():
     Now assumes transparency features are already imputed in load_fish_data().
     """
 
-    numerical_features = [
-        "Spring Temp (F)", "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
-        "# fish", "Spring_Temp x Rain", "Max Air Temp x Rain",
-        # Lag features
-        "Dec Rain (Lag 3)", "Calmar Rain (Lag 3)",
-        # "AM Transparency (Lag 2)", "PM Transparency (Lag 2)", 
-        "Dec Rain (Lag 2)", "Calmar Rain (Lag 2)",
-        # "AM Transparency (Lag 1)", "PM Transparency (Lag 1)", 
-        "Dec Rain (Lag 1)", "Calmar Rain (Lag 1)",
-        # "AM Transparency 7-day avg", "PM Transparency 7-day avg",
-        "Dec Rain 7-day avg", "Calmar Rain 7-day avg",
- 
-    ]
-
-
-    transparency_features = ["AM Transparency", "PM Transparency"]
-    categorical_features = ["Season"]
-
     # Transformer for numeric features
     num_transformer = Pipeline(steps=[
         ("imputer", SimpleImputer(strategy="median")),  # Fallback imputation for any leftover NaNs
@@ -131,9 +111,9 @@ def create_fish_pipeline():
     ])
 
     preprocessor = ColumnTransformer(transformers=[
-        ("num", num_transformer, numerical_features),
-        ("transparency", transparency_transformer, transparency_features),
-        ("cat", cat_transformer, categorical_features),
+        ("num", num_transformer, FISH_NUMERICAL_FEATURES),
+        ("transparency", transparency_transformer, FISH_TRANSPARENCY_FEATURES),
+        ("cat", cat_transformer, FISH_CATEGORICAL_FEATURES),
     ])
 
 
@@ -147,47 +127,11 @@ def split_fish_data(df, ratios):
     """
     Splits fish data into training, dev, and test sets.
     Assumes engineered features like 'Season', 'Temp x Rain' already exist in the DataFrame.
+    The split keeps time order: the newest days are dev and test.
     """
-    df = df.sample(frac=1, random_state=42)
-
-
-    selected_features = [
-        "Spring Temp (F)", "Max air temp", "Min air temp", "Dec Rain", "Calmar Rain",
-        "# fish", "Spring_Temp x Rain", "Max Air Temp x Rain", "Season",
-        # Lag features
-        "Dec Rain (Lag 3)", "Calmar Rain (Lag 3)",
-        # "AM Transparency (Lag 2)", "PM Transparency (Lag 2)", 
-        "Dec Rain (Lag 2)", "Calmar Rain (Lag 2)",
-        # "AM Transparency (Lag 1)", "PM Transparency (Lag 1)", 
-        "Dec Rain (Lag 1)", "Calmar Rain (Lag 1)",
-        # "AM Transparency 7-day avg", "PM Transparency 7-day avg",
-        "Dec Rain 7-day avg", "Calmar Rain 7-day avg",
-        # Direct transparency features (now clean!)
-        "AM Transparency", "PM Transparency"
-    ]
-
-    # Drop early rows with NaNs from lag/rolling
-    df = df.dropna(subset=selected_features + ["Fish survival rate"])
-
-    X = df[selected_features]
-    y = df["Fish survival rate"]
-
-
-    dev_ratio, test_ratio = ratios
-    total_len = len(X)
-    dev_size = int(dev_ratio * total_len)
-    test_size = int(test_ratio * total_len)
-
-    X_train = X[:-(dev_size + test_size)]
-    y_train = y[:-(dev_size + test_size)]
-
-    X_dev = X[-(dev_size + test_size):-test_size]
-    y_dev = y[-(dev_size + test_size):-test_size]
-
-    X_test = X[-test_size:]
-    y_test = y[-test_size:]
 
-    return X_train, X_dev, X_test, y_train, y_dev, y_test
+    # Rows with NaNs from lag/rolling (the earliest days) are dropped by split_frame
+    return split_frame(df, FISH_FEATURES, "Fish survival rate", ratios)
 
 
 def prepare_fish_data(ratios):
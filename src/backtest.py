@@ -0,0 +1,309 @@
+"""
+Historical backtest: replays the workbook through the serving model chain.
+
+The per-model scripts score each model on its own test split, with the
+observed upstream values as inputs. This replays the whole history the way
+``/predict_api`` would have seen it. The workbook's days are cut into forecast
+windows of ``horizon`` days, each preceded by ``HISTORY_DAYS`` days of
+history, and every window goes through ``inference.run_stacked`` with only
+the observed weather and fish count as inputs. Spring temperature is
+predicted and fed into the transparency features, and the predicted
+transparency into survival, as in serving. The predictions are compared with
+the observed spring temp, AM/PM transparency and survival rate, and the
+predicted risk level with the one ``assess_risk`` gives the observed values.
+
+Windows are independent, so a group of them is stacked into one frame (one
+``predict`` per stage for the whole group) and the groups are scored in
+parallel worker processes.
+
+Workbook rows sharing a date are averaged into one replay day. The workbook
+has no Open-Meteo ``weathercode``, so the weather comment uses the
+rain/temperature fallback. Windows never span a gap in the dates.
+
+    python src/backtest.py --horizon 14 --jobs 4 --output backtest.csv --report backtest.json
+    python src/backtest.py --horizon 7 --stride 1 --start 2023-01-01
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(SRC_DIR, "..", "app")))
+
+from comment_embeddings import EMBEDDING_MODEL, encode_unique, load_comment_embeddings
+from dataset import RAW_DATA_PATH, load_raw_data
+from inference import ChainModels, assess_risk, prepare_weather_frame, run_stacked
+from model_registry import MODEL_DIR, ModelRegistry
+
+
+# Days of observed weather before each window, as ``get_weather_days`` fetches
+HISTORY_DAYS = 7
+DEFAULT_HORIZON = 14
+
+WEATHER_COLUMNS = ["Max air temp", "Min air temp", "Dec Rain", "Calmar Rain"]
+
+# Observed workbook column -> name of its column pair in the replay frame
+TARGETS = {
+    "Spring Temp (F)": "spring_temp",
+    "AM Transparency": "am_transparency",
+    "PM Transparency": "pm_transparency",
+    "Fish survival rate": "survival",
+}
+
+BACKTEST_RAW_COLUMNS = ["Date", "# fish"] + WEATHER_COLUMNS + list(TARGETS)
+
+
+# === Replay input ===
+
+def load_history(path=RAW_DATA_PATH, start=None, end=None):
+    """
+    Returns one row per workbook date between ``start`` and ``end``, sorted,
+    with the weather, fish count and observed targets (rows sharing a date averaged).
+    """
+    df = load_raw_data(columns=BACKTEST_RAW_COLUMNS, path=path)
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    numeric = BACKTEST_RAW_COLUMNS[1:]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors="coerce")
+    df = df.dropna(subset=["Date"]).groupby("Date", sort=True)[numeric].mean().reset_index()
+    if start is not None:
+        df = df[df["Date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["Date"] <= pd.Timestamp(end)]
+    return df.reset_index(drop=True)
+
+
+def replay_frame(history):
+    """The ``prepare_weather_frame`` output serving would build from these days' weather."""
+    days = pd.DataFrame({
+        "date": history["Date"].dt.strftime("%Y-%m-%d"),
+        "max_air_temp": history["Max air temp"],
+        "min_air_temp": history["Min air temp"],
+        "dec_rain": history["Dec Rain"],
+        "calmar_rain": history["Calmar Rain"],
+        "month": history["Date"].dt.month,
+    })
+    df = prepare_weather_frame(days.to_dict("records"), [], 0)
+    df["# fish"] = history["# fish"].to_numpy()
+    return df
+
+
+def replay_windows(dates, horizon=DEFAULT_HORIZON, stride=None, n_history=HISTORY_DAYS):
+    """
+    Returns the ``(start, stop)`` row ranges of the forecast windows; rows
+    ``start - n_history`` to ``start`` are each window's history. Windows
+    start every ``stride`` days (default ``horizon``) within runs of
+    consecutive dates.
+    """
+    stride = stride or horizon
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    gaps = np.flatnonzero(np.diff(dates) != np.timedelta64(1, "D")) + 1
+    windows = []
+    for run_start, run_stop in zip(np.r_[0, gaps], np.r_[gaps, len(dates)]):
+        for start in range(run_start + n_history, run_stop, stride):
+            windows.append((int(start), int(min(start + horizon, run_stop))))
+    return windows
+
+
+# === Scoring (runs in the worker processes) ===
+
+_chain = {}
+
+
+def load_chain(model_dir=MODEL_DIR):
+    """Returns the serving ``ChainModels`` and comment embedder, as the app builds them."""
+    registry = ModelRegistry(model_dir)
+    if registry.has_artifact("transparency"):
+        transparency, am, pm = registry.get("transparency"), None, None
+    else:
+        transparency, am, pm = None, registry.get("am_transparency"), registry.get("pm_transparency")
+    models = ChainModels(
+        spring=registry.get("spring_temp"), am=am, pm=pm,
+        fish=registry.get("fish_survival"), transparency=transparency,
+    )
+
+    table = load_comment_embeddings()
+    if table is not None:
+        return models, lambda comments, index: table.frame(comments, index=index)
+
+    # No table built yet: encode each distinct comment once per group
+    from sentence_transformers import SentenceTransformer
+    encoder = SentenceTransformer(EMBEDDING_MODEL)
+
+    def embed(comments, index):
+        vectors = encode_unique(encoder, comments)
+        return pd.DataFrame(vectors, index=index, columns=[f"text_emb_{j}" for j in range(vectors.shape[1])])
+    return models, embed
+
+
+def _init_worker(model_dir):
+    _chain["models"], _chain["embed"] = load_chain(model_dir)
+
+
+def _score_group(stacked, segments):
+    """Runs one stacked group; returns (spring, am, pm, survival) for its forecast rows."""
+    stacked, am, pm, survival = run_stacked(stacked, segments, _chain["models"], _chain["embed"])
+    rows = np.concatenate([np.arange(start + n_history, stop) for start, stop, n_history in segments])
+    spring = stacked["Spring Temp (F)"].to_numpy(dtype=np.float64)[rows]
+    return spring, np.asarray(am), np.asarray(pm), np.asarray(survival)
+
+
+def _stack_group(frame, windows, n_history):
+    rows = np.concatenate([np.arange(start - n_history, stop) for start, stop in windows])
+    stops = np.cumsum([stop - start + n_history for start, stop in windows])
+    segments = [(int(end) - (stop - start + n_history), int(end), n_history)
+                for end, (start, stop) in zip(stops, windows)]
+    return frame.iloc[rows].reset_index(drop=True), segments
+
+
+# === Replay ===
+
+def backtest(history, horizon=DEFAULT_HORIZON, stride=None, n_history=HISTORY_DAYS, jobs=-1,
+             windows_per_task=None, model_dir=MODEL_DIR):
+    """
+    Replays ``history`` through the chain.
+
+    Args:
+        history (pd.DataFrame): Output of ``load_history``.
+        horizon (int): Forecast days per window.
+        stride (int, optional): Days between window starts (default ``horizon``; less overlaps windows).
+        n_history (int): History days before each window.
+        jobs (int): Worker processes (-1 for all cores, 1 to score in this process).
+        windows_per_task (int, optional): Windows stacked per worker task (default: split evenly).
+        model_dir (str): Directory holding the serving artifacts.
+
+    Returns:
+        pd.DataFrame: One row per replayed forecast day with its window, lead
+        day, and each target's observed value next to its ``*_pred`` prediction.
+    """
+    windows = replay_windows(history["Date"], horizon, stride, n_history)
+    if not windows:
+        raise ValueError(f"No run of more than {n_history} consecutive days to replay")
+
+    jobs = os.cpu_count() if jobs in (None, -1) else max(1, jobs)
+    per_task = windows_per_task or -(-len(windows) // jobs)
+    frame = replay_frame(history)
+    tasks = [_stack_group(frame, windows[i:i + per_task], n_history) for i in range(0, len(windows), per_task)]
+
+    if jobs == 1 or len(tasks) == 1:
+        _init_worker(model_dir)
+        scored = [_score_group(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(jobs, len(tasks)), initializer=_init_worker, initargs=(model_dir,)) as pool:
+            scored = list(pool.map(_score_group, *zip(*tasks)))
+    spring, am, pm, survival = (np.concatenate(parts) for parts in zip(*scored))
+
+    lengths = [stop - start for start, stop in windows]
+    observed = history.iloc[np.concatenate([np.arange(start, stop) for start, stop in windows])]
+    replay = pd.DataFrame({
+        "date": observed["Date"].to_numpy(),
+        "window": np.repeat(np.arange(len(windows)), lengths),
+        "lead_day": np.concatenate([np.arange(1, n + 1) for n in lengths]),
+        "fish_count": observed["# fish"].to_numpy(),
+    })
+    for column, name in TARGETS.items():
+        replay[name] = observed[column].to_numpy(dtype=np.float64)
+        replay[f"{name}_pred"] = {"spring_temp": spring, "am_transparency": am,
+                                  "pm_transparency": pm, "survival": survival}[name]
+
+    fish = replay["fish_count"].to_numpy()
+    known = replay[["survival", "am_transparency", "pm_transparency"]].notna().all(axis=1).to_numpy()
+    risk = assess_risk(replay["survival"].to_numpy(), replay["am_transparency"].to_numpy(),
+                       replay["pm_transparency"].to_numpy(), fish)
+    replay["risk_level"] = np.where(known, risk, None)
+    replay["risk_level_pred"] = assess_risk(survival, am, pm, fish)
+    return replay
+
+
+def _errors(observed, predicted):
+    error = predicted - observed
+    total = ((observed - observed.mean()) ** 2).sum()
+    return {
+        "days": int(len(error)),
+        "mae": float(np.abs(error).mean()) if len(error) else None,
+        "rmse": float(np.sqrt((error ** 2).mean())) if len(error) else None,
+        "bias": float(error.mean()) if len(error) else None,
+        "r2": float(1 - (error ** 2).sum() / total) if total > 0 else None,
+    }
+
+
+def score_replay(replay):
+    """
+    Error metrics of each target over the days it was observed, overall and
+    as MAE per lead day, plus how well the predicted risk level matches.
+    """
+    report = {"days": len(replay), "windows": int(replay["window"].nunique()), "targets": {}}
+    for name in TARGETS.values():
+        scored = replay[replay[name].notna() & replay[f"{name}_pred"].notna()]
+        error = (scored[f"{name}_pred"] - scored[name]).abs()
+        report["targets"][name] = {
+            **_errors(scored[name].to_numpy(), scored[f"{name}_pred"].to_numpy()),
+            "mae_by_lead_day": {int(lead): float(mae) for lead, mae in error.groupby(scored["lead_day"]).mean().items()},
+        }
+
+    known = replay[replay["risk_level"].notna()]
+    observed, predicted = known["risk_level"] == "High", known["risk_level_pred"] == "High"
+    report["risk"] = {
+        "days": len(known),
+        "observed_high": int(observed.sum()),
+        "predicted_high": int(predicted.sum()),
+        "accuracy": float((observed == predicted).mean()) if len(known) else None,
+        "precision": float((observed & predicted).sum() / predicted.sum()) if predicted.any() else None,
+        "recall": float((observed & predicted).sum() / observed.sum()) if observed.any() else None,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default=RAW_DATA_PATH, help="Workbook to replay")
+    parser.add_argument("--start", default=None, help="First date to replay (YYYY-MM-DD)")
+    parser.add_argument("--end", default=None, help="Last date to replay (YYYY-MM-DD)")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="Forecast days per window")
+    parser.add_argument("--stride", type=int, default=None, help="Days between window starts (default: horizon)")
+    parser.add_argument("--history", type=int, default=HISTORY_DAYS, help="History days before each window")
+    parser.add_argument("--jobs", type=int, default=-1, help="Worker processes (-1 for all cores)")
+    parser.add_argument("--windows-per-task", type=int, default=None)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--output", default=None, help="Write the per-day replay to this CSV file")
+    parser.add_argument("--report", default=None, help="Write the JSON metrics to this file")
+    args = parser.parse_args()
+
+    history = load_history(args.data, args.start, args.end)
+    started = time.perf_counter()
+    replay = backtest(history, args.horizon, args.stride, args.history, args.jobs,
+                      args.windows_per_task, args.model_dir)
+    seconds = time.perf_counter() - started
+    report = {**score_replay(replay), "seconds": seconds, "horizon": args.horizon,
+              "stride": args.stride or args.horizon, "history": args.history}
+
+    first, last = replay["date"].min(), replay["date"].max()
+    print(f"Replayed {report['days']} forecast days ({first:%Y-%m-%d} to {last:%Y-%m-%d}) "
+          f"in {report['windows']} windows: {seconds:.2f}s")
+    print(f"\n{'target':<18}{'days':>6}{'MAE':>9}{'RMSE':>9}{'bias':>9}{'R²':>8}{'MAE d1':>9}{'MAE last':>10}")
+    for name, metrics in report["targets"].items():
+        if not metrics["days"]:
+            print(f"{name:<18}{0:>6}  (not observed)")
+            continue
+        by_lead = metrics["mae_by_lead_day"]
+        r2 = f"{metrics['r2']:>8.3f}" if metrics["r2"] is not None else f"{'-':>8}"
+        print(f"{name:<18}{metrics['days']:>6}{metrics['mae']:>9.3f}{metrics['rmse']:>9.3f}{metrics['bias']:>9.3f}"
+              f"{r2}{by_lead[min(by_lead)]:>9.3f}{by_lead[max(by_lead)]:>10.3f}")
+    risk = report["risk"]
+    print(f"\nRisk level: {risk['observed_high']} observed / {risk['predicted_high']} predicted High "
+          f"over {risk['days']} days, accuracy {risk['accuracy'] or 0:.3f}")
+
+    if args.output:
+        replay.to_csv(args.output, index=False)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Precomputed sentence embeddings for the fixed comment vocabularies.
+
+The weather/caretaker comment generators used in training and serving can only
+produce a small, closed set of strings, so every string is encoded once with
+the sentence transformer and stored as a float32 ``.npy`` table. Loaders and
+``predict_api`` then gather rows from the (memory-mapped) table instead of
+running the transformer.
+
+The table doubles as a persistent text -> vector cache: ``embed_comments``
+encodes only texts the table hasn't seen (each distinct text once, in one
+batch) and appends them, so changed comment wording costs one encode of the
+new strings on the next training run. Rebuild from scratch with:
+
+    python src/comment_embeddings.py
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+TABLE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app", "models"))
+TABLE_PATH = os.path.join(TABLE_DIR, "comment_embeddings.npy")
+VOCAB_PATH = os.path.join(TABLE_DIR, "comment_embeddings.json")
+
+
+# === Comment vocabularies ===
+
+# Serving: Open-Meteo weather code -> comment (app.generate_weather_comment_from_code)
+WEATHER_CODE_COMMENTS = {
+    0: "Clear sky and calm conditions.",
+    1: "Mainly clear skies today.",
+    2: "Partly cloudy conditions.",
+    3: "Overcast sky throughout the day.",
+    45: "Foggy or misty conditions were observed.",
+    48: "Dense fog with limited visibility.",
+    51: "Light drizzle made the day damp.",
+    53: "Moderate drizzle persisted during the day.",
+    55: "Heavy drizzle throughout the day.",
+    56: "Light freezing drizzle was present.",
+    57: "Moderate to heavy freezing drizzle observed.",
+    61: "Light rainfall during the day.",
+    63: "Moderate rain was observed today.",
+    65: "Heavy rain showers throughout the day.",
+    66: "Light freezing rain occurred.",
+    67: "Heavy freezing rain observed.",
+    71: "Light snowfall made conditions cold.",
+    73: "Moderate snowfall occurred.",
+    75: "Heavy snowfall blanketed the area.",
+    77: "Snow grains made the surface slippery.",
+    80: "Light rain showers came and went.",
+    81: "Moderate rain showers passed through.",
+    82: "Heavy rain showers soaked the area.",
+    85: "Light snow showers today.",
+    86: "Heavy snow showers throughout the day.",
+    95: "Thunderstorms were observed.",
+    96: "Thunderstorms with some hail.",
+    99: "Severe thunderstorms and hail reported."
+}
+
+# Serving: fallbacks when the weather code is unknown
+WEATHER_FALLBACK_COMMENTS = [
+    "Heavy rainfall today.",
+    "Moderate rain today.",
+    "Warm and clear.",
+    "Cool and calm.",
+]
+
+# Training: Transparency_data_preparation.load_transparency__data
+TRANSPARENCY_WEATHER_COMMENTS = [
+    "Heavy rain affected the tanks today.",
+    "Moderate rain was observed today.",
+    "Light rain occurred earlier in the day.",
+    "It was a warm and dry day.",
+    "The day was calm with no rainfall.",
+]
+
+# Training: fish_survival_data_preparation.load_fish_data joins one sentence from
+# each group (temperature and rain sentences are optional)
+CARETAKER_CLARITY_COMMENTS = ["Water looked slightly murky today.", "Water appeared clear and calm."]
+CARETAKER_TEMP_COMMENTS = ["Tank felt colder than usual.", "Tank felt warmer than usual."]
+CARETAKER_RAIN_COMMENT = "Rain might have affected clarity."
+
+
+def caretaker_comments():
+    comments = []
+    for clarity in CARETAKER_CLARITY_COMMENTS:
+        for temp in [None] + CARETAKER_TEMP_COMMENTS:
+            for rain in [None, CARETAKER_RAIN_COMMENT]:
+                comments.append(" ".join(part for part in (clarity, temp, rain) if part))
+    return comments
+
+
+def comment_vocabulary():
+    """Returns every comment the generators can emit, de-duplicated, in a stable order."""
+    texts = (
+        list(WEATHER_CODE_COMMENTS.values())
+        + WEATHER_FALLBACK_COMMENTS
+        + TRANSPARENCY_WEATHER_COMMENTS
+        + caretaker_comments()
+    )
+    return list(dict.fromkeys(texts))
+
+
+# === Lookup table ===
+
+class CommentEmbeddingTable:
+    """
+    Maps comment strings to rows of a float32 embedding matrix.
+
+    Args:
+        vocab (list): Comment strings; position i is row i of ``vectors``.
+        vectors (np.ndarray): float32 matrix of shape (len(vocab), EMBEDDING_DIM).
+    """
+
+    def __init__(self, vocab, vectors):
+        if len(vocab) != len(vectors):
+            raise ValueError(f"Vocabulary has {len(vocab)} entries but table has {len(vectors)} rows")
+        self.vocab = list(vocab)
+        self.vectors = vectors
+        self.index = {text: i for i, text in enumerate(self.vocab)}
+
+    @classmethod
+    def load(cls, table_path=TABLE_PATH, vocab_path=VOCAB_PATH):
+        with open(vocab_path) as f:
+            meta = json.load(f)
+        if meta.get("model", EMBEDDING_MODEL) != EMBEDDING_MODEL:
+            raise ValueError(f"Embedding table was built with {meta['model']}, expected {EMBEDDING_MODEL}")
+        vectors = np.load(table_path, mmap_mode="r")
+        # Rows are only ever appended and the matrix is written before the
+        # vocabulary, so a table caught mid-update just has extra rows
+        return cls(meta["vocab"], vectors[:len(meta["vocab"])])
+
+    def save(self, table_path=TABLE_PATH, vocab_path=VOCAB_PATH):
+        _write_atomic(table_path, lambda f: np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32)))
+        meta = {"model": EMBEDDING_MODEL, "dim": int(self.dim), "vocab": self.vocab}
+        _write_atomic(vocab_path, lambda f: f.write(json.dumps(meta, indent=2).encode()))
+
+    @property
+    def dim(self):
+        return self.vectors.shape[1]
+
+    def missing(self, texts):
+        """Distinct texts that have no row in the table yet."""
+        return [text for text in pd.unique(_as_text(texts)) if text not in self.index]
+
+    def codes(self, texts):
+        """Returns the table row of each text; unknown texts raise KeyError."""
+        codes, uniques = pd.factorize(_as_text(texts))
+        missing = [text for text in uniques if text not in self.index]
+        if missing:
+            raise KeyError(f"Comments not in embedding table (rebuild it): {missing}")
+        unique_rows = np.array([self.index[text] for text in uniques], dtype=np.intp)
+        return unique_rows[codes]
+
+    def gather(self, texts):
+        """Returns a (len(texts), dim) float32 matrix of embeddings."""
+        codes = self.codes(texts)
+        out = np.empty((len(codes), self.dim), dtype=np.float32)
+        return np.take(self.vectors, codes, axis=0, out=out)
+
+    def extended(self, texts, vectors):
+        """Returns a new table with ``texts`` appended (texts already present are skipped)."""
+        new = [i for i, text in enumerate(texts) if text not in self.index]
+        if not new:
+            return self
+        return CommentEmbeddingTable(
+            self.vocab + [texts[i] for i in new],
+            np.concatenate([np.asarray(self.vectors, dtype=np.float32), np.asarray(vectors, dtype=np.float32)[new]]),
+        )
+
+    def frame(self, texts, index=None):
+        """Returns the embeddings as ``text_emb_*`` columns, aligned to ``index``."""
+        return pd.DataFrame(
+            self.gather(texts),
+            index=index,
+            columns=[f"text_emb_{j}" for j in range(self.dim)],
+        )
+
+
+def _as_text(texts):
+    return pd.Series(texts, dtype=object).astype(str)
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _sentence_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def encode_unique(model, texts, batch_size=64):
+    """
+    Encodes each distinct text once, in one batched call, and broadcasts the
+    vectors back to every position. Returns a (len(texts), dim) float32 matrix.
+    """
+    codes, uniques = pd.factorize(_as_text(texts))
+    vectors = np.asarray(model.encode(list(uniques), batch_size=batch_size), dtype=np.float32)
+    return vectors[codes]
+
+
+def build_table(model=None, table_path=TABLE_PATH, vocab_path=VOCAB_PATH):
+    """Encodes the full comment vocabulary in one batch and writes the table files."""
+    vocab = comment_vocabulary()
+    table = CommentEmbeddingTable(vocab, encode_unique(model or _sentence_model(), vocab))
+    table.save(table_path, vocab_path)
+    return table
+
+
+def load_comment_embeddings(build_if_missing=False):
+    """
+    Loads the shared embedding table.
+
+    Args:
+        build_if_missing (bool): Encode and save the table when it doesn't exist yet
+            (or was built with another model; needs sentence_transformers).
+            Otherwise a missing table returns None.
+    """
+    if os.path.exists(TABLE_PATH) and os.path.exists(VOCAB_PATH):
+        try:
+            return CommentEmbeddingTable.load()
+        except ValueError:
+            if not build_if_missing:
+                raise
+    if build_if_missing:
+        return build_table()
+    return None
+
+
+def embed_comments(texts, index=None, model=None):
+    """
+    Returns ``text_emb_*`` columns for ``texts``, encoding only texts the
+    on-disk table hasn't seen and appending them to it for the next run.
+
+    Args:
+        texts (sequence): Comment strings, typically a DataFrame column.
+        index: Index for the returned frame.
+        model: Sentence encoder; loaded only if there is something new to encode.
+    """
+    table = load_comment_embeddings(build_if_missing=True)
+    missing = table.missing(texts)
+    if missing:
+        table = table.extended(missing, encode_unique(model or _sentence_model(), missing))
+        table.save()
+    return table.frame(texts, index=index)
+
+
+if __name__ == "__main__":
+    table = build_table()
+    print(f"✅ Saved {len(table.vocab)} comment embeddings to {TABLE_PATH}")
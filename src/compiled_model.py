@@ -0,0 +1,396 @@
+"""
+Array-only export of the fitted preprocessing + XGBoost pipelines.
+
+``export_compiled_pipeline`` folds the fitted imputer fill values, scaler
+means/scales and one-hot categories of a ``Pipeline(ColumnTransformer, XGBRegressor)``
+into flat arrays, and packs the booster's trees into padded node tables.
+A ``KNNImputer`` keeps its training matrix, and missing values are filled by
+the same nearest-neighbour search (nan-euclidean distances, computed step
+for step as sklearn does so ties between neighbours break the same way).
+``CompiledPipeline`` evaluates that file with NumPy alone, so serving needs
+neither sklearn nor xgboost to unpickle or predict.
+
+Convert existing artifacts:
+
+    python src/compiled_model.py app/models/*.joblib
+"""
+import json
+import os
+
+import numpy as np
+
+
+COMPILED_FORMAT_VERSION = 2
+
+# Rows are scored in blocks so the (rows x trees) node table stays small
+PREDICT_BLOCK_ROWS = 2048
+
+
+# === Export ===
+
+def _unwrap_column_transformer(preprocessor):
+    # Training wraps the ColumnTransformer in a single-step Pipeline
+    while hasattr(preprocessor, "steps"):
+        preprocessor = preprocessor.steps[-1][1]
+    return preprocessor
+
+
+def _fold_knn_imputer(name, step, position, key):
+    """The ``knn`` spec of a block and its training matrix (stored in the .npz under ``key``)."""
+    if position != 0:
+        raise TypeError(f"KNNImputer in '{name}' must be the first step")
+    if (step.metric != "nan_euclidean" or step.weights not in ("uniform", "distance")
+            or step.add_indicator or not np.isnan(step.missing_values)):
+        raise TypeError(f"Unsupported KNNImputer settings in '{name}'")
+    fit_X = np.asarray(step._fit_X, dtype=np.float64)
+    fit_mask = np.isnan(fit_X)
+    if fit_mask.all(axis=0).any():
+        raise TypeError(f"KNNImputer in '{name}' was fitted on an all-missing column")
+    # Receivers without any usable distance get the column mean, computed as sklearn does
+    means = [float(np.ma.array(fit_X[:, j], mask=fit_mask[:, j]).mean()) for j in range(fit_X.shape[1])]
+    return {"n_neighbors": int(step.n_neighbors), "weights": step.weights, "means": means, "fit_X": key}, fit_X
+
+
+def _fold_transformer(name, transformer, columns, index=0):
+    """
+    Returns one block spec per fitted sub-pipeline of the ColumnTransformer,
+    and the arrays it needs stored next to the trees.
+    """
+    steps = transformer.steps if hasattr(transformer, "steps") else [(name, transformer)]
+    n = len(columns)
+    fill = np.full(n, np.nan)
+    offset = np.zeros(n)
+    scale = np.ones(n)
+    categories = None
+    knn = None
+    arrays = {}
+
+    for position, (step_name, step) in enumerate(steps):
+        kind = type(step).__name__
+        if kind == "SimpleImputer":
+            fill = np.where(np.isnan(fill), step.statistics_.astype(float), fill)
+        elif kind == "KNNImputer":
+            key = f"knn_fit_{index}"
+            knn, arrays[key] = _fold_knn_imputer(name, step, position, key)
+        elif kind == "StandardScaler":
+            if step.with_mean:
+                offset = step.mean_.astype(float)
+            if step.with_std:
+                scale = step.scale_.astype(float)
+        elif kind == "OneHotEncoder":
+            if step.handle_unknown != "ignore" or getattr(step, "drop_idx_", None) is not None:
+                raise TypeError(f"Unsupported OneHotEncoder settings in '{name}'")
+            categories = [[str(c) for c in cats] for cats in step.categories_]
+        else:
+            raise TypeError(f"Cannot compile step '{step_name}' ({kind}) in '{name}'")
+
+    block = {"name": name, "columns": list(columns)}
+    if categories is not None:
+        block["categories"] = categories
+    else:
+        if knn is not None:
+            block["knn"] = knn
+        block["fill"] = fill.tolist()
+        block["offset"] = offset.tolist()
+        block["scale"] = scale.tolist()
+    return block, arrays
+
+
+def _pack_trees(booster):
+    model = json.loads(booster.save_raw(raw_format="json"))
+    learner = model["learner"]
+    if learner["objective"]["name"] != "reg:squarederror":
+        raise TypeError(f"Unsupported objective {learner['objective']['name']}")
+
+    gbtree = learner["gradient_booster"]
+    if gbtree["name"] != "gbtree":
+        raise TypeError(f"Unsupported booster {gbtree['name']}")
+
+    trees = gbtree["model"]["trees"]
+    if any(int(tree["tree_param"]["size_leaf_vector"]) > 1 for tree in trees):
+        raise TypeError("Vector-leaf (multi_output_tree) boosters are not supported")
+    if any(any(tree["split_type"]) for tree in trees):
+        raise TypeError("Categorical splits are not supported")
+
+    n_trees = len(trees)
+    n_nodes = max(len(tree["left_children"]) for tree in trees)
+
+    left = np.full((n_trees, n_nodes), -1, dtype=np.int32)
+    right = np.full((n_trees, n_nodes), -1, dtype=np.int32)
+    feature = np.zeros((n_trees, n_nodes), dtype=np.int32)
+    threshold = np.zeros((n_trees, n_nodes), dtype=np.float32)
+    default_left = np.zeros((n_trees, n_nodes), dtype=bool)
+
+    for t, tree in enumerate(trees):
+        k = len(tree["left_children"])
+        left[t, :k] = tree["left_children"]
+        right[t, :k] = tree["right_children"]
+        feature[t, :k] = tree["split_indices"]
+        # For leaves, split_conditions holds the leaf value
+        threshold[t, :k] = np.asarray(tree["split_conditions"], dtype=np.float32)
+        default_left[t, :k] = np.asarray(tree["default_left"], dtype=bool)
+
+    # Newer XGBoost releases serialise base_score as a vector, e.g. "[5.5E1]"
+    raw_base_score = learner["learner_model_param"]["base_score"]
+    base_score = np.atleast_1d(np.asarray(json.loads(raw_base_score.lower()), dtype=np.float32))
+
+    # Depth bounds the number of traversal steps
+    depth = np.zeros((n_trees, n_nodes), dtype=np.int32)
+    for t in range(n_trees):
+        for node in range(n_nodes):
+            if left[t, node] >= 0:
+                depth[t, left[t, node]] = depth[t, node] + 1
+                depth[t, right[t, node]] = depth[t, node] + 1
+
+    return {
+        "left": left,
+        "right": right,
+        "feature": feature,
+        "threshold": threshold,
+        "default_left": default_left,
+        "tree_target": np.asarray(gbtree["model"]["tree_info"], dtype=np.int32),
+        "base_score": base_score,
+        "max_depth": np.int32(depth.max()),
+    }
+
+
+def export_compiled_pipeline(pipeline, path):
+    """
+    Writes a fitted ``Pipeline([("preprocessor", ...), ("algo", XGBRegressor)])``
+    to an ``.npz`` file that ``CompiledPipeline`` can serve.
+
+    Args:
+        pipeline: Fitted sklearn pipeline as produced by the training scripts.
+        path (str): Destination ``.npz`` path.
+    """
+    column_transformer = _unwrap_column_transformer(pipeline.named_steps["preprocessor"])
+    if getattr(column_transformer, "sparse_output_", False):
+        raise TypeError("Sparse ColumnTransformer output is not supported")
+
+    blocks, arrays = [], {}
+    for name, transformer, columns in column_transformer.transformers_:
+        if name == "remainder" or transformer == "drop":
+            continue
+        block, block_arrays = _fold_transformer(name, transformer, columns, len(blocks))
+        blocks.append(block)
+        arrays.update(block_arrays)
+
+    meta = {
+        "format_version": COMPILED_FORMAT_VERSION,
+        "feature_names_in": [str(c) for c in pipeline.feature_names_in_],
+        "blocks": blocks,
+    }
+    trees = _pack_trees(pipeline.named_steps["algo"].get_booster())
+    np.savez(path, meta=np.array(json.dumps(meta)), **trees, **arrays)
+    return path
+
+
+# === Serving ===
+
+class CompiledPipeline:
+    """
+    NumPy-only predictor loaded from an ``export_compiled_pipeline`` file.
+
+    ``predict`` accepts the same DataFrame a sklearn pipeline would;
+    ``predict_matrix`` takes the raw input columns as a float matrix (with
+    categorical columns given as category indices, -1 for unknown).
+    """
+
+    def __init__(self, meta, trees):
+        self.meta = meta
+        self.feature_names_in_ = np.asarray(meta["feature_names_in"], dtype=object)
+        self.blocks = meta["blocks"]
+        self.input_features = [col for block in self.blocks for col in block["columns"]]
+
+        self.tree_target = trees["tree_target"]
+        self.base_score = trees["base_score"]
+        self.max_depth = int(trees["max_depth"])
+        self.n_targets = int(self.tree_target.max()) + 1
+
+        # Flatten the padded (tree, node) tables into global node ids; leaves
+        # point back at themselves so traversal needs no leaf test.
+        n_trees, n_nodes = trees["left"].shape
+        self.n_trees = n_trees
+        node_ids = np.arange(n_trees * n_nodes, dtype=np.int32).reshape(n_trees, n_nodes)
+        offsets = node_ids[:, :1]
+        is_leaf = trees["left"] < 0
+        self.left = np.where(is_leaf, node_ids, trees["left"] + offsets).ravel()
+        self.right = np.where(is_leaf, node_ids, trees["right"] + offsets).ravel()
+        self.feature = np.where(is_leaf, 0, trees["feature"]).ravel()
+        self.threshold = trees["threshold"].ravel()
+        self.default_left = trees["default_left"].ravel()
+        self.roots = offsets.ravel()
+
+        # KNNImputer training matrices, by the key their block names
+        self._knn_fit = {key: trees[key] for key in trees if key.startswith("knn_fit_")}
+
+        self._category_index = {}
+        for block in self.blocks:
+            for col, cats in zip(block["columns"], block.get("categories", [])):
+                self._category_index[col] = {cat: i for i, cat in enumerate(cats)}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            trees = {key: data[key] for key in data.files if key != "meta"}
+        if meta.get("format_version") != COMPILED_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model version in {path}")
+        return cls(meta, trees)
+
+    # --- input encoding ---
+
+    def category_codes(self, column, values):
+        index = self._category_index[column]
+        return np.fromiter((index.get(str(v), -1) for v in values), dtype=np.float64, count=len(values))
+
+    def encode_frame(self, df):
+        """Builds the raw input matrix (``input_features`` order) from a DataFrame."""
+        X = np.empty((len(df), len(self.input_features)), dtype=np.float64)
+        for j, col in enumerate(self.input_features):
+            if col in self._category_index:
+                X[:, j] = self.category_codes(col, df[col].to_numpy())
+            else:
+                X[:, j] = df[col].to_numpy(dtype=np.float64)
+        return X
+
+    def transform(self, X):
+        """Applies the folded preprocessing; returns the float32 design matrix."""
+        X = np.asarray(X, dtype=np.float64)
+        out = []
+        j = 0
+        for block in self.blocks:
+            width = len(block["columns"])
+            cols = X[:, j:j + width]
+            j += width
+            if "categories" in block:
+                for k, cats in enumerate(block["categories"]):
+                    codes = cols[:, k]
+                    onehot = np.zeros((len(X), len(cats)))
+                    known = codes >= 0
+                    onehot[np.flatnonzero(known), codes[known].astype(np.intp)] = 1.0
+                    out.append(onehot)
+            else:
+                if "knn" in block:
+                    cols = _knn_impute(cols, block["knn"], self._knn_fit[block["knn"]["fit_X"]])
+                filled = np.where(np.isnan(cols), block["fill"], cols)
+                out.append((filled - block["offset"]) / block["scale"])
+        return np.ascontiguousarray(np.hstack(out), dtype=np.float32)
+
+    # --- tree evaluation ---
+
+    def _leaf_values(self, Xt):
+        n_rows, n_cols = Xt.shape
+        flat = Xt.ravel()
+        row_base = (np.arange(n_rows, dtype=np.intp) * n_cols)[:, None]
+        node = np.broadcast_to(self.roots, (n_rows, self.n_trees))
+
+        for _ in range(self.max_depth):
+            x = flat[row_base + self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return self.threshold[node]
+
+    def predict_design(self, Xt):
+        """Predicts from an already-transformed float32 design matrix."""
+        Xt = np.ascontiguousarray(Xt, dtype=np.float32)
+        out = np.empty((len(Xt), self.n_targets), dtype=np.float32)
+        for start in range(0, len(Xt), PREDICT_BLOCK_ROWS):
+            leaves = self._leaf_values(Xt[start:start + PREDICT_BLOCK_ROWS])
+            for target in range(self.n_targets):
+                # Sum base score + leaves sequentially in float32, in tree
+                # order, exactly as XGBoost accumulates its margin
+                terms = np.empty((len(leaves), 1 + int((self.tree_target == target).sum())), dtype=np.float32)
+                terms[:, 0] = self.base_score[min(target, len(self.base_score) - 1)]
+                terms[:, 1:] = leaves[:, self.tree_target == target]
+                out[start:start + PREDICT_BLOCK_ROWS, target] = np.add.accumulate(terms, axis=1)[:, -1]
+        return out[:, 0] if self.n_targets == 1 else out
+
+    def predict_matrix(self, X):
+        return self.predict_design(self.transform(X))
+
+    def predict(self, df):
+        return self.predict_matrix(self.encode_frame(df))
+
+
+def _nan_euclidean(X, Y):
+    """
+    ``sklearn.metrics.pairwise.nan_euclidean_distances(X, Y)``, step for step,
+    so the float results (and thus the neighbour order on ties) are identical.
+    """
+    missing_X, missing_Y = np.isnan(X), np.isnan(Y)
+    X = np.where(missing_X, 0.0, X)
+    Y = np.where(missing_Y, 0.0, Y)
+
+    distances = -2 * np.dot(X, Y.T)
+    distances += np.einsum("ij,ij->i", X, X)[:, np.newaxis]
+    distances += np.einsum("ij,ij->i", Y, Y)[np.newaxis, :]
+    np.maximum(distances, 0, out=distances)
+
+    distances -= np.dot(X * X, missing_Y.T)
+    distances -= np.dot(missing_X, (Y * Y).T)
+    np.clip(distances, 0, None, out=distances)
+
+    present_count = np.dot(1 - missing_X, (~missing_Y).T)
+    distances[present_count == 0] = np.nan
+    np.maximum(1, present_count, out=present_count)
+    distances /= present_count
+    distances *= X.shape[1]
+    return np.sqrt(distances, out=distances)
+
+
+def _knn_impute(cols, knn, fit_X):
+    """``KNNImputer.transform`` of one block's raw columns against its training matrix."""
+    mask = np.isnan(cols)
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not len(rows):
+        return cols
+
+    cols = cols.copy()
+    fit_mask = np.isnan(fit_X)
+    distances = _nan_euclidean(cols[rows], fit_X)
+    for j in range(cols.shape[1]):
+        receivers = np.flatnonzero(mask[rows, j])
+        if not len(receivers):
+            continue
+        donors = np.flatnonzero(~fit_mask[:, j])
+        dist = distances[receivers][:, donors]
+
+        # No feature in common with any donor: the training column mean
+        no_distance = np.isnan(dist).all(axis=1)
+        cols[rows[receivers[no_distance]], j] = knn["means"][j]
+        receivers, dist = receivers[~no_distance], dist[~no_distance]
+        if not len(receivers):
+            continue
+
+        k = min(knn["n_neighbors"], len(donors))
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        nearest_dist = dist[np.arange(len(nearest))[:, np.newaxis], nearest]
+        if knn["weights"] == "distance":
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / nearest_dist
+            exact = np.isinf(weights)
+            exact_rows = exact.any(axis=1)
+            weights[exact_rows] = exact[exact_rows]
+            weights[np.isnan(weights)] = 0.0
+        else:
+            weights = np.ones_like(nearest_dist)
+            weights[np.isnan(nearest_dist)] = 0.0
+
+        values = np.ma.array(fit_X[donors, j].take(nearest), mask=fit_mask[donors, j].take(nearest))
+        cols[rows[receivers], j] = np.ma.average(values, axis=1, weights=weights).data
+    return cols
+
+
+def compiled_path(joblib_path):
+    return os.path.splitext(joblib_path)[0] + ".npz"
+
+
+if __name__ == "__main__":
+    import sys
+    import joblib
+
+    for artifact in sys.argv[1:]:
+        out = export_compiled_pipeline(joblib.load(artifact), compiled_path(artifact))
+        print(f"✅ Compiled {artifact} -> {out}")
@@ -0,0 +1,160 @@
+"""
+Cached access to the raw training workbook.
+
+Parsing ``Main_Data_edited.xlsx`` is the slowest step of a retraining run,
+and every loader used to do it again. The first read converts the workbook
+to a columnar cache file named after the workbook's content hash, so the
+cache is rebuilt only when the workbook changes. The cache is Parquet when
+pyarrow is installed and a pickle otherwise. Later reads load only the
+columns the caller asks for.
+
+Within one process the columns read so far, and the engineered frames
+returned by ``memoize_frame`` loaders, are kept in memory. For example,
+preparing the AM and PM transparency data parses and embeds once.
+
+Configuration (environment):
+    AQUAVITALS_DATA_CACHE   Directory for the converted cache (default Data/Cache)
+"""
+import functools
+import hashlib
+import os
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # pyarrow is optional; the cache falls back to pickle
+    pyarrow = None
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+RAW_DATA_PATH = os.path.join(ROOT_DIR, "Data", "Raw", "Main_Data_edited.xlsx")
+CACHE_DIR = os.environ.get("AQUAVITALS_DATA_CACHE", os.path.join(ROOT_DIR, "Data", "Cache"))
+
+_lock = threading.RLock()
+_hashes = {}    # (path, mtime, size) -> content hash
+_columns = {}   # (path, content hash) -> {"order": workbook column order, "data": {column: Series}}
+_frames = {}    # (loader, args, content hash) -> engineered DataFrame
+
+
+def content_hash(path=RAW_DATA_PATH):
+    """SHA-256 of the file contents (memoized per path, mtime and size)."""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key not in _hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            _hashes[key] = digest.hexdigest()
+        return _hashes[key]
+
+
+def cache_paths(path=RAW_DATA_PATH, cache_dir=CACHE_DIR):
+    """(parquet, pickle) cache file paths for the workbook's current contents."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(cache_dir, f"{stem}-{content_hash(path)[:16]}")
+    return base + ".parquet", base + ".pkl"
+
+
+def _write_atomic(write, target):
+    # A concurrent reader never sees a partially written cache file
+    tmp = f"{target}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, target)
+
+
+def _convert(path, cache_dir):
+    df = pd.read_excel(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, pickle_path = cache_paths(path, cache_dir)
+    if pyarrow is not None:
+        try:
+            _write_atomic(lambda tmp: df.to_parquet(tmp, index=False), parquet_path)
+            return df
+        except (ValueError, TypeError):
+            # e.g. an object column mixing numbers and text; pickle keeps it as-is
+            pass
+    _write_atomic(df.to_pickle, pickle_path)
+    return df
+
+
+def _read_cache(path, cache_dir, columns):
+    parquet_path, pickle_path = cache_paths(path, cache_dir)
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path, columns=columns)
+    if os.path.exists(pickle_path):
+        df = pd.read_pickle(pickle_path)
+    else:
+        df = _convert(path, cache_dir)
+    # Only parquet reads a column subset; trim the others to match
+    return df if columns is None else df[columns]
+
+
+def load_raw_data(columns=None, path=RAW_DATA_PATH, cache_dir=CACHE_DIR):
+    """
+    Returns the raw workbook as a DataFrame (a copy the caller may modify).
+
+    Args:
+        columns (list, optional): Only these columns, in this order.
+        path (str): Source workbook.
+        cache_dir (str): Directory for the converted cache file.
+    """
+    with _lock:
+        cached = _columns.setdefault((path, content_hash(path)), {"order": None, "data": {}})
+        data = cached["data"]
+
+        if columns is None and cached["order"] is None:
+            df = _read_cache(path, cache_dir, None)
+            cached["order"] = list(df.columns)
+            data.update({col: df[col] for col in df.columns if col not in data})
+        elif columns is not None:
+            missing = [col for col in columns if col not in data]
+            if missing:
+                df = _read_cache(path, cache_dir, missing)
+                data.update({col: df[col] for col in df.columns if col not in data})
+
+        wanted = cached["order"] if columns is None else list(columns)
+        return pd.DataFrame({col: data[col] for col in wanted}).copy()
+
+
+def memoize_frame(loader):
+    """
+    Caches a DataFrame-returning loader per process, keyed by its arguments
+    and the workbook's content hash. Callers get their own copy.
+    """
+    @functools.wraps(loader)
+    def wrapper(*args, **kwargs):
+        key = (loader.__module__, loader.__qualname__, args, tuple(sorted(kwargs.items())), content_hash())
+        with _lock:
+            frame = _frames.get(key)
+        if frame is None:
+            frame = loader(*args, **kwargs)
+            with _lock:
+                _frames[key] = frame
+        return frame.copy()
+
+    return wrapper
+
+
+def clear_memory_cache():
+    with _lock:
+        _hashes.clear()
+        _columns.clear()
+        _frames.clear()
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    df = pd.read_excel(RAW_DATA_PATH)
+    print(f"read_excel: {time.perf_counter() - start:.2f}s ({len(df)} rows)")
+
+    load_raw_data()  # make sure the cache exists
+    clear_memory_cache()
+    start = time.perf_counter()
+    load_raw_data()
+    print(f"cached read: {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,128 @@
+"""
+Vectorized feature assembly shared by the data-prep loaders and serving.
+
+Season, the rain interactions and the simulated weather/caretaker comments
+are computed over whole columns: the season is a month -> season lookup
+array, and each comment is an index into its fixed vocabulary chosen with
+``np.select``. This replaces the per-row ``Series.apply``,
+``DataFrame.apply(axis=1)`` and ``df.iloc[i]`` loops. The outputs match the
+row-wise rules exactly; ``tests/test_feature_assembly.py`` checks this.
+"""
+import numpy as np
+import pandas as pd
+
+from comment_embeddings import (
+    TRANSPARENCY_WEATHER_COMMENTS, WEATHER_CODE_COMMENTS, WEATHER_FALLBACK_COMMENTS, caretaker_comments,
+)
+
+
+# === Season ===
+
+SEASONS = np.array(["Winter", "Spring", "Summer", "Fall"], dtype=object)
+
+# Index = month number; anything that isn't a month 1-12 falls through to Fall
+_MONTH_SEASON = np.array([3, 0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.intp)
+
+
+def season_of(months):
+    """Returns the season name of each month (12-2 Winter, 3-5 Spring, 6-8 Summer, else Fall)."""
+    months = pd.to_numeric(pd.Series(months), errors="coerce").to_numpy(dtype=np.float64)
+    valid = (months >= 1) & (months <= 12) & (months == np.floor(months))
+    codes = np.full(len(months), 3, dtype=np.intp)
+    codes[valid] = _MONTH_SEASON[months[valid].astype(np.intp)]
+    return SEASONS[codes]
+
+
+# === Rain interactions ===
+
+# Interaction column -> temperature column multiplied by the total rain (None: the total itself)
+RAIN_INTERACTIONS = {
+    "Total Rain": None,
+    "Max Air Temp x Rain": "Max air temp",
+    "Spring_Temp x Rain": "Spring Temp (F)",
+}
+
+
+def add_rain_interactions(df, names):
+    """
+    Adds the ``names`` columns of ``RAIN_INTERACTIONS`` (Dec + Calmar rain and
+    its products with temperature), filled into one preallocated block and
+    appended in a single concat.
+    """
+    total = df["Dec Rain"].to_numpy(dtype=np.float64) + df["Calmar Rain"].to_numpy(dtype=np.float64)
+    block = np.empty((len(df), len(names)))
+    for j, name in enumerate(names):
+        temp_col = RAIN_INTERACTIONS[name]
+        if temp_col is None:
+            block[:, j] = total
+        else:
+            np.multiply(df[temp_col].to_numpy(dtype=np.float64), total, out=block[:, j])
+    return append_features(df, names, block)
+
+
+def append_features(df, names, features):
+    """Returns ``df`` with the ``features`` matrix as columns ``names`` (replacing any existing ones)."""
+    # One concat instead of a column insert per feature keeps the frame unfragmented
+    existing = [name for name in names if name in df.columns]
+    return pd.concat(
+        [df.drop(columns=existing), pd.DataFrame(features, index=df.index, columns=names)],
+        axis=1,
+    )
+
+
+# === Simulated comments ===
+
+_WEATHER_VOCAB = np.array(list(WEATHER_CODE_COMMENTS.values()) + WEATHER_FALLBACK_COMMENTS, dtype=object)
+_CODE_ROWS = np.full(max(WEATHER_CODE_COMMENTS) + 1, -1, dtype=np.intp)
+_CODE_ROWS[list(WEATHER_CODE_COMMENTS)] = np.arange(len(WEATHER_CODE_COMMENTS))
+
+_TRANSPARENCY_VOCAB = np.array(TRANSPARENCY_WEATHER_COMMENTS, dtype=object)
+
+# caretaker_comments() order: clarity (murky, clear) x temperature (none, colder, warmer) x rain (no, yes)
+_CARETAKER_VOCAB = np.array(caretaker_comments(), dtype=object)
+
+
+def _column(df, name, default=0.0):
+    if name not in df:
+        return np.full(len(df), default, dtype=np.float64)
+    return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def weather_code_comments(df):
+    """
+    Serving: the comment for each day's Open-Meteo ``weathercode``, or a
+    rain/temperature fallback when the code is missing or unknown.
+    """
+    codes = _column(df, "weathercode", np.nan)
+    rain = _column(df, "Total Rain")
+    temp = _column(df, "Spring Temp (F)")
+
+    rows = np.select([rain > 0.5, rain > 0.2, temp > 65], [0, 1, 2], 3) + len(WEATHER_CODE_COMMENTS)
+    known = (codes >= 0) & (codes < len(_CODE_ROWS)) & (codes == np.floor(codes))
+    code_rows = np.full(len(df), -1, dtype=np.intp)
+    code_rows[known] = _CODE_ROWS[codes[known].astype(np.intp)]
+    rows = np.where(code_rows >= 0, code_rows, rows)
+    return _WEATHER_VOCAB[rows]
+
+
+def transparency_weather_comments(df):
+    """Training (transparency): a comment from the day's total rain, else its spring temperature."""
+    rain = _column(df, "Total Rain")
+    temp = _column(df, "Spring Temp (F)")
+    rows = np.select([rain > 0.5, rain > 0.2, rain > 0, temp > 65], [0, 1, 2, 3], 4)
+    return _TRANSPARENCY_VOCAB[rows]
+
+
+def fish_caretaker_comments(df):
+    """
+    Training (survival): a clarity sentence, plus a temperature and a rain
+    sentence when they apply, as one caretaker comment per day.
+    """
+    am = df["AM Transparency"].to_numpy(dtype=np.float64)
+    temp = df["Spring Temp (F)"].to_numpy(dtype=np.float64)
+    rain = df["Total Rain"].to_numpy(dtype=np.float64)
+
+    clarity = np.where(am < 80, 0, 1)
+    temperature = np.select([temp < 50, temp > 60], [1, 2], 0)
+    rained = (rain > 0.4).astype(np.intp)
+    return _CARETAKER_VOCAB[clarity * 6 + temperature * 2 + rained]
@@ -0,0 +1,260 @@
+"""
+Versioned description of the columns a fitted pipeline consumes.
+
+A ``FeatureSchema`` records, in order, the raw input columns of a model's
+preprocessing (the ColumnTransformer's column lists), the dtype kind of each
+column ("float64" or "category" with its one-hot categories), their
+positional index, and the full frame columns the pipeline was fitted on.
+Training saves it as ``<artifact>.schema.json`` next to the ``.joblib``/``.npz``
+files; serving checks it against the loaded model and uses it to build the
+model's input matrix by position instead of aligning DataFrame columns by
+name on every call.
+
+Either side fails with ``SchemaMismatchError`` (a ``ValueError``) when the
+schemas drift apart: a training frame or serving frame missing a column or
+holding text where numbers are expected, or an artifact whose inputs no
+longer match its schema.
+
+Write schemas for existing artifacts (``--target`` names the predicted
+columns; without it an existing schema's targets are kept):
+
+    python src/feature_schema.py app/models/am_transparency_model.joblib --target "AM Transparency"
+    python src/feature_schema.py app/models/*.joblib
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+FEATURE_SCHEMA_VERSION = 1
+
+FLOAT = "float64"
+CATEGORY = "category"
+
+
+class SchemaMismatchError(ValueError):
+    pass
+
+
+def schema_path(artifact_path):
+    return os.path.splitext(artifact_path)[0] + ".schema.json"
+
+
+def _column_transformer(pipeline):
+    # The scripts nest the ColumnTransformer in a single-step "preprocessor" Pipeline
+    preprocessor = pipeline.named_steps["preprocessor"] if hasattr(pipeline, "named_steps") else pipeline
+    while hasattr(preprocessor, "steps"):
+        preprocessor = preprocessor.steps[-1][1]
+    return preprocessor
+
+
+def _one_hot_categories(transformer):
+    steps = transformer.steps if hasattr(transformer, "steps") else [(None, transformer)]
+    for _, step in steps:
+        if type(step).__name__ == "OneHotEncoder":
+            return step
+    return None
+
+
+class FeatureSchema:
+    """
+    Args:
+        columns (list): Raw model inputs in matrix order.
+        dtypes (dict): Column -> ``FLOAT`` or ``CATEGORY``.
+        categories (dict, optional): Categorical column -> known categories (None until fitted).
+        feature_names_in (list, optional): Columns of the frame the pipeline was fitted on.
+        targets (list, optional): Names of the predicted columns.
+    """
+
+    def __init__(self, columns, dtypes, categories=None, feature_names_in=None, targets=None):
+        self.columns = list(columns)
+        self.dtypes = {col: dtypes[col] for col in self.columns}
+        self.categories = dict(categories or {})
+        self.feature_names_in = list(feature_names_in) if feature_names_in is not None else list(self.columns)
+        self.targets = list(targets or [])
+        self.index = {col: i for i, col in enumerate(self.columns)}
+
+        self._float_positions = np.array(
+            [i for i, col in enumerate(self.columns) if self.dtypes[col] == FLOAT], dtype=np.intp
+        )
+        self._float_columns = [self.columns[i] for i in self._float_positions]
+        self._category_columns = [col for col in self.columns if self.dtypes[col] == CATEGORY]
+        self._category_codes = {
+            col: {cat: i for i, cat in enumerate(cats)} for col, cats in self.categories.items() if cats is not None
+        }
+
+    @classmethod
+    def from_pipeline(cls, pipeline, targets=None):
+        """
+        Reads the schema off a training pipeline. Works before fitting too
+        (categories are then None), so a frame can be checked before a search starts.
+        """
+        transformer = _column_transformer(pipeline)
+        fitted = hasattr(transformer, "transformers_")
+        columns, dtypes, categories = [], {}, {}
+        for name, sub, cols in (transformer.transformers_ if fitted else transformer.transformers):
+            if name == "remainder" or sub == "drop":
+                continue
+            encoder = _one_hot_categories(sub)
+            for k, col in enumerate(cols):
+                columns.append(col)
+                dtypes[col] = CATEGORY if encoder is not None else FLOAT
+                if encoder is not None:
+                    categories[col] = [str(c) for c in encoder.categories_[k]] if fitted else None
+        return cls(columns, dtypes, categories, getattr(pipeline, "feature_names_in_", None), targets)
+
+    # --- persistence ---
+
+    @property
+    def version(self):
+        """Short hash of the columns, dtypes and categories; equal schemas share it."""
+        canonical = json.dumps([self.columns, self.dtypes, self.categories], sort_keys=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+    def to_dict(self):
+        return {
+            "format_version": FEATURE_SCHEMA_VERSION,
+            "version": self.version,
+            "targets": self.targets,
+            "columns": [
+                {"name": col, "index": i, "dtype": self.dtypes[col],
+                 **({"categories": self.categories[col]} if col in self.categories else {})}
+                for i, col in enumerate(self.columns)
+            ],
+            "feature_names_in": self.feature_names_in,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format_version") != FEATURE_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported feature schema version {data.get('format_version')}")
+        columns = sorted(data["columns"], key=lambda column: column["index"])
+        return cls(
+            [column["name"] for column in columns],
+            {column["name"]: column["dtype"] for column in columns},
+            {column["name"]: column["categories"] for column in columns if "categories" in column},
+            data.get("feature_names_in"),
+            data.get("targets"),
+        )
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    # --- drift checks ---
+
+    def diff(self, other):
+        """Human-readable differences from ``other`` (empty when they match)."""
+        problems = []
+        missing = [col for col in self.columns if col not in other.index]
+        extra = [col for col in other.columns if col not in self.index]
+        if missing:
+            problems.append(f"missing columns {missing}")
+        if extra:
+            problems.append(f"unexpected columns {extra}")
+        if not missing and not extra and self.columns != other.columns:
+            problems.append("column order differs")
+        for col in self.columns:
+            if col not in other.index:
+                continue
+            if self.dtypes[col] != other.dtypes[col]:
+                problems.append(f"'{col}' is {other.dtypes[col]}, expected {self.dtypes[col]}")
+            elif self.categories.get(col) != other.categories.get(col):
+                problems.append(f"'{col}' categories {other.categories.get(col)}, expected {self.categories.get(col)}")
+        return problems
+
+    def check_model(self, model):
+        """Raises ``SchemaMismatchError`` unless ``model`` (sklearn or compiled) consumes exactly this schema."""
+        if hasattr(model, "input_features"):
+            categories = {
+                col: cats for block in model.blocks
+                for col, cats in zip(block["columns"], block.get("categories", []))
+            }
+            actual = FeatureSchema(
+                model.input_features,
+                {col: CATEGORY if col in categories else FLOAT for col in model.input_features},
+                categories, list(model.feature_names_in_),
+            )
+        else:
+            actual = FeatureSchema.from_pipeline(model)
+        problems = self.diff(actual)
+        if list(actual.feature_names_in) != self.feature_names_in:
+            problems.append("fitted frame columns differ")
+        if problems:
+            raise SchemaMismatchError(f"Model does not match its feature schema {self.version}: {'; '.join(problems)}")
+
+    def check_frame(self, df):
+        """Raises ``SchemaMismatchError`` if ``df`` lacks a column or has text in a float column."""
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise SchemaMismatchError(f"Frame is missing schema {self.version} columns: {missing}")
+        non_numeric = [
+            col for col in self._float_columns
+            if not (pd.api.types.is_numeric_dtype(df[col]) or df[col].isna().all())
+        ]
+        if non_numeric:
+            raise SchemaMismatchError(f"Schema {self.version} float columns hold non-numeric data: {non_numeric}")
+
+    # --- serving ---
+
+    def matrix(self, df):
+        """
+        Returns the model input matrix of ``df``: a C-contiguous array in
+        schema order, categorical columns given as category indices (-1 if
+        unknown). It stays float64 so imputation and scaling round exactly as
+        in the sklearn pipeline; the compiled model's design matrix is float32.
+        """
+        try:
+            positions = np.array([df.columns.get_loc(col) for col in self.columns], dtype=np.intp)
+        except KeyError:
+            self.check_frame(df)
+            raise
+        X = np.empty((len(df), len(self.columns)), dtype=np.float64)
+        if len(self._float_positions):
+            try:
+                X[:, self._float_positions] = df.iloc[:, positions[self._float_positions]].to_numpy(dtype=np.float64)
+            except (TypeError, ValueError):
+                self.check_frame(df)
+                raise
+        for col in self._category_columns:
+            codes = self._category_codes[col]
+            values = df.iloc[:, positions[self.index[col]]].to_numpy()
+            X[:, self.index[col]] = np.fromiter(
+                (codes.get(value, -1) for value in map(str, values)), dtype=np.float64, count=len(values)
+            )
+        return X
+
+
+def main():
+    import argparse
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Write <artifact>.schema.json for fitted .joblib pipelines.")
+    parser.add_argument("artifacts", nargs="+", help=".joblib files")
+    parser.add_argument("--target", action="append", dest="targets", default=None,
+                        help="A predicted column (repeat for multi-output models); "
+                             "default: the targets of the artifact's existing schema")
+    args = parser.parse_args()
+
+    for artifact in args.artifacts:
+        path = schema_path(artifact)
+        targets = args.targets
+        if targets is None and os.path.exists(path):
+            targets = FeatureSchema.load(path).targets
+        schema = FeatureSchema.from_pipeline(joblib.load(artifact), targets)
+        out = schema.save(path)
+        print(f"✅ Feature schema {schema.version} ({len(schema.columns)} columns, "
+              f"targets {schema.targets}) -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "..")))
 from data_preparation.fish_survival_data_preparation import create_fish_pipeline, prepare_fish_data
+from compiled_model import compiled_path, export_compiled_pipeline
+from feature_schema import FeatureSchema, schema_path
+from time_splits import time_series_cv
 
 def evaluate_xgb(X_train, y_train, X_dev, y_dev):
     print("Evaluating XGBoost Regressor...")
@@ -30,7 +33,7 @@ def evaluate_xgb(X_train, y_train, X_dev, y_dev):
 
     grid_search = GridSearchCV(
         pipeline_with_algo, param_grid,
-        cv=5, scoring='neg_mean_squared_error', verbose=1
+        cv=time_series_cv(5), scoring='neg_mean_squared_error', verbose=1
     )
     grid_search.fit(X_train, y_train)
     best_estimator = grid_search.best_estimator_
@@ -96,8 +99,14 @@ def main():
     evaluate_metrics(y_dev, y_dev_pred, "Dev")
     evaluate_metrics(y_test, y_test_pred, "Test")
 
+    FeatureSchema.from_pipeline(best_model, ["Fish survival rate"]).save(schema_path("models/fish_survival_model.joblib"))
+    print("✅ Feature schema saved as: models/fish_survival_model.schema.json")
+
     dump(best_model, "models/fish_survival_model.joblib")
     print("✅ Model saved as: models/fish_survival_model.joblib")
 
+    export_compiled_pipeline(best_model, compiled_path("models/fish_survival_model.joblib"))
+    print("✅ Compiled model saved as: models/fish_survival_model.npz")
+
 if __name__ == "__main__":
     main()
@@ -11,6 +11,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "..")))
 
 from data_preparation.Spring_temp_data_preparation import create_spring_temp_pipeline, prepare_spring_temp_data
+from compiled_model import compiled_path, export_compiled_pipeline
+from feature_schema import FeatureSchema, schema_path
+from time_splits import time_series_cv
 
 def evaluate_xgb(X_train, y_train, X_dev, y_dev):
     print("Evaluating XGBoost Regressor...")
@@ -31,7 +34,7 @@ def evaluate_xgb(X_train, y_train, X_dev, y_dev):
 
     grid_search = GridSearchCV(
         pipeline_with_algo, param_grid,
-        cv=5, scoring='neg_mean_squared_error', verbose=1
+        cv=time_series_cv(5), scoring='neg_mean_squared_error', verbose=1
     )
     grid_search.fit(X_train, y_train)
     best_estimator = grid_search.best_estimator_
@@ -97,8 +100,14 @@ def main():
     evaluate_metrics(y_test, y_test_pred, "Test")
 
     # ✅ Save model
+    FeatureSchema.from_pipeline(best_model, ["Spring Temp (F)"]).save(schema_path("models/spring_temp_model.joblib"))
+    print("✅ Feature schema saved as: models/spring_temp_model.schema.json")
+
     dump(best_model, "models/spring_temp_model.joblib")
     print("✅ Model saved as: models/spring_temp_model.joblib")
 
+    export_compiled_pipeline(best_model, compiled_path("models/spring_temp_model.joblib"))
+    print("✅ Compiled model saved as: models/spring_temp_model.npz")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,288 @@
+"""
+Trains the chain models with a parallel hyperparameter search.
+
+Compared with running spring_temp_model.py, transparency_model.py and
+fish_survival_model.py one after another:
+
+  * the targets (spring temp, transparency, fish survival) are searched
+    concurrently, one process per target;
+  * AM and PM transparency are one multi-output model ("transparency"):
+    one preprocessing fit and one booster predicting both columns, saved as
+    a single artifact (the separate ``am_transparency``/``pm_transparency``
+    targets are still available);
+  * each search runs its CV fits in parallel, splitting the cores between
+    the targets (XGBoost uses one thread per fit, so cores aren't oversubscribed);
+  * the fitted preprocessing of each fold is cached (``Pipeline(memory=...)``)
+    and reused by every candidate instead of being refit per config;
+  * ``--search halving`` uses successive halving on ``n_estimators``, so
+    weak configs are dropped after a few hundred trees instead of 1000.
+  * train/dev/test and the CV folds keep time order (``time_splits.py``):
+    ``--cv walk_forward`` validates each fold on rows after its training
+    rows, ``--cv blocked`` on contiguous blocks with the neighbouring rows purged.
+
+The workbook is loaded and prepared once in the parent process (see
+``dataset.py``) and the splits are shipped to the workers.
+
+    python src/py/train_all.py --search halving --output-dir models
+    python src/py/train_all.py --targets transparency --baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from joblib import Memory, Parallel, delayed, dump
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.metrics import mean_absolute_percentage_error, mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(SRC_DIR)
+sys.path.append(os.path.join(SRC_DIR, "Data_Preparation"))
+sys.path.append(os.path.join(SRC_DIR, "..", "app"))
+
+from compiled_model import compiled_path, export_compiled_pipeline
+from feature_schema import FeatureSchema, schema_path
+from model_registry import MODEL_FILES, OPTIONAL_MODEL_FILES
+from time_splits import CV_KINDS, time_series_cv
+
+
+# Same grid as the per-model scripts
+PARAM_GRID = {
+    "algo__n_estimators": [1000],
+    "algo__max_depth": [2, 3, 4],
+    "algo__learning_rate": [0.01, 0.05, 0.1],
+    "algo__subsample": [0.8, 1.0],
+}
+# Time-ordered folds over the training rows (time_splits.time_series_cv)
+CV_FOLDS = 5
+
+# Successive halving grows n_estimators 125 -> 250 -> 500 -> 1000,
+# keeping the best half of the candidates at each step
+HALVING_MIN_TREES = 125
+HALVING_FACTOR = 2
+
+# Artifact file of each target: the names the serving registry loads
+TARGETS = {
+    name: {**MODEL_FILES, **OPTIONAL_MODEL_FILES}[name]
+    for name in ["spring_temp", "transparency", "am_transparency", "pm_transparency", "fish_survival"]
+}
+
+# Trained when --targets isn't given
+DEFAULT_TARGETS = ["spring_temp", "transparency", "fish_survival"]
+
+
+def load_target_data(name):
+    """Returns (X_train, X_dev, X_test, y_train, y_dev, y_test) for a target."""
+    if name == "spring_temp":
+        from Spring_temp_data_preparation import prepare_spring_temp_data
+        return prepare_spring_temp_data()
+    if name == "transparency":
+        from Transparency_data_preparation import prepare_transparency_data
+        return prepare_transparency_data()
+    if name == "am_transparency":
+        from Transparency_data_preparation import prepare_am_transparency_data
+        return prepare_am_transparency_data()
+    if name == "pm_transparency":
+        from Transparency_data_preparation import prepare_pm_transparency_data
+        return prepare_pm_transparency_data()
+    if name == "fish_survival":
+        from fish_survival_data_preparation import prepare_fish_data
+        return prepare_fish_data(ratios=(1/10, 1/10))
+    raise KeyError(name)
+
+
+def create_preprocessor(name):
+    if name == "spring_temp":
+        from Spring_temp_data_preparation import create_spring_temp_pipeline
+        return create_spring_temp_pipeline()
+    if name in ("transparency", "am_transparency", "pm_transparency"):
+        from Transparency_data_preparation import create_transparency_pipeline
+        return create_transparency_pipeline()
+    if name == "fish_survival":
+        from fish_survival_data_preparation import create_fish_pipeline
+        return create_fish_pipeline()
+    raise KeyError(name)
+
+
+def build_search(name, search="grid", n_jobs=1, cache_dir=None, xgb_n_jobs=1, cv="walk_forward"):
+    pipeline = Pipeline(
+        steps=[
+            ("preprocessor", create_preprocessor(name)),
+            ("algo", XGBRegressor(objective="reg:squarederror", random_state=42, n_jobs=xgb_n_jobs)),
+        ],
+        memory=Memory(cache_dir, verbose=0) if cache_dir else None,
+    )
+    folds = time_series_cv(CV_FOLDS, cv)
+
+    if search == "grid":
+        return GridSearchCV(
+            pipeline, PARAM_GRID, cv=folds, scoring="neg_mean_squared_error", n_jobs=n_jobs
+        )
+    if search == "halving":
+        grid = {key: values for key, values in PARAM_GRID.items() if key != "algo__n_estimators"}
+        return HalvingGridSearchCV(
+            pipeline, grid, cv=folds, scoring="neg_mean_squared_error", n_jobs=n_jobs,
+            resource="algo__n_estimators", min_resources=HALVING_MIN_TREES,
+            max_resources=max(PARAM_GRID["algo__n_estimators"]), factor=HALVING_FACTOR,
+            random_state=42,
+        )
+    raise ValueError(f"Unknown search: {search}")
+
+
+def split_metrics(y_true, y_pred):
+    metrics = {
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "mape": float(mean_absolute_percentage_error(y_true, y_pred)),
+        "r2": float(r2_score(y_true, y_pred)),
+    }
+    if getattr(y_true, "ndim", 1) == 2:
+        # Multi-output: the averages above plus each target on its own
+        metrics["per_target"] = {
+            col: split_metrics(y_true[col], y_pred[:, j]) for j, col in enumerate(y_true.columns)
+        }
+    return metrics
+
+
+def train_target(name, data, search="grid", n_jobs=1, cache_dir=None, xgb_n_jobs=1, cv="walk_forward"):
+    """Runs the search for one target and returns (best_estimator, report)."""
+    X_train, X_dev, X_test, y_train, y_dev, y_test = data
+    started = time.perf_counter()
+    searcher = build_search(name, search, n_jobs=n_jobs, cache_dir=cache_dir, xgb_n_jobs=xgb_n_jobs, cv=cv)
+
+    # Fail before the search if the split and the pipeline disagree on the features
+    expected = FeatureSchema.from_pipeline(searcher.estimator)
+    for X in (X_train, X_dev, X_test):
+        expected.check_frame(X)
+
+    searcher.fit(X_train, y_train)
+    best = searcher.best_estimator_
+    # Fitting with a cached transformer leaves the memory wrapper on the clone
+    best.set_params(memory=None)
+
+    report = {
+        "target": name,
+        "search": search,
+        "cv": cv,
+        "seconds": time.perf_counter() - started,
+        "fits": int(len(searcher.cv_results_["params"]) * CV_FOLDS),
+        "best_params": searcher.best_params_,
+        "best_cv_score": float(searcher.best_score_),
+        "train": split_metrics(y_train, best.predict(X_train)),
+        "dev": split_metrics(y_dev, best.predict(X_dev)),
+        "test": split_metrics(y_test, best.predict(X_test)),
+    }
+    return best, report
+
+
+def resolve_cores(n_jobs):
+    """Cores ``train_all`` splits between the targets for an ``n_jobs`` setting."""
+    return os.cpu_count() if n_jobs in (None, -1) else n_jobs
+
+
+def train_all(targets, search="halving", n_jobs=-1, output_dir=None, cv="walk_forward"):
+    """
+    Trains ``targets`` concurrently and returns ({name: estimator}, wall seconds, reports).
+
+    Args:
+        targets (list): Names from ``TARGETS``.
+        search (str): "grid" (the scripts' exhaustive search) or "halving".
+        n_jobs (int): Total cores to use (-1 for all).
+        output_dir (str, optional): Where to write ``.joblib``, compiled ``.npz`` and ``.schema.json`` artifacts.
+        cv (str): "walk_forward" or "blocked" time-series CV folds.
+    """
+    cores = resolve_cores(n_jobs)
+    outer = min(len(targets), cores)
+    inner = max(1, cores // outer)
+
+    started = time.perf_counter()
+    datasets = {name: load_target_data(name) for name in targets}
+    cache_dir = tempfile.mkdtemp(prefix="aquavitals-pipeline-cache-")
+    try:
+        results = Parallel(n_jobs=outer)(
+            delayed(train_target)(name, datasets[name], search, n_jobs=inner, cache_dir=cache_dir, cv=cv)
+            for name in targets
+        )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    wall = time.perf_counter() - started
+
+    models = {}
+    reports = []
+    for name, (best, report) in zip(targets, results):
+        models[name] = best
+        reports.append(report)
+        y_train = datasets[name][3]
+        schema = FeatureSchema.from_pipeline(
+            best, list(y_train.columns) if getattr(y_train, "ndim", 1) == 2 else [y_train.name]
+        )
+        report["feature_schema"] = schema.version
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, TARGETS[name])
+            if os.path.exists(schema_path(path)):
+                changes = FeatureSchema.load(schema_path(path)).diff(schema)
+                if changes:
+                    print(f"⚠️  {name}: feature schema changed ({'; '.join(changes)})")
+            # Schema first: a serving worker that hot-reloads the new artifact then finds the matching schema
+            schema.save(schema_path(path))
+            dump(best, path)
+            export_compiled_pipeline(best, compiled_path(path))
+            report["artifact"] = path
+    return models, wall, reports
+
+
+def train_sequential_baseline(targets):
+    """Today's behaviour: one target after another, default n_jobs, no caching."""
+    # The scripts train AM and PM transparency as two separate searches
+    scripts = [part for name in targets
+               for part in (["am_transparency", "pm_transparency"] if name == "transparency" else [name])]
+    started = time.perf_counter()
+    for name in scripts:
+        X_train, _, _, y_train, _, _ = load_target_data(name)
+        build_search(name, "grid", n_jobs=None, xgb_n_jobs=None).fit(X_train, y_train)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the chain models in parallel.")
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS, choices=list(TARGETS))
+    parser.add_argument("--search", choices=["grid", "halving"], default="halving")
+    parser.add_argument("--cv", choices=CV_KINDS, default="walk_forward", help="Time-series CV folds")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores to use (-1 for all)")
+    parser.add_argument("--output-dir", default=None, help="Save artifacts here (default: don't save)")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Also time the sequential per-script search and report the speedup")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    _, wall, reports = train_all(args.targets, args.search, args.n_jobs, args.output_dir, args.cv)
+    cores = resolve_cores(args.n_jobs)
+
+    print(f"\n{'target':<18}{'seconds':>9}{'fits':>6}{'dev RMSE':>10}{'dev R²':>8}  best params")
+    for report in reports:
+        params = {key.replace("algo__", ""): value for key, value in report["best_params"].items()}
+        print(f"{report['target']:<18}{report['seconds']:>9.1f}{report['fits']:>6}"
+              f"{report['dev']['rmse']:>10.4f}{report['dev']['r2']:>8.3f}  {params}")
+    print(f"\n⏱️  Wall clock ({args.search}, {cores} cores): {wall:.1f}s")
+
+    summary = {"search": args.search, "cv": args.cv, "cores": cores, "wall_seconds": wall, "targets": reports}
+    if args.baseline:
+        baseline = train_sequential_baseline(args.targets)
+        summary["baseline_seconds"] = baseline
+        summary["speedup"] = baseline / wall
+        print(f"⏱️  Sequential scripts: {baseline:.1f}s -> speedup {baseline / wall:.1f}x")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
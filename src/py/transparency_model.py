@@ -11,6 +11,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "..")))
 
 from data_preparation.Transparency_data_preparation import create_transparency_pipeline, prepare_am_transparency_data, prepare_pm_transparency_data
+from compiled_model import compiled_path, export_compiled_pipeline
+from feature_schema import FeatureSchema, schema_path
+from time_splits import time_series_cv
 
 def evaluate_xgb(X_train, y_train, X_dev, y_dev):
     print("Evaluating XGBoost Regressor...")
@@ -32,7 +35,7 @@ def evaluate_xgb(X_train, y_train, X_dev, y_dev):
 
     grid_search = GridSearchCV(
         pipeline_with_algo, param_grid,
-        cv=5, scoring='neg_mean_squared_error', verbose=1
+        cv=time_series_cv(5), scoring='neg_mean_squared_error', verbose=1
     )
     grid_search.fit(X_train, y_train)
     best_estimator = grid_search.best_estimator_
@@ -106,8 +109,14 @@ def main():
         evaluate_metrics(y_dev, y_dev_pred, "Dev", target)
         evaluate_metrics(y_test, y_test_pred, "Test", target)
 
+        FeatureSchema.from_pipeline(best_model, [target]).save(schema_path(model_filename))
+        print(f"✅ Feature schema saved as: {schema_path(model_filename)}")
+
         dump(best_model, model_filename)
         print(f"✅ Model saved as: {model_filename}")
 
+        export_compiled_pipeline(best_model, compiled_path(model_filename))
+        print(f"✅ Compiled model saved as: {compiled_path(model_filename)}")
+
 if __name__ == "__main__":
     main()
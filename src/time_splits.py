@@ -0,0 +1,128 @@
+"""
+Time-ordered train/dev/test splits and cross-validation folds.
+
+The data-prep loaders used to shuffle the engineered frame (``df.sample``)
+before slicing it, so test days sat between training days whose lag and
+rolling features overlap theirs. The splits here keep time order instead:
+the oldest rows train, the newest rows test. The CV folds only validate on
+rows later than their training rows (walk-forward) or on contiguous blocks
+(blocked).
+
+Every split is computed as positional index arrays. ``split_frame`` indexes
+the frame once per holdout split, and the CV splitters hand ``GridSearchCV``
+indices instead of copied frames.
+
+``gap`` purges the rows just before each evaluated block: the last ``gap``
+rows of the earlier split (and, for blocked folds, the ``gap`` rows after a
+validation block). Their lag and rolling inputs overlap the evaluated rows'.
+It counts rows, which are days for a workbook with one row per date.
+"""
+import numpy as np
+from sklearn.model_selection import TimeSeriesSplit
+
+
+# Longest lag/rolling window of the loaders' features (7-day averages)
+FEATURE_WINDOW = 7
+
+CV_KINDS = ("walk_forward", "blocked")
+
+
+def time_order(df, date_col="Date"):
+    """Positions of ``df``'s rows sorted by ``date_col`` (stable; as they are if there is no such column)."""
+    if date_col not in df:
+        return np.arange(len(df))
+    return np.argsort(df[date_col].to_numpy(), kind="stable")
+
+
+def holdout_indices(n_rows, ratios, gap=FEATURE_WINDOW):
+    """
+    Returns (train, dev, test) positions of ``n_rows`` time-ordered rows.
+
+    Args:
+        n_rows (int): Number of rows, oldest first.
+        ratios (tuple): (dev ratio, test ratio); test is the newest rows, dev the rows before it.
+        gap (int): Rows dropped from the end of train and of dev.
+    """
+    dev_ratio, test_ratio = ratios
+    dev_size = int(dev_ratio * n_rows)
+    test_size = int(test_ratio * n_rows)
+    test_start = n_rows - test_size
+    dev_start = test_start - dev_size
+
+    # Only purge in front of a split that has rows
+    train = np.arange(0, max(0, dev_start - gap) if dev_start < n_rows else n_rows)
+    dev = np.arange(dev_start, max(dev_start, test_start - gap) if test_start < n_rows else test_start)
+    test = np.arange(test_start, n_rows)
+    return train, dev, test
+
+
+def split_frame(df, features, target, ratios, gap=FEATURE_WINDOW):
+    """
+    Splits a loader's frame into time-ordered train, dev and test sets.
+
+    Rows missing a feature or target are dropped first.
+
+    Args:
+        df (pd.DataFrame): Engineered frame with a ``Date`` column.
+        features (list): Model input columns.
+        target (str or list): Target column, or a list of them for a DataFrame y (multi-output).
+        ratios (tuple): (dev ratio, test ratio).
+        gap (int): Purged rows before dev and before test.
+
+    Returns:
+        tuple: (X_train, X_dev, X_test, y_train, y_dev, y_test)
+    """
+    targets = list(target) if isinstance(target, (list, tuple)) else [target]
+    df = df.dropna(subset=features + targets)
+    df = df.iloc[time_order(df)]
+
+    X = df[features]
+    y = df[targets] if isinstance(target, (list, tuple)) else df[target]
+    train, dev, test = holdout_indices(len(df), ratios, gap)
+    return X.iloc[train], X.iloc[dev], X.iloc[test], y.iloc[train], y.iloc[dev], y.iloc[test]
+
+
+class BlockedTimeSeriesSplit:
+    """
+    Blocked CV over time-ordered rows: the rows are cut into ``n_splits``
+    contiguous blocks, and each block is validated once by a model trained on
+    every other block, minus ``gap`` rows on each side of the validation block.
+
+    Args:
+        n_splits (int): Number of blocks (folds).
+        gap (int): Training rows purged before and after the validation block.
+    """
+
+    def __init__(self, n_splits=5, gap=FEATURE_WINDOW):
+        if n_splits < 2:
+            raise ValueError(f"n_splits must be at least 2, got {n_splits}")
+        self.n_splits = n_splits
+        self.gap = gap
+
+    def split(self, X, y=None, groups=None):
+        n_rows = len(X)
+        if n_rows < self.n_splits:
+            raise ValueError(f"Cannot cut {n_rows} rows into {self.n_splits} blocks")
+        bounds = np.linspace(0, n_rows, self.n_splits + 1).astype(int)
+        rows = np.arange(n_rows)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            train = rows[(rows < start - self.gap) | (rows >= stop + self.gap)]
+            yield train, rows[start:stop]
+
+    def get_n_splits(self, X=None, y=None, groups=None):
+        return self.n_splits
+
+
+def time_series_cv(n_splits=5, kind="walk_forward", gap=FEATURE_WINDOW):
+    """
+    Returns the CV splitter for a search over time-ordered training rows.
+
+    "walk_forward" validates on ``n_splits`` successive blocks with an
+    expanding training window of all earlier rows (``TimeSeriesSplit``).
+    "blocked" is ``BlockedTimeSeriesSplit``.
+    """
+    if kind == "walk_forward":
+        return TimeSeriesSplit(n_splits=n_splits, gap=gap)
+    if kind == "blocked":
+        return BlockedTimeSeriesSplit(n_splits=n_splits, gap=gap)
+    raise ValueError(f"Unknown CV kind: {kind} (expected one of {CV_KINDS})")
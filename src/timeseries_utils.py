@@ -1,6 +1,183 @@
-import pandas as pd
+import copy
+import math
+from collections import deque
 
-def generate_time_series_features(df, cols, lags=[3], rolling_windows=[7]):
+import numpy as np
+
+from feature_assembly import append_features
+
+
+def _feature_names(cols, lags, rolling_windows):
+    """Lag and rolling-average column names, in the order they are added."""
+    return [
+        name
+        for col in cols
+        for name in [f"{col} (Lag {lag})" for lag in lags]
+                  + [f"{col} {window}-day avg" for window in rolling_windows]
+    ]
+
+
+class _RollingMean:
+    """
+    Running mean over the last ``window`` values of one series.
+
+    Mirrors pandas' ``rolling(window, min_periods=window).mean()`` step for
+    step (compensated add/remove, negative and repeated-value handling), so
+    streamed values match the pandas ones exactly.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.nobs = 0
+        self.sum = 0.0
+        self.neg_ct = 0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.same_count = 0
+        self.prev_value = None
+
+    def extend(self, series, start, seen, out):
+        """
+        Adds ``series[start:]`` one day at a time, writing each day's mean to ``out``.
+
+        ``series[start - window:start]`` must hold the preceding days (the
+        values leaving the window) and ``seen`` the number of days added so far.
+        """
+        window = self.window
+        nobs, total, neg_ct = self.nobs, self.sum, self.neg_ct
+        comp_add, comp_remove = self.compensation_add, self.compensation_remove
+        same_count, prev_value = self.same_count, self.prev_value
+        copysign, nan = math.copysign, math.nan
+
+        for k in range(len(series) - start):
+            i = start + k
+            value = series[i]
+            if window == 1:
+                # Non-overlapping windows: pandas restarts the sum every day
+                nobs, total, neg_ct, comp_add, comp_remove, same_count = 0, 0.0, 0, 0.0, 0.0, 0
+                prev_value = value
+            elif seen + k >= window:
+                leaving = series[i - window]
+                if leaving == leaving:
+                    nobs -= 1
+                    y = -leaving - comp_remove
+                    t = total + y
+                    comp_remove = t - total - y
+                    total = t
+                    if copysign(1.0, leaving) < 0:
+                        neg_ct -= 1
+            if prev_value is None:
+                prev_value = value
+            if value == value:
+                nobs += 1
+                y = value - comp_add
+                t = total + y
+                comp_add = t - total - y
+                total = t
+                if copysign(1.0, value) < 0:
+                    neg_ct += 1
+                same_count = same_count + 1 if value == prev_value else 1
+                prev_value = value
+
+            if nobs < window:
+                out[k] = nan
+            elif same_count >= nobs:
+                out[k] = prev_value
+            else:
+                result = total / nobs
+                if (neg_ct == 0 and result < 0) or (neg_ct == nobs and result > 0):
+                    result = 0.0
+                out[k] = result
+
+        self.nobs, self.sum, self.neg_ct = nobs, total, neg_ct
+        self.compensation_add, self.compensation_remove = comp_add, comp_remove
+        self.same_count, self.prev_value = same_count, prev_value
+
+
+class TimeSeriesFeatureEngine:
+    """
+    Streaming lag and rolling-average features.
+
+    Keeps a ring buffer of the last ``max(lags + rolling_windows)`` days per
+    series, so each new day is an O(1) update. This is for serving, where days
+    arrive in chunks or one prediction at a time; whole frames (training prep)
+    go through ``generate_time_series_features``, whose columns it reproduces
+    exactly.
+
+    Args:
+        cols (list): Names of the input series.
+        lags (list): Lag days to emit.
+        rolling_windows (list): Window sizes for rolling averages.
+    """
+
+    def __init__(self, cols, lags=(3,), rolling_windows=(7,)):
+        self.cols = list(cols)
+        self.lags = list(lags)
+        self.rolling_windows = list(rolling_windows)
+        self.depth = max(self.lags + self.rolling_windows + [1])
+        self.feature_names = _feature_names(self.cols, self.lags, self.rolling_windows)
+        self.reset()
+
+    def reset(self):
+        self.seen = 0
+        self._rings = [deque([math.nan] * self.depth, maxlen=self.depth) for _ in self.cols]
+        self._means = [[_RollingMean(window) for window in self.rolling_windows] for _ in self.cols]
+
+    def run(self, values, out=None):
+        """
+        Pushes every row of ``values`` (days x series) and returns the
+        (days x features) matrix, written into ``out`` when given.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(self.cols))
+        n_rows = len(values)
+        out = np.empty((n_rows, len(self.feature_names))) if out is None else out
+        depth = self.depth
+
+        j = 0
+        for s, ring in enumerate(self._rings):
+            # The ring's last ``depth`` days followed by the new ones
+            new = values[:, s].tolist()
+            series = list(ring) + new
+            column = np.asarray(series)
+            for lag in self.lags:
+                out[:, j] = column[depth - lag:depth - lag + n_rows]
+                j += 1
+            for mean in self._means[s]:
+                means = [0.0] * n_rows
+                mean.extend(series, depth, self.seen, means)
+                out[:, j] = means
+                j += 1
+            ring.extend(new)
+
+        self.seen += n_rows
+        return out
+
+    def push(self, values, out=None):
+        """
+        Appends one day (one value per series) and returns that day's features.
+
+        Args:
+            values (sequence): The day's value for each of ``cols``.
+            out (np.ndarray, optional): 1-D buffer of ``len(feature_names)`` to fill.
+        """
+        out = np.empty(len(self.feature_names)) if out is None else out
+        self.run([values], out.reshape(1, -1))
+        return out
+
+    def extend_frame(self, df):
+        """Pushes every row of ``df[cols]`` and returns ``df`` with this batch's features appended."""
+        return append_features(df, self.feature_names, self.run(df[self.cols].to_numpy(dtype=np.float64)))
+
+    def preview(self, values, out=None):
+        """Features ``push(values)`` would return, without changing the state."""
+        saved = copy.deepcopy((self.seen, self._rings, self._means))
+        try:
+            return self.push(values, out)
+        finally:
+            self.seen, self._rings, self._means = saved
+
+
+def generate_time_series_features(df, cols, lags=[3], rolling_windows=[7], bounds=None):
     """
     Adds lag and rolling average features for time-series analysis.
 
@@ -9,14 +186,24 @@ def generate_time_series_features(df, cols, lags=[3], rolling_windows=[7]):
         cols (list): List of column names to apply transformations on.
         lags (list): List of lag days to apply (e.g., [3, 7]).
         rolling_windows (list): List of window sizes for rolling averages.
+        bounds (list, optional): ``(start, stop)`` row ranges holding independent
+            series (e.g. several sites stacked in one frame); lags and averages
+            never reach across a boundary. Defaults to the whole frame.
 
     Returns:
         pd.DataFrame: Modified DataFrame with new time-series features.
     """
-    df = df.copy()
-    for col in cols:
-        for lag in lags:
-            df[f"{col} (Lag {lag})"] = df[col].shift(lag)
-        for window in rolling_windows:
-            df[f"{col} {window}-day avg"] = df[col].rolling(window=window, min_periods=window).mean()
-    return df
\ No newline at end of file
+    names = _feature_names(cols, lags, rolling_windows)
+    values = df[cols].astype(np.float64).reset_index(drop=True)
+    features = np.full((len(df), len(names)), np.nan)
+    # Column of each series' first feature; its lags, then its averages, follow
+    offsets = [k * (len(lags) + len(rolling_windows)) for k in range(len(cols))]
+    for start, stop in bounds or [(0, len(df))]:
+        block = values.iloc[start:stop]
+        for j, lag in enumerate(lags):
+            features[start:stop, [offset + j for offset in offsets]] = block.shift(lag).to_numpy()
+        for j, window in enumerate(rolling_windows, len(lags)):
+            means = block.rolling(window=window, min_periods=window).mean()
+            features[start:stop, [offset + j for offset in offsets]] = means.to_numpy()
+
+    return append_features(df, names, features)
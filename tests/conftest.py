@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# The repo root, for ``app.app`` as the Procfile imports it
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.join(ROOT, "app"))
+# Reference implementations and the Open-Meteo stub live with the benchmarks
+sys.path.append(os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,85 @@
+"""The compiled .npz predictor must match the sklearn/XGBoost pipeline it was exported from."""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from compiled_model import CompiledPipeline, export_compiled_pipeline
+
+sklearn = pytest.importorskip("sklearn")
+xgboost = pytest.importorskip("xgboost")
+
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import KNNImputer, SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "models")
+
+
+def _knn_pipeline(weights):
+    preprocessor = ColumnTransformer([
+        ("num", Pipeline([("imputer", SimpleImputer(strategy="median")), ("scaler", StandardScaler())]), ["a", "b"]),
+        ("transparency", Pipeline([("imputer", KNNImputer(n_neighbors=5, weights=weights))]), ["am", "pm", "c"]),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), ["season"]),
+    ])
+    return Pipeline([
+        ("preprocessor", Pipeline([("preprocessor", preprocessor)])),
+        ("algo", xgboost.XGBRegressor(n_estimators=50, max_depth=3, random_state=0)),
+    ])
+
+
+def _frame(n_rows, rng, missing=0.2):
+    df = pd.DataFrame({
+        "a": rng.normal(size=n_rows),
+        "b": rng.normal(size=n_rows),
+        # Integer-valued like the workbook's transparency readings, so neighbours tie
+        "am": rng.integers(20, 120, n_rows).astype(float),
+        "pm": rng.integers(20, 120, n_rows).astype(float),
+        "c": rng.normal(size=n_rows).round(1),
+        "season": rng.choice(["Winter", "Spring", "Summer", "Fall"], n_rows),
+    })
+    for col in ["a", "am", "pm", "c"]:
+        df.loc[rng.random(n_rows) < missing, col] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_knn_imputer_parity_with_missing_values(tmp_path, weights):
+    rng = np.random.default_rng(0)
+    train = _frame(400, rng)
+    pipeline = _knn_pipeline(weights).fit(train, rng.normal(size=len(train)))
+    path = export_compiled_pipeline(pipeline, str(tmp_path / "model.npz"))
+    compiled = CompiledPipeline.load(path)
+
+    test = _frame(300, rng, missing=0.4)
+    # Rows with every KNN column missing fall back to the training means
+    test.loc[:9, ["am", "pm", "c"]] = np.nan
+    np.testing.assert_array_equal(compiled.predict(test), pipeline.predict(test))
+
+
+def test_served_fish_model_parity_with_missing_transparency():
+    artifact = os.path.join(MODEL_DIR, "fish_survial_model.joblib")
+    if not os.path.exists(artifact):
+        pytest.skip("fish survival artifact not present")
+    import joblib
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pipeline = joblib.load(artifact)
+    compiled = CompiledPipeline.load(os.path.splitext(artifact)[0] + ".npz")
+
+    rng = np.random.default_rng(1)
+    n_rows = 200
+    df = pd.DataFrame({col: rng.normal(0.2, 0.3, n_rows) for col in pipeline.feature_names_in_})
+    df["Season"] = rng.choice(["Winter", "Spring", "Summer", "Fall"], n_rows)
+    df["# fish"] = rng.integers(1000, 30000, n_rows).astype(float)
+    df["AM Transparency"] = rng.integers(10, 130, n_rows).astype(float)
+    df["PM Transparency"] = rng.integers(10, 130, n_rows).astype(float)
+    df.loc[rng.random(n_rows) < 0.3, "AM Transparency"] = np.nan
+    df.loc[rng.random(n_rows) < 0.3, "PM Transparency"] = np.nan
+    df.loc[:4, ["AM Transparency", "PM Transparency"]] = np.nan
+
+    np.testing.assert_array_equal(compiled.predict(df), pipeline.predict(df))
@@ -0,0 +1,53 @@
+"""
+The vectorized ``feature_assembly`` features must equal the original
+row-wise code (kept in benchmarks/bench_features.py) row for row.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_features import rowwise_assembly, rowwise_weather_comments, synthetic_frame, vectorized_assembly
+from feature_assembly import season_of, weather_code_comments
+
+
+def assert_frames_match(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    for col in expected:
+        a, b = actual[col].to_numpy(), expected[col].to_numpy()
+        if a.dtype.kind == "f":
+            same = (a == b) | (np.isnan(a) & np.isnan(b))
+        else:
+            same = a == b
+        assert same.all(), f"{col} differs"
+
+
+def test_fixture_frame_matches_rowwise_code():
+    # Last and first month of every season, months that aren't 1-12, NaNs,
+    # and rain/temperature values on the comment thresholds
+    df = pd.DataFrame({
+        "Month": [12, 1, 2, 3, 5, 6, 8, 9, 11, np.nan, 0, 13, 6.5],
+        "weathercode": [0, 3, np.nan, 61, 95, -1, 4, 100, 2, 0, np.nan, 3, 1],
+        "Dec Rain": [0, 0.2, 0.3, np.nan, 0.5, 0.25, 0, 0.1, 0.4, 0, 0.2, 0, 0.6],
+        "Calmar Rain": [0, 0, 0.2, 0.1, 0.05, 0, 0, 0.1, 0.0, 0, 0.3, 0, 0],
+        "Spring Temp (F)": [45, 50, 60, 65, 65.5, np.nan, 70.5, 49.9, 60.1, 55, 50, 61, 40],
+        "Max air temp": [30, 40, np.nan, 55, 60, 75, 85, 70, 45, 50, 20, 90, 65],
+        "AM Transparency": [40, 79.9, 80, 120, 80, 79.9, 120, 40, 80, 100, 60, 80, 79],
+    })
+    assert_frames_match(vectorized_assembly(df), rowwise_assembly(df))
+    assert list(season_of(df["Month"])[:9]) == [
+        "Winter", "Winter", "Winter", "Spring", "Spring", "Summer", "Summer", "Fall", "Fall",
+    ]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_frames_match_rowwise_code(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(20):
+        df = synthetic_frame(int(rng.integers(1, 200)), rng)
+        assert_frames_match(vectorized_assembly(df), rowwise_assembly(df))
+
+
+def test_weather_comments_without_weathercode_column():
+    # Serving frames may have no weathercode column at all
+    df = synthetic_frame(50, np.random.default_rng(0)).drop(columns=["weathercode"])
+    assert list(weather_code_comments(df)) == rowwise_weather_comments(df)
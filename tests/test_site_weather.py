@@ -0,0 +1,79 @@
+"""Batch weather lookups (``app._site_weather``) against the local Open-Meteo stub."""
+import importlib
+from datetime import date
+
+import pytest
+
+from cache_backends import MemoryBackend
+from open_meteo_stub import start_stub_server
+from weather_cache import WeatherCache
+from weather_client import WeatherClient
+
+# The Flask module, imported as the Procfile does (app/ is also a package)
+app_module = importlib.import_module("app.app")
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """The stub, with the app's weather services pointed at it; yields (state, upstream calls)."""
+    server, state, url = start_stub_server()
+    client = WeatherClient(url, retries=0)
+    calls = []
+
+    def fetch(location, variables, start, end):
+        calls.append((location.name, start, end))
+        return client.fetch(location, variables, start, end)
+
+    monkeypatch.setattr(app_module, "_weather", (client, WeatherCache(backend=MemoryBackend(), fetch=fetch)))
+    yield state, calls
+    server.shutdown()
+    server.server_close()
+
+
+def site(start, end, **coords):
+    parsed, error = app_module._parse_site(dict(start_date=start, end_date=end, fish_count=1000, **coords))
+    assert error is None
+    return parsed
+
+
+def test_duplicate_sites_fetch_each_station_once(stub):
+    state, _ = stub
+    sites = [site("2025-06-01", "2025-06-05") for _ in range(5)]
+
+    weather = app_module._site_weather(sites)
+
+    assert state.requests == 2
+    expected = app_module.get_weather_days(*sites[0]["coords"], sites[0]["start"], sites[0]["end"])
+    assert weather == [expected] * 5
+
+
+def test_overlapping_sites_share_a_range_and_gaps_are_not_fetched(stub):
+    _, calls = stub
+    sites = [site("2025-06-01", "2025-06-05"), site("2025-06-04", "2025-06-10"), site("2025-09-01", "2025-09-03")]
+
+    weather = app_module._site_weather(sites)
+
+    # Windows start 7 days before each site's start; the first two merge
+    assert sorted(calls) == [
+        ("Calmar", date(2025, 5, 25), date(2025, 6, 10)),
+        ("Calmar", date(2025, 8, 25), date(2025, 9, 3)),
+        ("Decorah", date(2025, 5, 25), date(2025, 6, 10)),
+        ("Decorah", date(2025, 8, 25), date(2025, 9, 3)),
+    ]
+    for parsed, (days, start_index) in zip(sites, weather):
+        assert days[start_index]["date"] == parsed["start"].strftime("%Y-%m-%d")
+        assert days[-1]["date"] == parsed["end"].strftime("%Y-%m-%d")
+        assert (days, start_index) == app_module.get_weather_days(*parsed["coords"], parsed["start"], parsed["end"])
+
+
+def test_failed_lookup_only_fails_its_sites(stub):
+    state, _ = stub
+    sites = [site("2025-06-01", "2025-06-05"), site("2025-06-01", "2025-06-05", cal_lat=50.0)]
+    # Warm the shared Decorah and default Calmar days, then take the upstream down
+    app_module._site_weather(sites[:1])
+    state.failure_rate = 1.0
+
+    good, bad = app_module._site_weather(sites)
+
+    assert good is not None
+    assert bad is None
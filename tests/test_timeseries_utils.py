@@ -0,0 +1,79 @@
+"""
+The streaming TimeSeriesFeatureEngine must give the exact values of the
+pandas full-frame features, since training uses one and serving the other.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from timeseries_utils import TimeSeriesFeatureEngine, generate_time_series_features
+
+
+def random_case(rng):
+    """A frame with gaps, negative values, repeats and wide magnitudes, plus random lags and windows."""
+    n_rows = int(rng.integers(1, 300))
+    df = pd.DataFrame({
+        "a": rng.normal(0, 10.0 ** rng.integers(-3, 6), n_rows),
+        "b": rng.exponential(1, n_rows).round(1) * (rng.random(n_rows) < 0.5),
+        "c": rng.integers(-5, 5, n_rows).astype(float),
+    })
+    for col in df:
+        df.loc[rng.random(n_rows) < rng.random() * 0.3, col] = np.nan
+    lags = [int(lag) for lag in rng.choice([1, 2, 3, 7], size=rng.integers(0, 4), replace=False)]
+    windows = [int(w) for w in rng.choice([1, 2, 3, 7, 14], size=rng.integers(0, 3), replace=False)]
+    return df, lags, windows
+
+
+def assert_same(actual, expected):
+    """Bit-identical values with the same NaN pattern."""
+    assert ((actual == expected) | (np.isnan(actual) & np.isnan(expected))).all()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_engine_matches_pandas_features(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        df, lags, windows = random_case(rng)
+        expected = generate_time_series_features(df, list(df.columns), lags, windows)
+        engine = TimeSeriesFeatureEngine(list(df.columns), lags, windows)
+        assert list(expected.columns[df.shape[1]:]) == engine.feature_names
+
+        # Whole frame at once, then a random-length chunk followed by single days
+        expected = expected[engine.feature_names].to_numpy()
+        assert_same(engine.run(df.to_numpy()), expected)
+
+        engine.reset()
+        cut = int(rng.integers(0, len(df) + 1))
+        head = engine.run(df.to_numpy()[:cut])
+        tail = [engine.push(row).reshape(1, -1) for row in df.to_numpy()[cut:]]
+        assert_same(np.vstack([head] + tail), expected)
+
+
+def test_bounds_keep_stacked_series_apart():
+    rng = np.random.default_rng(0)
+    first, second = (pd.DataFrame({"a": rng.normal(size=n), "b": rng.normal(size=n)}) for n in (20, 9))
+    stacked = pd.concat([first, second], ignore_index=True)
+
+    actual = generate_time_series_features(stacked, ["a", "b"], [1, 3], [7], bounds=[(0, 20), (20, 29)])
+    expected = pd.concat([generate_time_series_features(frame, ["a", "b"], [1, 3], [7])
+                          for frame in (first, second)], ignore_index=True)
+    assert list(actual.columns) == list(expected.columns)
+    assert_same(actual.to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 5, 7, 8])
+def test_chunked_engine_matches_pandas_across_boundaries(chunk):
+    # Serving streams the forecast in chunks (iter_chain); each boundary falls
+    # inside the 7-day windows and the 1-3 day lags of the rows after it
+    rng = np.random.default_rng(chunk)
+    df = pd.DataFrame({"temp": rng.normal(50, 5, 40), "rain": rng.exponential(0.2, 40).round(1)})
+    df.loc[[3, 17, 18], "temp"] = np.nan
+    cols, lags, windows = ["temp", "rain"], [3, 2, 1], [7]
+
+    expected = generate_time_series_features(df, cols, lags, windows)
+    engine = TimeSeriesFeatureEngine(cols, lags, windows)
+    chunks = [engine.extend_frame(df.iloc[start:start + chunk]) for start in range(0, len(df), chunk)]
+    actual = pd.concat(chunks)
+
+    assert list(actual.columns) == list(expected.columns)
+    assert_same(actual[engine.feature_names].to_numpy(), expected[engine.feature_names].to_numpy())
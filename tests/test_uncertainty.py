@@ -0,0 +1,32 @@
+"""The forecast error magnitudes of the Monte Carlo scenarios can be overridden."""
+import numpy as np
+import pandas as pd
+
+from bench_inference import synthetic_weather
+from inference import prepare_weather_frame
+from uncertainty import DEFAULT_FORECAST_ERROR, ForecastError, draw_perturbations, perturbed_frame
+
+WEATHER_COLUMNS = ["Max air temp", "Min air temp", "Dec Rain", "Calmar Rain"]
+
+
+def test_default_error_model_is_used_unless_overridden():
+    default = draw_perturbations(20, 7, 21, seed=3)
+    explicit = draw_perturbations(20, 7, 21, seed=3, error=DEFAULT_FORECAST_ERROR)
+    assert all(np.array_equal(a, b) for a, b in zip(default, explicit))
+
+    # Same draws, scaled: the temperature shift is proportional to temp_sd
+    wider, _, _ = draw_perturbations(20, 7, 21, seed=3, error=DEFAULT_FORECAST_ERROR._replace(temp_sd=5.0))
+    np.testing.assert_allclose(wider, default[0] * 5.0 / DEFAULT_FORECAST_ERROR.temp_sd)
+
+
+def test_zero_error_leaves_the_forecast_as_is():
+    history, forecast = synthetic_weather(5)
+    df = prepare_weather_frame(history, forecast, 25000)
+    perturbations = draw_perturbations(4, len(history), len(df), seed=1, error=ForecastError(0.0, 0.0, 0.0, 0.1))
+
+    stacked, segments = perturbed_frame(df, len(history), *perturbations)
+    for start, end, _ in segments:
+        pd.testing.assert_frame_equal(
+            stacked.iloc[start:end][WEATHER_COLUMNS].reset_index(drop=True),
+            df[WEATHER_COLUMNS].reset_index(drop=True).astype(np.float64),
+        )
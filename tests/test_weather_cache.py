@@ -0,0 +1,111 @@
+"""WeatherCache against the local Open-Meteo stub, with both cache backends."""
+import time
+from datetime import timedelta
+
+import pytest
+import requests
+
+import weather_cache
+from cache_backends import MemoryBackend, SQLiteBackend
+from open_meteo_stub import start_stub_server
+from weather_cache import Location, WeatherCache, fetch_open_meteo
+
+DECORAH = Location("Decorah", 43.3, -91.8)
+VARIABLES = ["temperature_2m_max", "precipitation_sum"]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server, state, url = start_stub_server()
+    monkeypatch.setattr(weather_cache, "OPEN_METEO_URL", url)
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return SQLiteBackend(str(tmp_path / "weather.db"), table="weather")
+
+
+def recording_cache(backend, **kwargs):
+    """A WeatherCache whose upstream calls are also recorded as (start, end) pairs."""
+    calls = []
+
+    def fetch(location, variables, start, end):
+        calls.append((start, end))
+        return fetch_open_meteo(location, variables, start, end)
+
+    return WeatherCache(backend=backend, fetch=fetch, **kwargs), calls
+
+
+def test_fetches_only_missing_sub_ranges(stub, backend):
+    cache, calls = recording_cache(backend)
+    today = cache.today()
+    start = today - timedelta(days=20)
+
+    first = cache.get_range(DECORAH, VARIABLES, start + timedelta(days=5), start + timedelta(days=9))
+    # Overlaps the cached days on both sides: only the two uncached ends go upstream
+    second = cache.get_range(DECORAH, VARIABLES, start, start + timedelta(days=14))
+
+    assert calls == [
+        (start + timedelta(days=5), start + timedelta(days=9)),
+        (start, start + timedelta(days=4)),
+        (start + timedelta(days=10), start + timedelta(days=14)),
+    ]
+    assert stub.requests == 3
+    assert second["time"][5:10] == first["time"]
+    assert second["temperature_2m_max"][5:10] == first["temperature_2m_max"]
+    assert (cache.hits, cache.misses) == (5, 15)
+
+    # Everything is cached now
+    cache.get_range(DECORAH, VARIABLES, start, start + timedelta(days=14))
+    assert stub.requests == 3
+
+
+def test_forecast_days_expire_and_past_days_do_not(stub, backend):
+    cache, calls = recording_cache(backend, forecast_ttl=0.2)
+    today = cache.today()
+    start, end = today - timedelta(days=3), today + timedelta(days=3)
+
+    cache.get_range(DECORAH, VARIABLES, start, end)
+    cache.get_range(DECORAH, VARIABLES, start, end)
+    assert len(calls) == 1
+
+    time.sleep(0.3)
+    cache.get_range(DECORAH, VARIABLES, start, end)
+    # Only today and the forecast days were refetched
+    assert calls[1:] == [(today, end)]
+
+
+def test_stale_fallback_when_upstream_fails(stub, backend):
+    cache, _ = recording_cache(backend, forecast_ttl=0.1)
+    today = cache.today()
+    fresh = cache.get_range(DECORAH, VARIABLES, today, today + timedelta(days=2))
+    time.sleep(0.2)
+
+    stub.failure_rate = 1.0
+    with pytest.raises(requests.RequestException):
+        cache.get_range(DECORAH, VARIABLES, today, today + timedelta(days=2))
+
+    # Expired entries are served when the upstream is down
+    assert cache.get_range_or_stale(DECORAH, VARIABLES, today, today + timedelta(days=2)) == fresh
+    assert cache.stale_fallbacks == 1
+
+    # Days that were never cached can't be served stale
+    with pytest.raises(LookupError):
+        cache.get_range_or_stale(DECORAH, VARIABLES, today + timedelta(days=3), today + timedelta(days=4))
+
+
+def test_sqlite_backend_is_shared_between_caches(stub, tmp_path):
+    path = str(tmp_path / "shared.db")
+    first, first_calls = recording_cache(SQLiteBackend(path, table="weather"))
+    second, second_calls = recording_cache(SQLiteBackend(path, table="weather"))
+    start = first.today() - timedelta(days=10)
+
+    expected = first.get_range(DECORAH, VARIABLES, start, start + timedelta(days=4))
+    # Another worker's cache reads the days the first one fetched
+    assert second.get_range(DECORAH, VARIABLES, start, start + timedelta(days=4)) == expected
+    assert (len(first_calls), len(second_calls)) == (1, 0)
@@ -0,0 +1,107 @@
+"""WeatherClient retries, circuit breakers and concurrency against the local Open-Meteo stub."""
+import time
+from datetime import date
+
+import pytest
+import requests
+
+from open_meteo_stub import start_stub_server
+from weather_cache import Location
+from weather_client import CircuitOpenError, WeatherClient
+
+DECORAH = Location("Decorah", 43.3, -91.8)
+VARIABLES = ["temperature_2m_max"]
+DAY = date(2025, 6, 1)
+
+
+@pytest.fixture
+def stub():
+    server, state, url = start_stub_server()
+    state.url = url
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(client):
+    return client.fetch(DECORAH, VARIABLES, DAY, DAY)
+
+
+def test_retries_5xx_responses(stub):
+    client = WeatherClient(stub.url, retries=2, backoff=0)
+
+    stub.fail_next = 2
+    assert fetch(client)["time"] == [DAY.isoformat()]
+    assert stub.requests == 3
+
+    # Out of retries: the last 503 is raised
+    stub.fail_next = 3
+    with pytest.raises(requests.HTTPError):
+        fetch(client)
+    assert stub.requests == 6
+    assert client.stats()["Decorah"]["errors"] == 1
+
+
+def test_breaker_opens_then_recovers_through_half_open(stub):
+    client = WeatherClient(stub.url, retries=0, failure_threshold=2, reset_timeout=0.2)
+
+    stub.failure_rate = 1.0
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            fetch(client)
+    assert client.stats()["Decorah"]["breaker"] == "open"
+
+    # Open: calls fail fast without reaching the upstream
+    with pytest.raises(CircuitOpenError):
+        fetch(client)
+    assert stub.requests == 2
+    assert client.stats()["Decorah"]["rejected"] == 1
+
+    # Half-open: a failed trial call opens the breaker again
+    time.sleep(0.25)
+    assert client.stats()["Decorah"]["breaker"] == "half-open"
+    with pytest.raises(requests.HTTPError):
+        fetch(client)
+    assert client.stats()["Decorah"]["breaker"] == "open"
+
+    # A successful trial call closes it
+    stub.failure_rate = 0.0
+    time.sleep(0.25)
+    assert fetch(client)["time"] == [DAY.isoformat()]
+    assert client.stats()["Decorah"]["breaker"] == "closed"
+    assert stub.requests == 4
+
+
+def test_breakers_are_per_upstream(stub):
+    client = WeatherClient(stub.url, retries=0, failure_threshold=1, reset_timeout=60)
+    stub.fail_next = 1
+    with pytest.raises(requests.HTTPError):
+        fetch(client)
+    with pytest.raises(CircuitOpenError):
+        fetch(client)
+    # Calmar has its own, still closed, breaker
+    assert client.fetch(Location("Calmar", 43.2, -91.9), VARIABLES, DAY, DAY)["time"] == [DAY.isoformat()]
+
+
+def test_gather_runs_calls_concurrently_in_order(stub):
+    stub.delay = 0.3
+    client = WeatherClient(stub.url, max_workers=4)
+    days = [date(2025, 6, d) for d in range(1, 5)]
+
+    started = time.perf_counter()
+    results = client.gather(*[lambda day=day: client.fetch(DECORAH, VARIABLES, day, day) for day in days])
+    elapsed = time.perf_counter() - started
+
+    assert [result["time"] for result in results] == [[day.isoformat()] for day in days]
+    # Four 0.3s calls overlap instead of taking 1.2s back to back
+    assert elapsed < 0.9
+
+
+def test_gather_raises_a_failed_call(stub):
+    client = WeatherClient(stub.url, retries=0)
+
+    def fail():
+        raise CircuitOpenError("down")
+
+    with pytest.raises(CircuitOpenError):
+        client.gather(lambda: fetch(client), fail)